@@ -9,7 +9,11 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from utils.sample_data import generate_sample_categories, generate_sample_contacts
-from utils.helpers import format_date, get_contact_categories, generate_mock_email_draft
+from utils.helpers import format_date, generate_mock_email_draft
+from utils.cadence import recompute_next_outreach_dates
+from utils.store import get_store
+from utils.generation import build_contexts, build_prompts, generate_drafts_sync, stream_draft
+from utils.dispatcher import Lane
 from faker import Faker
 
 from pages.contact_details import show_contact_details
@@ -23,11 +27,17 @@ fallback_image_b64 = """
 iVBORw0KGgoAAAANSUhEUgAAADIAAAAyCAYAAAAeP4ixAAAACXBIWXMAAAsTAAALEwEAmpwYAAADWUlEQVR4nO2ZTUhUURTH/8/SNB2baVqoWJug5kerXARFH6uIwGgRQdHXqk0fEFhEC6FFRCZYtChaZUQFbvpYVLQoaBG0KAyKiKgwrYwep3vkPZlmZnw+38ybN8M8+G/ee+/c87/n3HPPPXeIDTbYoDoQqcSJp3Y+QLcBtACoBdCV9I8AeAvgGYAnRPy5KgihspHYnU0ArgAIAZgbQ/sFgE4Ad4n4UyUYoLxGOEjsPA/gOoCtRU77AuAygC4i/lFOJspnhKXEvgDQC2BLktg/AO8BvJL0LFmVLQA2AFgKYB2AdWlzvgdwlIgflctMeYzEQ3UGD9XptMd9AO4T8UsFc60FcBjAybQHkQF0xMN2vxQ75THCKaVJQ/UV0lYiPmDj+msAXALgS+pOAGgh4rGir1fGUL0Ud1/TPSJuL4UJGc9PxHcBdGiaZgCdsulXGiOXtXKewBkiZluLInFnA9iZdBHgAoCLxXDk6YlwyrkN4JjWfZWI75V6ITUe50OPRbfbU7szETvtALq17pNE/NzJQgBeAniqtZ0qBatrIxxvNwOYozUfciPxMZEj4m4AB7QxwTgfjuKoFmQrm11HQ3UTgDta0zUinsiHbEmYiO+lMbsAQJsnjrg2DaW0iVvLcfLQVYZK2LPqgHbdZGfGMiPPU8W4iBct22CnUwVzU9ppNMxNpdEaSh9JaeQ6V+7Mw1VjpM7l60zn0hjZleV6LQmXbZgTHpVoYa78Xa5hxxzw2MLVN5Lqwrch9V6Y9OBIIWPXGkl1nC8AXnv0JgSvZewKI3FO3AXgpkePbgLYLWPnw43QO5vqvxDpvY13zgxvI78BHAHQTsQflZOLRJfBsRvKSHxHMoDnAHYAaCfi/pSOE0UVx3PcDIBlI4zGPfwigF1EPKzNvQvAAwANZdxVf46H9XRsT9+n+GZVfW3fEsCIMDGe9hKxN8PcXSpTZWCin4gPZRrEyxPJHSZOEjuXKYeQsa4BOKEKowVSGcwh4gdE3ABAPZlM+Wce6j4T8XEidiWo1ZmxVx3iRLwXgCK+L+n/DuANET8tNrUva0WxKijKrRUAuwEEATQq8aS+LqnvGIB+AD1E/Lhs/2ywwQZVhf+ZGRB+UN3BWAAAAABJRU5ErkJggg==
 """
 
+# Open the contact store, seeding it with sample data on first run; imported
+# contacts get next outreach dates from their cadence, as edited ones do
+store = get_store()
+if store.count_categories() == 0:
+    store.save_categories(generate_sample_categories())
+if store.count_contacts() == 0:
+    store.save_contacts(recompute_next_outreach_dates(generate_sample_contacts(store.list_categories())))
+
 # Initialize session state
 if 'categories' not in st.session_state:
-    st.session_state.categories = generate_sample_categories()
-if 'contacts' not in st.session_state:
-    st.session_state.contacts = generate_sample_contacts(st.session_state.categories)
+    st.session_state.categories = store.list_categories()
 if 'selected' not in st.session_state:
     st.session_state.selected = 'Dashboard'
 if 'trigger_rerun' not in st.session_state:
@@ -390,11 +400,8 @@ if st.session_state.selected == "Dashboard":
         # Top people to reconnect with
         st.markdown("### 🤝 Top People to Reconnect With")
         
-        # Sort contacts by last contact date
-        reconnect_contacts = sorted(
-            [c for c in st.session_state.contacts if c.last_contact],
-            key=lambda x: x.last_contact
-        )[:4]  # Show 4 contacts
+        # Contacts we've gone longest without reaching
+        reconnect_contacts = store.contacts_by_last_contact(limit=4)  # Show 4 contacts
         
         # Create a container for contacts
         contacts_container = st.container()
@@ -403,7 +410,7 @@ if st.session_state.selected == "Dashboard":
                 days_since = (datetime.now() - contact.last_contact).days
                 
                 # Get categories for this contact
-                contact_categories = get_contact_categories(contact, st.session_state.categories)
+                contact_categories = store.contact_categories(contact.id)
                 category_names = [cat.name for cat in contact_categories]
                 
                 # Create the contact card
@@ -460,18 +467,22 @@ if st.session_state.selected == "Dashboard":
                 st.session_state.dialog_contact = None
             
             contacts_data = []
-            for contact in sorted(st.session_state.contacts, key=lambda x: x.next_outreach_date):
-                if contact.next_outreach_date.date() >= datetime.now().date():
-                    categories = get_contact_categories(contact, st.session_state.categories)
-                    category_names = [cat.name for cat in categories]
-                    contacts_data.append({
-                        "Due Date": contact.next_outreach_date.date(),
-                        "Name": contact.name,
-                        "Email": contact.email,
-                        "Categories": ", ".join(category_names),
-                        "Action": "✍️ Write Draft",  # Display text
-                        "id": contact.id  # Keep track of the ID
-                    })
+            today_start = datetime.combine(datetime.now().date(), datetime.min.time())
+            upcoming_ids = [contact_id for _, contact_id in store.scheduler.upcoming(start=today_start)]
+            upcoming_contacts = store.get_contacts(upcoming_ids)
+            # Drafts written ahead of time by the background worker
+            drafted = store.drafted_ids([(c.id, c.next_outreach_date) for c in upcoming_contacts])
+            for contact in upcoming_contacts:
+                categories = store.contact_categories(contact.id)
+                category_names = [cat.name for cat in categories]
+                contacts_data.append({
+                    "Due Date": contact.next_outreach_date.date(),
+                    "Name": contact.name,
+                    "Email": contact.email,
+                    "Categories": ", ".join(category_names),
+                    "Action": "📨 Draft Ready" if contact.id in drafted else "✍️ Write Draft",  # Display text
+                    "id": contact.id  # Keep track of the ID
+                })
             
             if contacts_data:
                 # Create DataFrame without the ID column
@@ -501,12 +512,17 @@ if st.session_state.selected == "Dashboard":
                     with cols[i % 4]:
                         if st.button(f"Write Draft for {contact['Name']}", key=f"upcoming_draft_{i}_{contact['id']}", type="primary"):
                             st.session_state.selected_contact_id = contact['id']
-                            st.session_state.dialog_contact = next((c for c in st.session_state.contacts if c.id == contact['id']), None)
+                            st.session_state.dialog_contact = store.get_contact(contact['id'])
                             st.session_state.show_dialog = True
+                            st.session_state.draft_error = None
                             st.rerun()
             else:
                 st.info("No upcoming emails scheduled")
             
+            def generate_dialog_draft():
+                result = generate_drafts_sync(store, [st.session_state.dialog_contact], lane=Lane.INTERACTIVE)
+                st.session_state.draft_error = next(iter(result.failures.values()), None)
+            
             # Handle dialog display
             if st.session_state.show_dialog and st.session_state.dialog_contact:
                 contact = st.session_state.dialog_contact
@@ -528,75 +544,50 @@ if st.session_state.selected == "Dashboard":
                     st.subheader(f"Email Prompt for {contact.name}")
                     st.caption("This prompt will be sent to the LLM to generate an email")
                     
-                    # Get categories
-                    categories = get_contact_categories(contact, st.session_state.categories)
-                    category_names = [cat.name for cat in categories]
-                    
-                    # Mock data
-                    system_prompt = """You are an AI assistant that helps me nurture my professional and personal relationships.
-                        
-When generating emails:
-1. Use a tone appropriate for the relationship category (professional, personal, etc.)
-2. Reference previous interactions and shared experiences when available
-3. Include relevant, timely topics based on the recipient's interests and our relationship
-4. Keep messages concise but meaningful
-5. End with a clear next step or question to encourage response
-6. Maintain authenticity - the email should sound like it's coming from me
-
-The goal is to maintain and strengthen relationships through consistent, thoughtful communication."""
-                    
-                    content_sources = ["LinkedIn Profile", "Company Blog"]
-                    topics = ["Business Networking", "Industry Updates", "Partnership Opportunities"]
-                    
-                    category_instructions = {}
-                    for cat in categories:
-                        category_instructions[cat.name] = f"Maintain {cat.name} relationship with professional tone. Reference shared experiences and interests."
-                    
-                    contact_instructions = """Always include:
-- Reference to previous conversation/meeting
-- Current industry trends
-- Value proposition or helpful information
-- Clear call to action or follow-up question"""
-                    
-                    # Format the prompt
-                    prompt = f"""HEADER: "Prompt to send {contact.name} to LLM for example generations. This is generation 1: Serious mode."
-
-SYSTEM META: Here is the current system prompt: {system_prompt} This will be given to the LLM as the system prompt.
-
-CORE EMAIL CONTENT: Core Instructions for this generation.
---Step A: Scrape the most recent content from these URLs {', '.join(content_sources)} summarize and then set this data summary as context for the prompt that follows. (Prioritize timely new information over older information.)
-
---Step B: Search Google for the most authoritative 3 sources on {', '.join(topics)} and then go to those sources and scrape the most recent content, summarize and then set this data summary as context for the prompt that follows. (Prioritize timely new information over older information.)
-
---Step C: Analyze 'All Notes' in the contact. Use this as context to make the email you write better. Pay attention to threads and continuity and tone and style of previous interactions.
-
---Step D: Load all of the rules (LLM) instructions for the following categories that this contact belongs to. 
-Categories: {', '.join(category_names)}
-Instructions:
-{chr(10).join([f"- {cat}: {instr}" for cat, instr in category_instructions.items()])}
-Summarize and synthesize these into a single LLM guidance. Where there is a conflict between rules from two different categories, use your best judgment from the data in the notes section to prioritize which rule to prioritize.
-
---Step E: Load all of the rules (LLM) instructions for this contact which is on the contact details page:
-{contact_instructions}
-Add this to the LLM guidance from Step D. Where there is a conflict between rules from categories versus contact LLM instructions, prioritize the rules from the contact.
-
---Step F: Using all of the generated context in A,B,C,D,E write 3 subject lines that will be highly likely to resonate with this contact and get them to open the email.
-
---Step G: Using all of the generated in A,B,C,D,E write a short, powerful email to the contact with timely information and value add content from the research notes. Make this email match in tone everything you know from context and history.
-
---Step H: Using all of the generated in A,B,C,D,E write a medium length, powerful email to the contact with timely information and value add content from the research notes. Make this email match in tone everything you know from context and history.
-
---Step I: Using all of the generated in A,B,C,D,E write a short length, powerful email that is optimized to get a response and add deep value to the relationship. Make this email match in tone everything you know from context and history."""
+                    # The exact prompt the generation pipeline sends, with its context budget
+                    settings = store.get_settings()
+                    prompt = build_prompts(store, [contact], settings)[0]
+                    context = build_contexts(store, [contact], settings.context_token_budget)[0]
+                    counts = context.token_counts
+                    st.caption(
+                        f"Context ≈ {context.total_tokens} of {context.budget} tokens: "
+                        f"instructions {counts['contact_instructions']}, category rules {counts['category_rules']}, "
+                        f"notes {counts['notes']}, research {counts['research']}"
+                        + (" (trimmed to fit)" if context.trimmed else "")
+                    )
                     
                     # Display prompt
                     st.code(prompt, language="text")
                     
+                    # Serve the draft written ahead of time for this due date, or write one live on request
+                    draft = store.get_draft(contact.id, contact.next_outreach_date)
+                    if draft:
+                        st.caption(f"Draft written {format_date(draft.created_at)}")
+                        st.code(draft.body, language="text")
+                    else:
+                        st.caption("No draft ready yet")
+                        if st.button("Write draft", key="write_draft"):
+                            try:
+                                st.write_stream(stream_draft(store, contact))
+                                st.session_state.draft_error = None
+                            except Exception as e:
+                                st.session_state.draft_error = f"{type(e).__name__}: {e}"
+                            draft = store.get_draft(contact.id, contact.next_outreach_date)
+                    
                     # Buttons
-                    col1, col2 = st.columns([1, 1])
+                    col1, col2, col3 = st.columns([1, 1, 1])
                     with col1:
-                        if st.button("Generate Email Draft", key="gen_email"):
-                            st.success("Email draft generation started!")
+                        # Generate in a callback so the draft above shows on this run
+                        st.button("Generate Email Draft", key="gen_email", on_click=generate_dialog_draft)
+                        if st.session_state.get("draft_error"):
+                            st.error(f"Draft generation failed: {st.session_state.draft_error}")
                     with col2:
+                        if st.button("Mark as Sent", key="mark_sent", disabled=draft is None):
+                            # Records the outreach and queues the next one from the contact's cadence
+                            store.save_contact(store.scheduler.reschedule(contact))
+                            st.session_state.show_dialog = False
+                            st.rerun()
+                    with col3:
                         if st.button("Close", key="close_dialog"):
                             st.session_state.show_dialog = False
                             st.rerun()
@@ -605,21 +596,19 @@ Add this to the LLM guidance from Step D. Where there is a conflict between rule
         
         with tab2:
             history_data = []
-            for contact in st.session_state.contacts:
-                if contact.last_contact:
-                    categories = get_contact_categories(contact, st.session_state.categories)
-                    category_names = [cat.name for cat in categories]
-                    history_data.append({
-                        "Sent Date": contact.last_contact.date(),
-                        "Name": contact.name,
-                        "Email": contact.email,
-                        "Categories": ", ".join(category_names),
-                        "Status": "Sent ✓"
-                    })
+            for contact in store.contacts_by_last_contact(descending=True):
+                categories = store.contact_categories(contact.id)
+                category_names = [cat.name for cat in categories]
+                history_data.append({
+                    "Sent Date": contact.last_contact.date(),
+                    "Name": contact.name,
+                    "Email": contact.email,
+                    "Categories": ", ".join(category_names),
+                    "Status": "Sent ✓"
+                })
             
             if history_data:
                 df = pd.DataFrame(history_data)
-                df = df.sort_values("Sent Date", ascending=False)
                 st.dataframe(
                     df,
                     column_config={
@@ -639,10 +628,11 @@ Add this to the LLM guidance from Step D. Where there is a conflict between rule
         # Key metrics in a more compact layout
         st.markdown("### 📊 Key Metrics")
         metric_col1, metric_col2 = st.columns(2)
+        metrics = store.metrics.snapshot()
         
         # Total Contacts
         with metric_col1:
-            total_contacts = 127  # Random number between 100-150
+            total_contacts = metrics["total_contacts"]
             st.markdown("""
                 <div class="metric-card">
                     <a href="#" style="text-decoration: none; color: inherit;">
@@ -654,7 +644,7 @@ Add this to the LLM guidance from Step D. Where there is a conflict between rule
         
         # Due Today
         with metric_col2:
-            due_today = 4  # As requested
+            due_today = metrics["due_today"]  # Includes overdue contacts
             st.markdown("""
                 <div class="metric-card">
                     <a href="#" style="text-decoration: none; color: inherit;">
@@ -669,7 +659,7 @@ Add this to the LLM guidance from Step D. Where there is a conflict between rule
         
         # Due This Week
         with metric_col3:
-            due_this_week = 14  # As requested
+            due_this_week = metrics["due_this_week"]
             st.markdown("""
                 <div class="metric-card">
                     <a href="#" style="text-decoration: none; color: inherit;">
@@ -681,7 +671,7 @@ Add this to the LLM guidance from Step D. Where there is a conflict between rule
         
         # Contact Growth This Month
         with metric_col4:
-            growth_this_month = 8  # Example value
+            growth_this_month = metrics["growth_this_month"]
             st.markdown("""
                 <div class="metric-card">
                     <a href="#" style="text-decoration: none; color: inherit;">
@@ -16,6 +16,10 @@ class Category(BaseModel):
     rule_text: str
     precedence_order: int = 0
 
+class Note(BaseModel):
+    created_at: datetime = Field(default_factory=datetime.now)
+    text: str
+
 class Contact(BaseModel):
     id: str
     name: str
@@ -25,12 +29,44 @@ class Contact(BaseModel):
     categories: List[str] = Field(default_factory=list)  # List of category IDs
     personal_instructions: Optional[str] = None
     cadence_frequency: CadenceFrequency = CadenceFrequency.MONTHLY
+    custom_cadence: Optional[str] = None  # Recurrence rule for CUSTOM, e.g. "every 2nd tuesday"
+    sender_email: Optional[str] = None  # Which of the user's addresses sends to this contact; None means the default
     next_outreach_date: datetime
     relevant_websites: List[str] = Field(default_factory=list)
     keywords: List[str] = Field(default_factory=list)
+    notes: List[Note] = Field(default_factory=list)
     last_contact: Optional[datetime] = None
 
+class EmailVariants(BaseModel):
+    short: str = Field(min_length=1)
+    medium: str = Field(min_length=1)
+    reply_optimized: str = Field(min_length=1)
+
+class DraftVariants(BaseModel):
+    """The structured reply to Steps F-I"""
+    subjects: List[str] = Field(min_length=1)
+    variants: EmailVariants
+
+class Draft(BaseModel):
+    contact_id: str
+    due_at: datetime  # The next_outreach_date the draft was written for
+    body: str
+    variants: Optional[DraftVariants] = None  # Set when the LLM's reply parsed as structured output
+    fingerprint: Optional[str] = None  # Hash of every input the draft was written from
+    created_at: datetime = Field(default_factory=datetime.now)
+
 class SystemSettings(BaseModel):
     system_prompt: str = "Maintain a friendly yet professional tone; keep the email concise."
     user_email: Optional[str] = None
-    bcc_email: Optional[str] = None 
\ No newline at end of file
+    bcc_email: Optional[str] = None
+    load_leveling: bool = False  # Spread due dates so no address goes over its daily cap
+    default_daily_send_cap: int = 20
+    daily_send_caps: dict[str, int] = Field(default_factory=dict)  # Per sender address
+    load_leveling_tolerance_days: int = 2
+    context_token_budget: int = 2000  # Most tokens of instructions, rules, notes and research per prompt
+    pregenerate_drafts: bool = True  # Let the worker draft upcoming contacts off-peak
+    pregeneration_horizon_hours: int = 48
+    pregeneration_token_budget: int = 250_000  # Estimated prompt + completion tokens per night
+    off_peak_start_hour: int = 1
+    off_peak_end_hour: int = 6
+    step_pipeline: bool = True  # Run Steps A-I as a graph of requests rather than one prompt
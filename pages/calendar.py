@@ -1,15 +1,12 @@
 import streamlit as st
 from datetime import datetime, timedelta
 import calendar
-import random
+import numpy as np
 import pandas as pd
+from utils.recurrence import expand_occurrences
+from utils.store import get_store
 
-def get_fake_names():
-    return [
-        "John Smith", "Emma Wilson", "Michael Brown", "Sarah Davis", "James Johnson",
-        "Lisa Anderson", "David Miller", "Jennifer White", "Robert Taylor", "Mary Martinez",
-        "William Lee", "Patricia Moore", "Thomas Clark", "Elizabeth Hall", "Joseph Young"
-    ]
+SPECIAL_DATE_ICONS = {"birthday": "🎂"}
 
 def create_month_calendar(year, month):
     # Get the calendar for the specified month
@@ -23,29 +20,54 @@ def create_month_calendar(year, month):
     
     return df
 
-def generate_events(year, month):
+def project_custom_cadences(store, start, end):
+    """(day, contact_id) for custom-cadence occurrences in [start, end) after each contact's scheduled one
+    
+    Every rule is expanded over the window in one batch, anchored on the
+    scheduled date: that outreach becomes the last contact once it is sent.
+    """
+    cadences = store.custom_cadences()
+    if not cadences or start >= end:
+        return []
+    scheduled = np.array([when.date() for _, _, when in cadences], dtype="datetime64[D]")
+    rows, days = expand_occurrences([rule for _, rule, _ in cadences], scheduled, start, (end - start).days)
+    later = days > scheduled[rows]
+    return [(day, cadences[row][0]) for row, day in zip(rows[later].tolist(), days[later].tolist())]
+
+def get_events(year, month):
     events = {}
-    names = get_fake_names()
+    store = get_store()
     today = datetime.now().date()
+    month_start = datetime(year, month, 1)
+    month_end = datetime(year + month // 12, month % 12 + 1, 1)
+    
+    scheduled = store.scheduler.upcoming(start=month_start, end=month_end)
+    contacted = store.contacts_by_last_contact(start=month_start, end=month_end)
+    special = store.special_dates.upcoming(month_start.date(), (month_end - month_start).days)
+    
+    projected = project_custom_cadences(store, max(month_start.date(), today + timedelta(days=1)), month_end.date())
+    
+    contact_ids = ([contact_id for _, contact_id in scheduled] + [contact_id for _, contact_id, _, _ in special]
+                   + [contact_id for _, contact_id in projected])
+    names = {c.id: c.name for c in store.get_contacts(list(dict.fromkeys(contact_ids)))}
+    
+    # Scheduled outreach: upcoming in blue, overdue in red
+    for when, contact_id in scheduled:
+        color = "blue" if when.date() >= today else "red"
+        events.setdefault(when.date(), []).append((names.get(contact_id, "Unknown"), color))
+    
+    # Later occurrences of custom cadences, if each outreach goes out on time
+    for day, contact_id in projected:
+        events.setdefault(day, []).append((names.get(contact_id, "Unknown"), "projected"))
+    
+    # Outreach already sent in green
+    for contact in contacted:
+        events.setdefault(contact.last_contact.date(), []).append((contact.name, "green"))
     
-    # Generate 15 random events
-    for _ in range(15):
-        day = random.randint(1, 28)  # Avoid edge cases with month lengths
-        date = datetime(year, month, day).date()
-        name = random.choice(names)
-        
-        if date not in events:
-            events[date] = []
-        
-        # Color based on date
-        if date > today:
-            # Future events in blue
-            color = "blue"
-        else:
-            # Past events randomly in red or green
-            color = "green" if random.random() > 0.4 else "red"
-        
-        events[date].append((name, color))
+    # Birthdays and anniversaries
+    for occurrence, contact_id, label, _ in special:
+        icon = SPECIAL_DATE_ICONS.get(label, "🎉")
+        events.setdefault(occurrence, []).append((f"{icon} {names.get(contact_id, 'Unknown')}", "purple"))
     
     return events
 
@@ -82,7 +104,7 @@ def show_calendar():
     year = st.session_state.selected_date.year
     month = st.session_state.selected_date.month
     cal_df = create_month_calendar(year, month)
-    events = generate_events(year, month)
+    events = get_events(year, month)
     
     # Create calendar grid with events
     st.markdown("""
@@ -110,8 +132,10 @@ def show_calendar():
             border-radius: 3px;
         }
         .event-blue { color: #0066cc; }
+        .event-projected { color: #6c9bd2; font-style: italic; }
         .event-red { color: #dc3545; }
         .event-green { color: #28a745; }
+        .event-purple { color: #8e44ad; }
         </style>
     """, unsafe_allow_html=True)
     
@@ -2,8 +2,8 @@ import streamlit as st
 import random
 from datetime import datetime
 from models.schemas import Category, CadenceFrequency
-from utils.sample_data import generate_sample_categories
 from utils.helpers import format_date
+from utils.store import get_store
 
 # Initialize session state for categories if not exists
 if 'categories_filter' not in st.session_state:
@@ -13,7 +13,7 @@ if 'show_category_actions' not in st.session_state:
 if 'selected_category' not in st.session_state:
     st.session_state.selected_category = None
 if 'categories' not in st.session_state:
-    st.session_state.categories = generate_sample_categories()
+    st.session_state.categories = get_store().list_categories()
 if 'editing_category_id' not in st.session_state:
     st.session_state.editing_category_id = None
 if 'trigger_rerun' not in st.session_state:
@@ -38,11 +38,7 @@ def show_categories():
         # For now, just display a contact details card
         
         # Find the selected contact
-        selected_contact = None
-        for contact in st.session_state.contacts:
-            if contact.id == st.session_state.selected_contact_id:
-                selected_contact = contact
-                break
+        selected_contact = get_store().get_contact(st.session_state.selected_contact_id)
         
         if selected_contact:
             # Back button at the top
@@ -55,12 +51,7 @@ def show_categories():
                 st.title(f"Contact Details")
             
             # Get categories for this contact
-            contact_categories = []
-            for cat_id in selected_contact.categories:
-                for category in st.session_state.categories:
-                    if category.id == cat_id:
-                        contact_categories.append(category)
-                        break
+            contact_categories = get_store().contact_categories(selected_contact.id)
             
             # Display contact details in a card layout
             col1, col2 = st.columns([2, 1])
@@ -535,6 +526,7 @@ def toggle_category_status(category_id, is_active):
             else:
                 # Activate: set precedence to 1 (or any positive number)
                 st.session_state.categories[i].precedence_order = 1
+            get_store().save_category(st.session_state.categories[i])
             break
     st.rerun()
 
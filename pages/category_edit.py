@@ -1,7 +1,9 @@
 import streamlit as st
 import random
+import uuid
 from models.schemas import Category, Contact
 from datetime import datetime
+from utils.store import get_store
 
 def show_category_edit(category_id: str = None):
     # Find the category being edited
@@ -17,9 +19,11 @@ def show_category_edit(category_id: str = None):
         category_name = edited_category.name
         category_description = edited_category.description or ""
         
-        # Generate fake LLM instructions based on category name
+        # Use the saved LLM instructions, or suggest some based on the category name
         category_name_lower = category_name.lower()
-        if "client" in category_name_lower or "customer" in category_name_lower:
+        if edited_category.rule_text:
+            llm_instructions = edited_category.rule_text
+        elif "client" in category_name_lower or "customer" in category_name_lower:
             llm_instructions = "When reaching out to clients, reference their recent projects, ask about business growth, and offer relevant insights from our industry. Maintain professional but warm tone."
         elif "prospect" in category_name_lower:
             # 30% chance to add call-to-action for prospects
@@ -113,7 +117,7 @@ def show_category_edit(category_id: str = None):
         # Associated contacts card
         contact_count = 0
         if category_id and category_id != "new":
-            contact_count = len([c for c in st.session_state.contacts if category_id in c.categories])
+            contact_count = get_store().count_contacts_in_category(category_id)
         
         st.markdown(f"""
             <div class="metric-card" style="height: 100%;">
@@ -131,7 +135,7 @@ def show_category_edit(category_id: str = None):
 
         # Contacts list
         if category_id and category_id != "new":
-            contacts = [c for c in st.session_state.contacts if category_id in c.categories]
+            contacts = get_store().contacts_in_category(category_id)
             for contact in contacts:
                 st.markdown(f"""
                     <div style="display: flex; align-items: center; gap: 1rem; padding: 0.75rem;
@@ -167,9 +171,26 @@ def show_category_edit(category_id: str = None):
             st.rerun()
     with col2:
         if st.button("Save", type="primary", use_container_width=True):
-            # Save changes
-            st.session_state.editing_category_id = None
-            st.rerun()
+            name = st.session_state.category_name_input.strip()
+            rule_text = st.session_state.category_instructions_input.strip()
+            if not name or not rule_text:
+                st.error("Category name and LLM instructions are required")
+            else:
+                # Save changes; the store drops any cached rules built from the old version
+                fields = {
+                    "name": name,
+                    "description": st.session_state.category_description_input.strip() or None,
+                    "rule_text": rule_text,
+                }
+                if edited_category:
+                    category = edited_category.model_copy(update=fields)
+                else:
+                    max_order = max((cat.precedence_order for cat in st.session_state.categories), default=0)
+                    category = Category(id=str(uuid.uuid4()), precedence_order=max_order + 1, **fields)
+                get_store().save_category(category)
+                st.session_state.categories = get_store().list_categories()
+                st.session_state.editing_category_id = None
+                st.rerun()
 
     # Delete confirmation modal
     if st.session_state.show_delete_modal:
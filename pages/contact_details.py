@@ -1,6 +1,9 @@
 import streamlit as st
 import datetime
 from utils.helpers import format_date
+from utils.generation import build_prompts, generate_drafts_sync
+from utils.dispatcher import Lane
+from utils.store import get_store
 
 def show_contact_details(contact_id=None):
     # Initialize session state for navigation
@@ -385,8 +388,22 @@ def show_contact_details(contact_id=None):
         col1, col2, col3 = st.columns([6, 1, 1])
         with col3:
             # Place the buttons in the right column for right alignment
-            st.button("⚡ Generate Now", type="secondary", use_container_width=True)
+            generate_now = st.button("⚡ Generate Now", type="secondary", use_container_width=True)
             st.button("💬 Internal Hidden", key="internal_hidden_btn", on_click=toggle_llm_prompt_dialog, use_container_width=True)
+    
+    # Generate a draft for this contact through the LLM pipeline
+    if generate_now:
+        store = get_store()
+        contact = store.get_contact(contact_id) if contact_id else None
+        if contact is None:
+            st.warning("Save this contact before generating a draft.")
+        else:
+            with st.spinner("Generating draft..."):
+                result = generate_drafts_sync(store, [contact], lane=Lane.INTERACTIVE)
+            if result.failures:
+                st.error(f"Draft generation failed: {result.failures[contact.id]}")
+            else:
+                st.code(result.drafts[0].body, language="text")
 
     # Show LLM Prompt Dialog using Streamlit components
     if st.session_state.show_llm_prompt_dialog:
@@ -394,68 +411,18 @@ def show_contact_details(contact_id=None):
             st.subheader("LLM Prompt")
             st.caption("This is the prompt that would be sent to the LLM for email generation")
             
-            # Fake data for the prompt
-            contact_name = "John Smith"
-            system_prompt = """You are an AI assistant that helps me nurture my professional and personal relationships.
-                
-When generating emails:
-1. Use a tone appropriate for the relationship category (professional, personal, etc.)
-2. Reference previous interactions and shared experiences when available
-3. Include relevant, timely topics based on the recipient's interests and our relationship
-4. Keep messages concise but meaningful
-5. End with a clear next step or question to encourage response
-6. Maintain authenticity - the email should sound like it's coming from me
-
-The goal is to maintain and strengthen relationships through consistent, thoughtful communication."""
-            
-            content_sources = ["TechCorp Blog", "LinkedIn Profile"]
-            topics = ["Artificial Intelligence", "Product Management", "Tech Conference", "Machine Learning", "SaaS"]
-            categories = ["High Value", "Active Client", "Tech Industry"]
-            category_instructions = {
-                "High Value": "Focus on personalized advice and high-value insights. Offer exclusive information or opportunities when possible. Always reference past conversations and shared experiences.",
-                "Active Client": "Keep communication professional but warm. Reference current projects and deadlines. Offer help or additional resources that might be valuable.",
-                "Tech Industry": "Include relevant industry trends and news. Mention upcoming conferences or events. Share insights about competitor movements or market changes."
-            }
-            contact_instructions = """Always mention:
-- Previous meeting at Tech Conference
-- Interest in AI developments
-- Recent product launches at TechCorp
-- Shared connection through Product Management community"""
-            
-            # Format the prompt exactly as requested
-            prompt = f"""HEADER: "Prompt to send {contact_name} to LLM for example generations. This is generation 1: Serious mode."
-
-SYSTEM META: Here is the current system prompt: {system_prompt} This will be given to the LLM as the system prompt.
-
-CORE EMAIL CONTENT: Core Instructions for this generation.
---Step A: Scrape the most recent content from these URLs {', '.join(content_sources)} summarize and then set this data summary as context for the prompt that follows. (Prioritize timely new information over older information.)
-
---Step B: Search Google for the most authoritative 3 sources on {', '.join(topics)} and then go to those sources and scrape the most recent content, summarize and then set this data summary as context for the prompt that follows. (Prioritize timely new information over older information.)
-
---Step C: Analyze 'All Notes' in the contact. Use this as context to make the email you write better. Pay attention to threads and continuity and tone and style of previous interactions.
-
---Step D: Load all of the rules (LLM) instructions for the following categories that this contact belongs to. 
-Categories: {', '.join(categories)}
-Instructions:
-- High Value: {category_instructions["High Value"]}
-- Active Client: {category_instructions["Active Client"]}
-- Tech Industry: {category_instructions["Tech Industry"]}
-Summarize and synthesize these into a single LLM guidance. Where there is a conflict between rules from two different categories, use your best judgment from the data in the notes section to prioritize which rule to prioritize.
-
---Step E: Load all of the rules (LLM) instructions for this contact which is on the contact details page:
-{contact_instructions}
-Add this to the LLM guidance from Step D. Where there is a conflict between rules from categories versus contact LLM instructions, prioritize the rules from the contact.
-
---Step F: Using all of the generated context in A,B,C,D,E write 3 subject lines that will be highly likely to resonate with this contact and get them to open the email.
-
---Step G: Using all of the generated in A,B,C,D,E write a short, powerful email to the contact with timely information and value add content from the research notes. Make this email match in tone everything you know from context and history.
-
---Step H: Using all of the generated in A,B,C,D,E write a medium length, powerful email to the contact with timely information and value add content from the research notes. Make this email match in tone everything you know from context and history.
-
---Step I: Using all of the generated in A,B,C,D,E write a short length, powerful email that is optimized to get a response and add deep value to the relationship. Make this email match in tone everything you know from context and history."""
+            # The exact prompt the generation pipeline sends for this contact
+            store = get_store()
+            contact = store.get_contact(contact_id) if contact_id else None
+            if contact is None:
+                prompt = ""
+                st.info("Save this contact to see the prompt written for it.")
+            else:
+                prompt = build_prompts(store, [contact], store.get_settings())[0]
             
             # Display the prompt in a code block
-            st.code(prompt, language="text")
+            if prompt:
+                st.code(prompt, language="text")
             
             # Buttons for actions
             col1, col2 = st.columns([5, 1])
@@ -1,6 +1,8 @@
 import streamlit as st
 import datetime
 from utils.helpers import format_date
+from utils.generation import stream_draft, split_draft
+from utils.store import get_store
 import uuid
 
 # Initialize session state for email preview
@@ -54,8 +56,30 @@ def show_contact_details(contact_id=None):
     # Generate Now button
     st.subheader("Quick Actions")
     
-    if st.button("⚡ Generate Now", key="generate_now_btn"):
-        # When button is clicked, show email preview
+    contact = get_store().get_contact(contact_id) if contact_id else None
+    generate_now = st.button("⚡ Generate Now", key="generate_now_btn")
+    if generate_now and contact:
+        # Stream the draft into the page as the LLM writes it, then show the full preview below
+        stream_area = st.empty()
+        try:
+            with stream_area.container():
+                st.subheader("Generated Email Draft")
+                text = st.write_stream(stream_draft(get_store(), contact))
+        except Exception as e:
+            stream_area.empty()
+            st.error(f"Draft generation failed: {e}")
+        else:
+            stream_area.empty()
+            # Prefer the structured variants saved with the draft over parsing the streamed text
+            draft = get_store().get_draft(contact.id, contact.next_outreach_date)
+            if draft and draft.variants:
+                subject, body = draft.variants.subjects[0], draft.variants.variants.short
+            else:
+                subject, body = split_draft(text)
+            st.session_state.generated_email = {"subject": subject, "body": body}
+            st.session_state.show_email_preview = True
+    elif generate_now:
+        # No saved contact to draft for; show the sample
         if 'generated_email' not in st.session_state or st.session_state.generated_email is None:
             # Generate a sample email
             st.session_state.generated_email = {
@@ -1,6 +1,7 @@
 import streamlit as st
-from datetime import datetime
-from utils.helpers import format_date, get_contact_categories
+from datetime import datetime, timedelta
+from utils.helpers import format_date
+from utils.store import get_store
 from pages.contact_details import show_contact_details
 
 def show_contacts():
@@ -26,19 +27,18 @@ def show_contacts_list():
     with col2:
         filter_by = st.selectbox("Filter by", ["All", "Recent", "Due Soon", "Inactive"])
     
-    # Display contacts in a grid
-    contacts = st.session_state.contacts
-    
-    # Filter contacts based on search and filter
-    if search:
-        contacts = [c for c in contacts if search.lower() in c.name.lower() or search.lower() in c.email.lower()]
-    
+    # Query the store for the selected filter
+    store = get_store()
     if filter_by == "Recent":
-        contacts = sorted(contacts, key=lambda x: x.last_contact if x.last_contact else datetime.min, reverse=True)
+        contacts = store.list_contacts(search, order_by="last_contact", descending=True)
     elif filter_by == "Due Soon":
-        contacts = sorted(contacts, key=lambda x: x.next_outreach_date)
+        contacts = store.list_contacts(search, order_by="next_outreach_date")
     elif filter_by == "Inactive":
-        contacts = [c for c in contacts if not c.last_contact or (datetime.now() - c.last_contact).days > 30]
+        contacts = store.contacts_by_last_contact(end=datetime.now() - timedelta(days=30), include_never=True)
+        if search:
+            contacts = [c for c in contacts if search.lower() in c.name.lower() or search.lower() in c.email.lower()]
+    else:
+        contacts = store.list_contacts(search)
     
     # Create a grid of contact cards
     cols = st.columns(3)
@@ -60,7 +60,7 @@ def show_contacts_list():
                 """, unsafe_allow_html=True)
                 
                 # Categories
-                categories = get_contact_categories(contact, st.session_state.categories)
+                categories = store.contact_categories(contact.id)
                 if categories:
                     st.markdown('<div style="display: flex; gap: 0.5rem; flex-wrap: wrap; margin-bottom: 1rem;">', unsafe_allow_html=True)
                     for cat in categories[:2]:  # Show only first 2 categories
@@ -1,10 +1,12 @@
 import streamlit as st
 from models.schemas import SystemSettings
+from utils.store import get_store
+from utils.load_leveling import adjust_schedule
 import uuid
 
 # Initialize system settings in session state if not exists
 if 'system_settings' not in st.session_state:
-    st.session_state.system_settings = SystemSettings()
+    st.session_state.system_settings = get_store().get_settings()
 
 # Initialize user email addresses if not exists
 if 'user_email_addresses' not in st.session_state:
@@ -85,7 +87,7 @@ def show_settings():
         # Display existing email addresses
         for i, email_data in enumerate(st.session_state.user_email_addresses):
             with st.container():
-                col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
+                col1, col2, col3, col4, col5 = st.columns([3, 2, 1, 1, 1])
                 
                 with col1:
                     new_email = st.text_input("Email Address", value=email_data["email"], key=f"email_{i}")
@@ -98,6 +100,14 @@ def show_settings():
                     is_default = st.checkbox("Default", value=email_data["is_default"], key=f"default_{i}")
                 
                 with col4:
+                    daily_cap = st.number_input(
+                        "Daily Cap", min_value=0, key=f"daily_cap_{i}",
+                        value=st.session_state.system_settings.daily_send_caps.get(
+                            email_data["email"], st.session_state.system_settings.default_daily_send_cap),
+                        help="Most emails to send from this address per day; 0 means no limit"
+                    )
+                
+                with col5:
                     if st.button("Remove", key=f"remove_{i}"):
                         # Don't allow removing the last email address
                         if len(st.session_state.user_email_addresses) > 1:
@@ -109,6 +119,7 @@ def show_settings():
                 # Update the email data
                 email_data["email"] = new_email
                 email_data["label"] = new_label
+                email_data["daily_cap"] = daily_cap
                 
                 # Handle default email logic
                 if is_default and not email_data["is_default"]:
@@ -146,6 +157,11 @@ def show_settings():
             # Update the system settings with the default email
             default_email = next((email["email"] for email in st.session_state.user_email_addresses if email["is_default"]), "")
             st.session_state.system_settings.user_email = default_email
+            st.session_state.system_settings.daily_send_caps = {
+                email["email"]: email.get("daily_cap", st.session_state.system_settings.default_daily_send_cap)
+                for email in st.session_state.user_email_addresses if email["email"]
+            }
+            get_store().save_settings(st.session_state.system_settings)
             
             st.success("Email addresses updated successfully!")
     
@@ -176,11 +192,88 @@ def show_settings():
             """
             signature = st.text_area("Email Signature", value=default_signature, height=150)
         
+        # Load leveling
+        with st.container():
+            st.subheader("Daily Send Limits")
+            
+            load_leveling = st.checkbox(
+                "Spread outreach to stay under each address's daily cap",
+                value=st.session_state.system_settings.load_leveling,
+                help="Due dates are moved by up to the tolerance below so busy days don't go over the cap"
+            )
+            default_daily_send_cap = st.number_input(
+                "Default Daily Cap",
+                min_value=0,
+                value=st.session_state.system_settings.default_daily_send_cap,
+                help="Used for addresses without their own cap; 0 means no limit"
+            )
+            tolerance_days = st.number_input(
+                "Tolerance (days)",
+                min_value=0,
+                max_value=14,
+                value=st.session_state.system_settings.load_leveling_tolerance_days,
+                help="How far a due date may move earlier or later"
+            )
+        
+        # Overnight drafts
+        with st.container():
+            st.subheader("Overnight Drafts")
+            
+            pregenerate_drafts = st.checkbox(
+                "Write drafts ahead of time for contacts coming due",
+                value=st.session_state.system_settings.pregenerate_drafts,
+                help="The worker drafts them during the off-peak hours below so they're ready in the morning"
+            )
+            horizon_hours = st.number_input(
+                "Look Ahead (hours)",
+                min_value=1,
+                max_value=168,
+                value=st.session_state.system_settings.pregeneration_horizon_hours
+            )
+            token_budget = st.number_input(
+                "Nightly Token Budget",
+                min_value=0,
+                step=10000,
+                value=st.session_state.system_settings.pregeneration_token_budget,
+                help="Estimated prompt and reply tokens the worker may spend per night"
+            )
+            start_col, end_col = st.columns(2)
+            with start_col:
+                off_peak_start = st.number_input(
+                    "Off-Peak Start (hour)",
+                    min_value=0,
+                    max_value=23,
+                    value=st.session_state.system_settings.off_peak_start_hour
+                )
+            with end_col:
+                off_peak_end = st.number_input(
+                    "Off-Peak End (hour)",
+                    min_value=0,
+                    max_value=23,
+                    value=st.session_state.system_settings.off_peak_end_hour,
+                    help="May be earlier than the start to span midnight"
+                )
+        
         # Save button for email settings
         if st.button("Save Email Settings"):
             # Update the system settings
             st.session_state.system_settings.bcc_email = bcc_email if bcc_email else None
+            st.session_state.system_settings.load_leveling = load_leveling
+            st.session_state.system_settings.default_daily_send_cap = default_daily_send_cap
+            st.session_state.system_settings.load_leveling_tolerance_days = tolerance_days
+            st.session_state.system_settings.pregenerate_drafts = pregenerate_drafts
+            st.session_state.system_settings.pregeneration_horizon_hours = horizon_hours
+            st.session_state.system_settings.pregeneration_token_budget = token_budget
+            st.session_state.system_settings.off_peak_start_hour = off_peak_start
+            st.session_state.system_settings.off_peak_end_hour = off_peak_end
+            get_store().save_settings(st.session_state.system_settings)
             st.success("Email settings updated successfully!")
+        
+        if st.button("Level Schedule Now"):
+            # Level even if automatic leveling is off; that is what the button is for
+            settings = st.session_state.system_settings.model_copy(update={"load_leveling": True})
+            moved = adjust_schedule(get_store(), settings)
+            st.success(f"Moved {len(moved)} contacts onto special dates and under the daily caps.")
     
     with tab4:
         st.header("System Prompts")
@@ -211,11 +304,28 @@ def show_settings():
             )
             
             st.info("This prompt guides the AI when generating emails to your contacts. Customize it to match your communication style and relationship goals.")
+            
+            context_token_budget = st.number_input(
+                "Context Token Budget",
+                min_value=200,
+                max_value=32000,
+                step=100,
+                value=st.session_state.system_settings.context_token_budget,
+                help="Approximate tokens of instructions, category rules, notes and research to include per contact"
+            )
+            step_pipeline = st.checkbox(
+                "Run the prompt's steps as separate requests",
+                value=st.session_state.system_settings.step_pipeline,
+                help="Research and the four writing steps run in parallel, giving subject line options and three email lengths per draft"
+            )
         
         # Save button for system prompts
         if st.button("Save System Prompts"):
             # Update the system settings
             st.session_state.system_settings.system_prompt = system_prompt
+            st.session_state.system_settings.context_token_budget = context_token_budget
+            st.session_state.system_settings.step_pipeline = step_pipeline
+            get_store().save_settings(st.session_state.system_settings)
             st.success("System prompts updated successfully!")
     
     # App information at the bottom
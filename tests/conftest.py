@@ -0,0 +1,76 @@
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, NamedTuple
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class Reply(NamedTuple):
+    status: int = 200
+    headers: dict[str, str] = {}
+    body: bytes = b""
+    chunked: bool = False
+
+
+class StandIn:
+    """Local HTTP/1.1 keep-alive server whose paths answer from `routes`
+
+    A route gets the request headers and returns a Reply. Every request is
+    recorded in `hits` as (path, client port), so tests can count server
+    requests and the connections they came on.
+    """
+
+    def __init__(self):
+        self.routes: dict[str, Callable[[dict[str, str]], Reply]] = {}
+        self.hits: list[tuple[str, int]] = []
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stand_in.hits.append((self.path, self.client_address[1]))
+                route = stand_in.routes.get(self.path)
+                reply = route({k.lower(): v for k, v in self.headers.items()}) if route else Reply(404)
+                self.send_response(reply.status)
+                for name, value in reply.headers.items():
+                    self.send_header(name, value)
+                if reply.chunked:
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for start in range(0, len(reply.body), 40):
+                        piece = reply.body[start:start + 40]
+                        self.wfile.write(b"%x\r\n%s\r\n" % (len(piece), piece))
+                    self.wfile.write(b"0\r\nX-Trailer: yes\r\n\r\n")
+                else:
+                    self.send_header("Content-Length", str(len(reply.body)))
+                    self.end_headers()
+                    self.wfile.write(reply.body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def url(self, path: str) -> str:
+        return self.base + path
+
+    def paths(self) -> list[str]:
+        return [path for path, _ in self.hits]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stand_in():
+    server = StandIn()
+    yield server
+    server.close()
@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models.schemas import CadenceFrequency, Contact
+from utils.cadence import recompute_next_outreach_dates
+from utils.helpers import get_next_outreach_date
+
+NOW = datetime(2026, 10, 18, 9, 30)
+
+
+def contact(cadence, last_contact, custom_cadence=None):
+    return Contact(id="c", name="Ada", email="ada@example.com", cadence_frequency=cadence,
+                   custom_cadence=custom_cadence, last_contact=last_contact, next_outreach_date=NOW)
+
+
+@pytest.mark.parametrize("cadence, custom_cadence", [
+    (CadenceFrequency.WEEKLY, None),
+    (CadenceFrequency.MONTHLY, None),
+    (CadenceFrequency.QUARTERLY, None),
+    (CadenceFrequency.CUSTOM, None),
+    (CadenceFrequency.CUSTOM, "every 2nd tuesday"),
+    (CadenceFrequency.CUSTOM, "every 45 days but skip december"),
+])
+@pytest.mark.parametrize("last_contact", [None, NOW, NOW - timedelta(days=20), NOW - timedelta(days=400, hours=3)])
+def test_single_and_bulk_paths_agree(cadence, custom_cadence, last_contact):
+    c = contact(cadence, last_contact, custom_cadence)
+    single = get_next_outreach_date(c, NOW)
+    [bulk] = recompute_next_outreach_dates([c], NOW)
+    assert bulk.next_outreach_date == single
+    assert single > NOW
+
+
+def test_next_date_follows_the_series_from_the_last_contact():
+    c = contact(CadenceFrequency.WEEKLY, NOW - timedelta(days=20))
+    assert get_next_outreach_date(c, NOW) == NOW + timedelta(days=1)
+    assert get_next_outreach_date(contact(CadenceFrequency.WEEKLY, None), NOW) == NOW + timedelta(days=7)
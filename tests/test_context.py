@@ -0,0 +1,24 @@
+from datetime import datetime, timedelta
+
+from models.schemas import Note
+from utils.context import assemble_context, estimate_tokens
+
+
+def notes(count):
+    start = datetime(2026, 1, 1)
+    return [Note(text=f"Talked about the quarterly roadmap and hiring plans, round {i}",
+                 created_at=start + timedelta(days=i)) for i in range(count)]
+
+
+def test_omitted_notes_line_fits_in_the_budget():
+    for budget in (20, 40, 75, 120, 300):
+        context = assemble_context(None, "", notes(30), [], budget)
+        assert context.total_tokens <= budget
+        assert "omitted for length" in context.sections["notes"]
+
+
+def test_all_notes_kept_when_they_fit():
+    context = assemble_context(None, "", notes(3), [], 1000)
+    assert "omitted" not in context.sections["notes"]
+    assert context.sections["notes"].count("\n") == 2
+    assert context.total_tokens == estimate_tokens(context.sections["notes"])
@@ -0,0 +1,53 @@
+import asyncio
+
+from conftest import Reply
+from utils.crawler import Crawler
+
+
+def test_chunked_responses_reuse_one_connection(stand_in):
+    for i in range(5):
+        stand_in.routes[f"/p{i}"] = lambda headers, i=i: Reply(body=f"page {i} ".encode() * 30, chunked=True)
+
+    async def crawl():
+        async with Crawler(max_per_host=1, crawl_delay=0) as crawler:
+            bodies = [(await crawler.request("GET", stand_in.url(f"/p{i}"))).body for i in range(5)]
+            return bodies, crawler.report()[stand_in.base]
+
+    bodies, stats = asyncio.run(crawl())
+    assert bodies == [f"page {i} ".encode() * 30 for i in range(5)]
+    assert stand_in.paths() == [f"/p{i}" for i in range(5)]
+    assert stats.reused == 4
+    assert len({port for _, port in stand_in.hits}) == 1
+
+
+def test_per_host_limit_and_size_cap(stand_in):
+    stand_in.routes["/big"] = lambda headers: Reply(body=b"x" * 5000)
+    for i in range(6):
+        stand_in.routes[f"/s{i}"] = lambda headers: Reply(body=b"small")
+
+    async def crawl():
+        async with Crawler(max_per_host=2, crawl_delay=0, max_bytes=1000) as crawler:
+            big = await crawler.request("GET", stand_in.url("/big"))
+            await asyncio.gather(*(crawler.request("GET", stand_in.url(f"/s{i}")) for i in range(6)))
+            return big, crawler.report()[stand_in.base]
+
+    big, stats = asyncio.run(crawl())
+    assert big.body == b"x" * 1000
+    assert stats.requests == 7
+    # The truncated response's connection is dropped, and at most two are open at once after it
+    assert len({port for _, port in stand_in.hits}) <= 3
+
+
+def test_crawl_delay_spaces_request_starts():
+    async def crawl():
+        crawler = Crawler(crawl_delay=0.1)
+        host = crawler._host("http://example.test")
+        loop = asyncio.get_running_loop()
+        starts = []
+        for _ in range(3):
+            await crawler._wait_turn(host)
+            starts.append(loop.time())
+        return starts
+
+    starts = asyncio.run(crawl())
+    assert starts[2] - starts[0] >= 0.19
@@ -0,0 +1,28 @@
+import os
+
+from utils.disk_cache import DiskCache
+
+
+def test_size_tracks_overwrites_and_deletes(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1000)
+    for _ in range(20):
+        cache.write("aa11", b"x" * 100)
+    cache.write("bb22", b"y" * 50)
+    assert cache._size == 150
+    cache.delete("aa11")
+    cache.delete("aa11")
+    assert cache._size == 50
+    assert cache.read("bb22") == b"y" * 50
+
+
+def test_evicts_least_recently_used_past_max_bytes(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=250)
+    cache.write("aa11", b"a" * 100)
+    cache.write("bb22", b"b" * 100)
+    os.utime(cache.path("aa11"), (1000, 1000))
+    os.utime(cache.path("bb22"), (2000, 2000))
+    cache.read("aa11")
+    cache.write("cc33", b"c" * 100)
+    assert cache.read("bb22") is None
+    assert cache.read("aa11") == b"a" * 100
+    assert cache._size == 200
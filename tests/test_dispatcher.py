@@ -0,0 +1,164 @@
+import asyncio
+import random
+
+import pytest
+
+from utils.dispatcher import CircuitBreaker, CircuitOpenError, Dispatcher, Lane, TokenBucket, use_lane
+from utils.http_client import HTTPError
+
+
+class FakeTime:
+    """A clock that only moves when something sleeps on it"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def clock(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+        await asyncio.sleep(0)
+
+
+class Scripted:
+    """Provider that raises or returns its scripted replies in turn, then answers "ok" """
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.prompts = []
+
+    async def complete(self, prompt, system=None, json_mode=False):
+        self.prompts.append(prompt)
+        reply = self.replies.pop(0) if self.replies else "ok"
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+
+def dispatcher(fake, **options):
+    return Dispatcher(**{"requests_per_minute": 600, "tokens_per_minute": 10 ** 9, "batch_share": 1.0,
+                         "clock": fake.clock, "sleep": fake.sleep, **options})
+
+
+def send(dispatcher, provider, prompt="hi", lane=Lane.BATCH):
+    async def run():
+        with use_lane(lane):
+            return await dispatcher.complete(provider, prompt, None, False)
+    return asyncio.run(run())
+
+
+def test_token_bucket_refills_up_to_a_minutes_worth():
+    fake = FakeTime()
+    bucket = TokenBucket(60, fake.clock)  # One a second
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    fake.now += 0.25
+    assert bucket.wait_time(1) == pytest.approx(0.75)
+    fake.now += 600
+    assert bucket.level < 60 and bucket.wait_time(60) == 0
+    assert bucket.level == 60
+    bucket.take(10)
+    # Leaving a reserve behind, and a request bigger than the bucket waits for a full one
+    assert bucket.wait_time(45, reserve=12) == pytest.approx(7.0)
+    assert bucket.wait_time(1000) == pytest.approx(10.0)
+
+
+def test_batch_lane_leaves_the_reserve_to_interactive_requests():
+    fake = FakeTime()
+    gate = dispatcher(fake, requests_per_minute=10, batch_share=0.8)
+    provider = Scripted()
+    for _ in range(8):
+        send(gate, provider)
+    assert fake.sleeps == []
+    # The batch lane has used its share; an interactive request still goes at once
+    send(gate, provider, lane=Lane.INTERACTIVE)
+    assert fake.sleeps == []
+    send(gate, provider)
+    assert sum(fake.sleeps) == pytest.approx(6.0 * 2)  # Two requests' refill at 10 a minute
+    assert len(provider.prompts) == 10
+
+
+def test_interactive_requests_jump_the_queue():
+    fake = FakeTime()
+    gate = dispatcher(fake, requests_per_minute=60)
+    gate.requests.take(60)
+    provider = Scripted()
+
+    async def run():
+        async def request(prompt, lane):
+            with use_lane(lane):
+                await gate.complete(provider, prompt, None, False)
+        await asyncio.gather(request("batch 1", Lane.BATCH), request("batch 2", Lane.BATCH),
+                             request("interactive", Lane.INTERACTIVE))
+
+    asyncio.run(run())
+    assert provider.prompts == ["interactive", "batch 1", "batch 2"]
+
+
+def test_rate_limited_requests_wait_for_retry_after():
+    fake = FakeTime()
+    gate = dispatcher(fake, base_delay=1.0, max_delay=30.0)
+    provider = Scripted(HTTPError(429, b"slow down", {"retry-after": "7"}), HTTPError(503), "done")
+    assert send(gate, provider) == "done"
+    assert len(provider.prompts) == 3
+    first, second = fake.sleeps
+    assert first == 7.0  # Retry-After outranks the jittered backoff of at most 1s
+    assert 0 <= second <= 2.0
+
+
+def test_backoff_is_jittered_and_capped():
+    fake = FakeTime()
+    random.seed(4)
+    gate = dispatcher(fake, max_retries=6, base_delay=1.0, max_delay=8.0)
+    assert send(gate, Scripted(*(HTTPError(500) for _ in range(6)))) == "ok"
+    assert len(fake.sleeps) == 6
+    for attempt, delay in enumerate(fake.sleeps):
+        assert 0 <= delay <= min(8.0, 2 ** attempt)
+    assert len(set(fake.sleeps)) == 6
+
+
+def test_requests_that_cannot_succeed_are_not_retried():
+    fake = FakeTime()
+    gate = dispatcher(fake)
+    provider = Scripted(HTTPError(400, b"bad request"))
+    with pytest.raises(HTTPError):
+        send(gate, provider)
+    assert len(provider.prompts) == 1 and fake.sleeps == []
+    assert gate.breaker.failures == 0
+
+
+def test_circuit_breaker_opens_half_opens_and_closes():
+    fake = FakeTime()
+    breaker = CircuitBreaker(threshold=3, reset_seconds=10, clock=fake.clock)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+    fake.now += 10
+    assert breaker.state == "half-open"
+    assert breaker.allow() and not breaker.allow()  # One trial at a time
+    breaker.record_failure()
+    assert breaker.state == "open"  # The trial failed
+    fake.now += 10
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+
+
+def test_an_open_circuit_fails_fast_until_the_trial_succeeds():
+    fake = FakeTime()
+    gate = dispatcher(fake, max_retries=0, breaker=CircuitBreaker(threshold=2, reset_seconds=30, clock=fake.clock))
+    provider = Scripted(HTTPError(502), HTTPError(502))
+    for _ in range(2):
+        with pytest.raises(HTTPError):
+            send(gate, provider)
+    with pytest.raises(CircuitOpenError):
+        send(gate, provider)
+    assert len(provider.prompts) == 2
+    fake.now += 30
+    assert send(gate, provider) == "ok"
+    assert gate.breaker.state == "closed"
@@ -0,0 +1,97 @@
+import asyncio
+
+from conftest import Reply
+from utils.crawler import Crawler
+from utils.fetch_cache import FetchCache
+
+HTML = {"Content-Type": "text/html; charset=utf-8"}
+
+
+def page(text):
+    return f"<html><head><title>{text}</title></head><body><p>{text} body</p></body></html>".encode()
+
+
+def fetch_all(cache, urls, **crawler_options):
+    async def run():
+        async with Crawler(crawl_delay=0, **crawler_options) as crawler:
+            return await cache.fetch_many(urls, crawler), crawler.report()
+    return asyncio.run(run())
+
+
+def test_fresh_entries_skip_the_network(stand_in, tmp_path):
+    stand_in.routes["/a"] = lambda headers: Reply(headers={**HTML, "Cache-Control": "max-age=600"}, body=page("A"))
+    cache = FetchCache(str(tmp_path))
+    [first], _ = fetch_all(cache, [stand_in.url("/a")])
+    [second], _ = fetch_all(cache, [stand_in.url("/a?utm_source=mail")])
+    assert (first.source, second.source) == ("network", "fresh")
+    assert second.title == "A" and second.text == "A body"
+    assert stand_in.paths() == ["/a"]
+
+
+def test_etag_revalidation_gets_a_304(stand_in, tmp_path):
+    def route(headers):
+        if headers.get("if-none-match") == '"v1"':
+            return Reply(304, {"ETag": '"v1"'})
+        return Reply(headers={**HTML, "ETag": '"v1"'}, body=page("A"))
+
+    stand_in.routes["/a"] = route
+    cache = FetchCache(str(tmp_path), fresh_seconds=0)
+    [first], _ = fetch_all(cache, [stand_in.url("/a")])
+    [second], _ = fetch_all(cache, [stand_in.url("/a")])
+    assert (first.source, second.source) == ("network", "revalidated")
+    assert second.text == "A body"
+    assert cache.revalidations == 1
+    assert stand_in.paths() == ["/a", "/a"]
+
+
+def test_follows_redirects(stand_in, tmp_path):
+    stand_in.routes["/old"] = lambda headers: Reply(301, {"Location": "/new"})
+    stand_in.routes["/new"] = lambda headers: Reply(headers=HTML, body=page("New"))
+    [fetched], _ = fetch_all(FetchCache(str(tmp_path)), [stand_in.url("/old")])
+    assert (fetched.source, fetched.status, fetched.title) == ("network", 200, "New")
+    assert stand_in.paths() == ["/old", "/new"]
+
+
+def test_failures_are_remembered(stand_in, tmp_path):
+    cache = FetchCache(str(tmp_path))
+    [first], _ = fetch_all(cache, [stand_in.url("/missing")])
+    [second], _ = fetch_all(cache, [stand_in.url("/missing")])
+    assert (first.source, second.source) == ("error", "error")
+    assert first.error == second.error == "HTTP 404"
+    assert stand_in.paths() == ["/missing"]
+
+
+def test_serves_a_stale_copy_when_revalidation_fails(stand_in, tmp_path):
+    stand_in.routes["/a"] = lambda headers: Reply(headers=HTML, body=page("A"))
+    cache = FetchCache(str(tmp_path), fresh_seconds=0)
+    fetch_all(cache, [stand_in.url("/a")])
+    stand_in.routes["/a"] = lambda headers: Reply(503)
+    [stale], _ = fetch_all(cache, [stand_in.url("/a")])
+    assert (stale.source, stale.text, stale.error) == ("stale", "A body", "HTTP 503")
+
+
+def test_chunked_pages_share_one_connection(stand_in, tmp_path):
+    for i in range(5):
+        stand_in.routes[f"/p{i}"] = lambda headers, i=i: Reply(headers=HTML, body=page(f"Page {i}" + " text" * 40), chunked=True)
+    urls = [stand_in.url(f"/p{i}") for i in range(5)]
+    pages, report = fetch_all(FetchCache(str(tmp_path)), urls, max_per_host=1)
+    assert [p.title for p in pages] == [f"Page {i}" + " text" * 40 for i in range(5)]
+    assert sorted(stand_in.paths()) == [f"/p{i}" for i in range(5)]
+    assert report[stand_in.base].reused == 4
+    assert len({port for _, port in stand_in.hits}) == 1
+
+
+def test_keeps_at_most_text_tokens_of_a_page(stand_in, tmp_path):
+    stand_in.routes["/long"] = lambda headers: Reply(headers=HTML, body=b"<p>" + b"word " * 50000 + b"</p>")
+    [fetched], _ = fetch_all(FetchCache(str(tmp_path), text_tokens=100), [stand_in.url("/long")])
+    assert fetched.source == "network"
+    assert len(fetched.text.split()) == 100
+
+
+def test_disk_use_stays_under_max_bytes(stand_in, tmp_path):
+    for i in range(20):
+        stand_in.routes[f"/p{i}"] = lambda headers, i=i: Reply(headers=HTML, body=page(f"Page {i} " + "x" * 400))
+    cache = FetchCache(str(tmp_path), max_bytes=4000)
+    fetch_all(cache, [stand_in.url(f"/p{i}") for i in range(20)])
+    assert 0 < cache.files._size <= 4000
+    assert cache.files._size == sum(size for _, _, size in cache.files._entries())
@@ -0,0 +1,121 @@
+from datetime import datetime
+
+import pytest
+
+import utils.fetch_cache
+import utils.topic_research
+from conftest import Reply
+from models.schemas import Contact
+from utils.fetch_cache import FetchCache
+from utils.generation import ESTIMATED_COMPLETION_TOKENS, ESTIMATED_SUMMARY_TOKENS, estimate_draft_tokens, \
+    generate_drafts_sync, stream_draft
+from utils.llm import MockProvider
+from utils.outreach_steps import PAGE_TOKEN_BUDGET
+from utils.store import ContactStore
+from utils.topic_research import TopicResearch
+
+HTML = {"Content-Type": "text/html; charset=utf-8", "Cache-Control": "no-cache"}
+
+
+class Counting(MockProvider):
+    """MockProvider that records every prompt it answers"""
+
+    def __init__(self):
+        super().__init__()
+        self.prompts = []
+        self.streamed = []
+        self.news = None  # Answer to topic research, when set
+
+    async def complete(self, prompt, system=None, json_mode=False):
+        self.prompts.append(prompt)
+        if self.news and "TASK (topic)" in prompt:
+            return self.news
+        return await super().complete(prompt, system, json_mode)
+
+    def stream(self, prompt, system=None, json_mode=False):
+        self.streamed.append(prompt)
+        return super().stream(prompt, system, json_mode)
+
+
+@pytest.fixture
+def caches(tmp_path, monkeypatch):
+    research = TopicResearch(str(tmp_path / "topics"))
+    monkeypatch.setattr(utils.fetch_cache, "_cache", FetchCache(str(tmp_path / "pages")))
+    monkeypatch.setattr(utils.topic_research, "_research", research)
+    return research
+
+
+def test_drafts_are_redone_when_their_pages_change(stand_in, tmp_path, caches):
+    text = {"/a": "Launched the new roaster"}
+    stand_in.routes["/a"] = lambda headers: Reply(headers=HTML, body=f"<p>{text['/a']}</p>".encode())
+    store = ContactStore(str(tmp_path / "kadence.db"))
+    store.save_contacts([Contact(id="a", name="Ada", email="ada@example.com", next_outreach_date=datetime(2026, 11, 1),
+                                 relevant_websites=[stand_in.url("/a")])])
+    provider = Counting()
+
+    first = generate_drafts_sync(store, store.get_contacts(["a"]), provider)
+    sent = len(provider.prompts)
+    assert sent and not first.failures
+    # Same page text: the draft is reused without asking the LLM again
+    assert generate_drafts_sync(store, store.get_contacts(["a"]), provider).drafts[0].fingerprint \
+        == first.drafts[0].fingerprint
+    assert len(provider.prompts) == sent
+
+    text["/a"] = "Opened a second cafe"
+    again = generate_drafts_sync(store, store.get_contacts(["a"]), provider)
+    assert again.drafts[0].fingerprint != first.drafts[0].fingerprint
+    assert any("Opened a second cafe" in prompt for prompt in provider.prompts[sent:])
+
+
+def test_drafts_are_redone_when_their_research_changes(tmp_path, caches):
+    caches.ttl_seconds = 0  # Every run researches again
+    store = ContactStore(str(tmp_path / "kadence.db"))
+    store.save_contacts([Contact(id="a", name="Ada", email="ada@example.com", next_outreach_date=datetime(2026, 11, 1),
+                                 keywords=["Coffee"])])
+    provider = Counting()
+    provider.news = "Prices are up"
+
+    first = generate_drafts_sync(store, store.get_contacts(["a"]), provider)
+    assert generate_drafts_sync(store, store.get_contacts(["a"]), provider).drafts[0].fingerprint \
+        == first.drafts[0].fingerprint
+
+    provider.news = "A record harvest"
+    sent = len(provider.prompts)
+    again = generate_drafts_sync(store, store.get_contacts(["a"]), provider)
+    assert again.drafts[0].fingerprint != first.drafts[0].fingerprint
+    assert any("A record harvest" in prompt for prompt in provider.prompts[sent:])
+
+
+def test_estimates_cost_the_requests_the_pipeline_sends(tmp_path):
+    store = ContactStore(str(tmp_path / "kadence.db"))
+    contacts = [Contact(id=i, name=i, email=f"{i}@example.com", next_outreach_date=datetime(2026, 11, 1),
+                        relevant_websites=["https://example.com/blog"], keywords=["Coffee"]) for i in ("a", "b")]
+    settings = store.get_settings()
+    first, second = estimate_draft_tokens(store, contacts, settings)
+    # Step A's page text, its summary and Step B's summary all go into Steps F-I
+    assert second > PAGE_TOKEN_BUDGET + 3 * ESTIMATED_SUMMARY_TOKENS + ESTIMATED_COMPLETION_TOKENS
+    # The shared keyword is researched once, for the first contact
+    assert first - second > ESTIMATED_SUMMARY_TOKENS
+    [one_shot, _] = estimate_draft_tokens(store, contacts, settings.model_copy(update={"step_pipeline": False}))
+    assert one_shot < second
+
+
+def test_streamed_drafts_follow_the_batch_pipeline(stand_in, tmp_path, caches):
+    stand_in.routes["/a"] = lambda headers: Reply(headers=HTML, body=b"<p>Launched the new roaster</p>")
+    store = ContactStore(str(tmp_path / "kadence.db"))
+    store.save_contacts([Contact(id="a", name="Ada", email="ada@example.com", next_outreach_date=datetime(2026, 11, 1),
+                                 relevant_websites=[stand_in.url("/a")], keywords=["Coffee"])])
+    [contact] = store.get_contacts(["a"])
+    provider = Counting()
+
+    assert "Hi Ada" in "".join(stream_draft(store, contact, provider))
+    # Steps A and B ran first, and only the Steps F-I request was streamed, over their results
+    assert any("TASK (sources)" in prompt for prompt in provider.prompts)
+    [streamed] = provider.streamed
+    assert "TASK (variants)" in streamed and "From their websites" in streamed
+    streamed_draft = store.get_draft("a", contact.next_outreach_date)
+
+    sent = len(provider.prompts)
+    batch = generate_drafts_sync(store, [contact], provider)
+    assert batch.drafts[0].fingerprint == streamed_draft.fingerprint
+    assert len(provider.prompts) == sent
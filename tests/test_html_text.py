@@ -0,0 +1,66 @@
+import pytest
+
+from utils.html_text import extract_text
+
+ARTICLE = """<!doctype html><html><head><title>Big  News &amp; More</title>
+<meta property="article:published_time" content="2026-10-01T09:00:00Z"><style>body{color:red}</style>
+<script>var x = "<p>not text</p>";</script></head><body>
+<nav><ul><li><a href="/">Home</a></li><li>About</li></ul></nav>
+<div class="cookie-banner">We use cookies</div>
+<main><article><h1>We <b>launched</b> today</h1><p>Our new product is<br>live &mdash; try it.</p>
+<ul><li>Fast</li><li>Cheap</li></ul><div class="share-buttons">Tweet</div><p hidden>secret</p></article></main>
+<aside>Related posts</aside><footer>(c) 2026</footer></body></html>"""
+
+
+def test_extracts_text_title_and_date():
+    page = extract_text(ARTICLE)
+    assert page.title == "Big News & More"
+    assert page.published == "2026-10-01T09:00:00Z"
+    assert page.text == "We launched today\n\nOur new product is\nlive — try it.\n\n- Fast\n- Cheap"
+    assert not page.truncated
+
+
+def test_streamed_pieces_match_whole_page():
+    pieces = [ARTICLE[i:i + 7] for i in range(0, len(ARTICLE), 7)]
+    assert extract_text(pieces) == extract_text(ARTICLE)
+
+
+def test_stops_reading_at_the_budget():
+    fed = []
+
+    def pieces():
+        for i in range(1000):
+            fed.append(i)
+            yield "<p>" + "word " * 100 + "</p>"
+
+    page = extract_text(pieces(), max_tokens=50)
+    assert page.truncated
+    assert len(page.text.split()) == 50
+    assert len(fed) == 1
+
+
+@pytest.mark.parametrize("element", [
+    '<body class="right-sidebar nav-float-right">',
+    '<body class="single post has-sidebar">',
+    '<body class="et_pb_footer_columns4">',
+    '<body><main class="site-main has-sidebar">',
+    '<body><article class="post share-enabled">',
+])
+def test_theme_classes_on_page_containers_keep_the_page(element):
+    page = extract_text(f"<html>{element}<p>Article body</p></html>")
+    assert page.text == "Article body"
+
+
+def test_implied_end_of_li_ends_the_skip():
+    page = extract_text('<ul><li class="share-item">Share<li>Real item</ul><p>Article body</p>')
+    assert page.text == "- Real item\n\nArticle body"
+
+
+def test_implied_end_of_p_ends_the_skip():
+    page = extract_text('<p class="promo">Buy now<div>Article body</div>')
+    assert page.text == "Article body"
+
+
+def test_parent_end_tag_ends_the_skip():
+    page = extract_text('<div><div class="newsletter">Sign up<span>today</div><p>Article body</p>')
+    assert page.text == "Article body"
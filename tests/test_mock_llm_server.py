@@ -0,0 +1,108 @@
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from models.schemas import Contact
+from utils.generation import generate_drafts
+from utils.llm import ChatCompletionsProvider, LimitedProvider, mock_completion
+from utils.mock_llm_server import MockLLMHandler, start_server
+from utils.store import ContactStore
+
+SLOW = "Slowpoke"
+
+
+class Recording(MockLLMHandler):
+    """Counts requests in flight and holds replies about SLOW back for `slow_seconds`
+
+    start_server subclasses the handler, so each server counts on its own class.
+    """
+
+    lock = threading.Lock()
+    in_flight = 0
+    peak = 0
+    slow_seconds = 0.0
+
+    def do_POST(self):
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.peak = max(cls.peak, cls.in_flight)
+        try:
+            super().do_POST()
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+    def _reply(self, status, payload):
+        if SLOW in json.dumps(payload):
+            time.sleep(self.slow_seconds)
+        super()._reply(status, payload)
+
+
+@pytest.fixture
+def server():
+    server = start_server(latency=0.05, handler=Recording)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def provider(server):
+    return ChatCompletionsProvider(f"http://127.0.0.1:{server.server_port}/v1", model="mock")
+
+
+def store_with(tmp_path, names):
+    store = ContactStore(str(tmp_path / "kadence.db"))
+    store.save_contacts([Contact(id=name.lower(), name=name, email=f"{name.lower()}@example.com",
+                                 next_outreach_date=datetime(2026, 11, 1)) for name in names])
+    return store
+
+
+def test_chat_completions_provider(server):
+    client = provider(server)
+    prompt = 'HEADER: "Prompt to send Ada Lovelace to LLM for example generations."'
+
+    async def run():
+        whole = await client.complete(prompt, "Be brief", json_mode=True)
+        streamed = [chunk async for chunk in client.stream(prompt)]
+        return whole, streamed
+
+    whole, streamed = asyncio.run(run())
+    assert whole == mock_completion(prompt)
+    assert len(streamed) > 1 and "".join(streamed) == whole
+
+
+def test_limited_provider_caps_requests_in_flight(server):
+    limited = LimitedProvider(provider(server), concurrency=3, timeout=10)
+
+    async def run():
+        return await asyncio.gather(*(limited.complete(f"prompt {i}") for i in range(12)))
+
+    assert len(asyncio.run(run())) == 12
+    assert 1 < server.RequestHandlerClass.peak <= 3
+
+
+def test_a_slow_reply_fails_only_its_own_contact(server, tmp_path):
+    server.RequestHandlerClass.slow_seconds = 2.0
+    names = ["Ada", "Grace", SLOW, "Alan"]
+    store = store_with(tmp_path, names)
+    result = asyncio.run(generate_drafts(store, store.get_contacts([n.lower() for n in names]), provider(server),
+                                         concurrency=2, timeout=0.5))
+    assert sorted(d.contact_id for d in result.drafts) == ["ada", "alan", "grace"]
+    assert list(result.failures) == [SLOW.lower()] and "TimeoutError" in result.failures[SLOW.lower()]
+    assert server.RequestHandlerClass.peak <= 2
+
+
+def test_drafts_written_before_an_interruption_are_kept(server, tmp_path):
+    server.RequestHandlerClass.slow_seconds = 5.0
+    names = ["Ada", "Grace", SLOW]
+    store = store_with(tmp_path, names)
+    batch = generate_drafts(store, store.get_contacts([n.lower() for n in names]), provider(server),
+                            concurrency=1, timeout=30, save_every=50)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(asyncio.wait_for(batch, 1.5))
+    assert store.drafted_ids([(n.lower(), datetime(2026, 11, 1)) for n in names]) == {"ada", "grace"}
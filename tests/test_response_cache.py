@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+import utils.response_cache as response_cache
+from models.schemas import DraftVariants
+from utils.llm import LimitedProvider
+from utils.outreach_steps import write_variants
+from utils.response_cache import CachedProvider, ResponseCache
+
+VARIANTS = json.dumps({"subjects": ["Hello"], "variants": {"short": "s", "medium": "m", "reply_optimized": "r"}})
+
+
+class Scripted:
+    """Provider that answers from a list of replies and records every prompt it gets"""
+
+    def __init__(self, replies, model="a"):
+        self.replies = list(replies)
+        self.model = model
+        self.prompts = []
+
+    def identity(self):
+        return {"model": self.model}
+
+    async def complete(self, prompt, system=None, json_mode=False):
+        self.prompts.append(prompt)
+        return self.replies.pop(0)
+
+
+def complete(provider, prompt):
+    return asyncio.run(provider.complete(prompt, "system"))
+
+
+def test_hits_misses_and_expiry(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+    cache = ResponseCache(str(tmp_path), ttl_seconds=60)
+    provider = CachedProvider(Scripted(["one", "two"]), cache)
+    assert complete(provider, "p") == "one"
+    now[0] += 59
+    assert complete(provider, "p") == "one"
+    now[0] += 2
+    assert complete(provider, "p") == "two"
+    assert cache.stats.snapshot() == {"hits": 1, "misses": 2, "hit_rate": 1 / 3}
+
+
+def test_keys_keep_providers_and_models_apart(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    first = CachedProvider(Scripted(["from a", "other system"]), cache)
+    second = CachedProvider(Scripted(["from b"], model="b"), cache)
+    assert complete(first, "p") == "from a"
+    assert complete(second, "p") == "from b"
+    assert asyncio.run(first.complete("p", "another")) == "other system"
+    assert cache.stats.hits == 0
+
+
+def test_only_the_repaired_reply_is_cached(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    inner = Scripted(['{"subjects": []}', VARIANTS])
+    first = asyncio.run(write_variants(LimitedProvider(CachedProvider(inner, cache), 4, 10), "prompt", "system"))
+    assert len(inner.prompts) == 2
+    cached = cache.get(response_cache.request_key(inner.identity(), "prompt", "system", True))
+    assert DraftVariants.model_validate_json(cached) == first
+    again = asyncio.run(write_variants(LimitedProvider(CachedProvider(inner, cache), 4, 10), "prompt", "system"))
+    assert again == first == DraftVariants.model_validate_json(VARIANTS)
+    assert len(inner.prompts) == 2
+
+
+def test_failed_repairs_are_not_cached(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    inner = Scripted(["not json", "still not json", VARIANTS])
+    provider = CachedProvider(inner, cache)
+    try:
+        asyncio.run(write_variants(provider, "prompt", "system"))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Expected the repair to fail")
+    assert asyncio.run(write_variants(provider, "prompt", "system")) == DraftVariants.model_validate_json(VARIANTS)
+    assert len(inner.prompts) == 3
@@ -0,0 +1,42 @@
+from datetime import date, datetime, timedelta
+
+from models.schemas import Contact
+from utils.load_leveling import adjust_schedule, plan_send_days
+from utils.store import ContactStore
+
+TODAY = date(2026, 10, 18)
+NINE = datetime(2026, 10, 18, 9, 0).time()
+
+
+def at(day):
+    return datetime.combine(day, NINE)
+
+
+def contact(contact_id, due, last_contact=None, birthday=None):
+    return Contact(id=contact_id, name=contact_id, email=f"{contact_id}@example.com", next_outreach_date=at(due),
+                   last_contact=last_contact, special_dates={"birthday": birthday} if birthday else {})
+
+
+def test_pinned_days_stay_and_count_toward_the_cap():
+    day = TODAY + timedelta(days=5)
+    planned = plan_send_days([day, day, day], cap=2, tolerance_days=3, today=TODAY, pinned=[False, False, True])
+    assert planned[2] == day
+    assert planned.count(day) == 2
+
+
+def test_birthday_outreach_respects_the_last_contact_and_survives_leveling(tmp_path):
+    store = ContactStore(str(tmp_path / "kadence.db"))
+    birthday = TODAY + timedelta(days=5)
+    store.save_contacts([
+        contact("due-later", TODAY + timedelta(days=20), at(TODAY - timedelta(days=30)), date(1990, 10, 23)),
+        contact("reached-yesterday", TODAY + timedelta(days=29), at(TODAY - timedelta(days=1)), date(1985, 10, 23)),
+        # Already on the birthday's day, filling it past the cap
+        contact("busy-1", birthday), contact("busy-2", birthday),
+    ])
+    settings = store.get_settings().model_copy(update={"load_leveling": True, "default_daily_send_cap": 2,
+                                                       "load_leveling_tolerance_days": 3})
+    adjust_schedule(store, settings, TODAY)
+    assert store.get_contact("due-later").next_outreach_date == at(birthday)
+    assert store.get_contact("reached-yesterday").next_outreach_date == at(TODAY + timedelta(days=29))
+    busy = [store.get_contact(cid).next_outreach_date for cid in ("busy-1", "busy-2")]
+    assert busy.count(at(birthday)) == 1
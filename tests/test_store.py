@@ -0,0 +1,32 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+from models.schemas import Contact
+from utils.store import ContactStore
+
+
+def contact(contact_id, last_contact=None):
+    now = datetime.now()
+    return Contact(id=contact_id, name=contact_id, email=f"{contact_id}@example.com",
+                   next_outreach_date=now + timedelta(days=30), last_contact=last_contact)
+
+
+def test_contacts_from_before_created_at_are_not_growth(tmp_path):
+    path = str(tmp_path / "kadence.db")
+    store = ContactStore(path)
+    store.save_contacts([contact("old", datetime.now() - timedelta(days=400)), contact("recent", datetime.now()),
+                         contact("never")])
+    store.close()
+    conn = sqlite3.connect(path)
+    conn.execute("ALTER TABLE contacts DROP COLUMN created_at")
+    conn.commit()
+    conn.close()
+
+    store = ContactStore(path)
+    assert store.metrics.snapshot()["growth_this_month"] == 0
+    # Saving a legacy contact again keeps its backfilled creation date
+    store.save_contacts([contact("never"), contact("new")])
+    assert store.metrics.snapshot()["growth_this_month"] == 1
+    store.reload_metrics()
+    assert store.metrics.snapshot()["growth_this_month"] == 1
+    assert store.metrics.snapshot()["total_contacts"] == 4
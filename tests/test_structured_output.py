@@ -0,0 +1,53 @@
+import json
+
+import utils.structured_output as structured_output
+from utils.structured_output import PartialJSON, repair_json
+
+REPLY = ('Sure!\n```json\n{"subjects": ["Hi \\"there\\"", "Quick q"], "n": -12.5e1, "ok": true, "none": null,\n'
+         ' "variants": {"short": "Line one\\nline two \\u00e9 \\ud83d\\ude00 \\\\ud83d \\\\\\ud83d\\ude00 end", "medium": "m", "reply_optimized": "r"},'
+         ' "tags": [[], {}, [1, 2]]}\n```')
+FINISHED = json.loads(REPLY[REPLY.index("{"):REPLY.rindex("}") + 1])
+
+
+def is_prefix(partial, finished):
+    if isinstance(partial, dict):
+        return isinstance(finished, dict) and all(k in finished and is_prefix(v, finished[k])
+                                                  for k, v in partial.items())
+    if isinstance(partial, list):
+        return (isinstance(finished, list) and len(partial) <= len(finished)
+                and all(is_prefix(p, f) for p, f in zip(partial, finished)))
+    if isinstance(partial, str):
+        return isinstance(finished, str) and finished.startswith(partial)
+    return partial == finished
+
+
+def test_each_feed_shows_a_prefix_of_the_finished_object(monkeypatch):
+    def no_repair(text):
+        raise AssertionError("Well-formed JSON should not need repair_json")
+
+    monkeypatch.setattr(structured_output, "repair_json", no_repair)
+    parser = PartialJSON()
+    shown = []
+    for ch in REPLY:
+        data = parser.feed(ch)
+        if data is not None:
+            assert is_prefix(data, FINISHED)
+            shown.append(json.dumps(data))
+    assert data == FINISHED
+    assert '{"subjects": ["Hi \\"there\\"", "Quick "]}' in shown
+    assert shown[0] == "{}"
+
+
+def test_chunks_of_any_size_decode_the_same():
+    for size in (1, 3, 17, len(REPLY)):
+        parser = PartialJSON()
+        for start in range(0, len(REPLY), size):
+            data = parser.feed(REPLY[start:start + size])
+        assert data == FINISHED
+
+
+def test_falls_back_to_repair_json_for_sloppy_replies():
+    parser = PartialJSON()
+    for ch in '{"a": 1, "b": \'x\'}':
+        data = parser.feed(ch)
+    assert data == repair_json('{"a": 1, "b": \'x\'}') == {"a": 1}
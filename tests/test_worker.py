@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+import worker
+from models.schemas import Contact, Draft
+from utils.generation import BatchResult
+from utils.store import ContactStore
+
+NOW = datetime(2026, 10, 18, 9, 0)
+
+
+def contact(contact_id, due):
+    return Contact(id=contact_id, name=contact_id, email=f"{contact_id}@example.com", next_outreach_date=due)
+
+
+def test_drains_due_contacts_and_requeues_failures(tmp_path, monkeypatch):
+    store = ContactStore(str(tmp_path / "kadence.db"))
+    store.save_contacts([contact("a", NOW - timedelta(hours=2)), contact("b", NOW - timedelta(hours=1)),
+                         contact("later", NOW + timedelta(days=1))])
+    batches = []
+
+    def generate(store, contacts, **kwargs):
+        batches.append([c.id for c in contacts])
+        drafts = [Draft(contact_id=c.id, due_at=c.next_outreach_date, body="Hi") for c in contacts if c.id == "a"]
+        store.save_drafts(drafts)
+        return BatchResult(drafts, {"b": "TimeoutError"})
+
+    monkeypatch.setattr(worker, "generate_drafts_sync", generate)
+    assert [d.contact_id for d in worker.draft_due_contacts(store, NOW)] == ["a"]
+    # Only the failure is still queued; the drafted contact was drained
+    assert store.scheduler.peek_due_before(NOW) == [(NOW - timedelta(hours=1), "b")]
+    worker.draft_due_contacts(store, NOW)
+    assert batches == [["a", "b"], ["b"]]
+    assert "later" in store.scheduler
+
+
+def test_reload_if_changed_sees_other_connections(tmp_path):
+    path = str(tmp_path / "kadence.db")
+    store, other = ContactStore(path), ContactStore(path)
+    assert not store.reload_if_changed()
+    other.save_contacts([contact("a", NOW)])
+    assert "a" not in store.scheduler
+    assert store.reload_if_changed()
+    assert "a" in store.scheduler
+    assert not store.reload_if_changed()
+
+
+def test_reschedule_records_the_outreach(tmp_path):
+    store = ContactStore(str(tmp_path / "kadence.db"))
+    store.save_contacts([contact("a", NOW)])
+    updated = store.scheduler.reschedule(store.get_contact("a"), contacted_at=NOW)
+    assert updated.last_contact == NOW
+    assert updated.next_outreach_date == NOW + timedelta(days=30)
+    assert store.scheduler.peek() == (updated.next_outreach_date, "a")
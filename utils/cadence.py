@@ -0,0 +1,58 @@
+from datetime import datetime
+from typing import Iterable
+import numpy as np
+from models.schemas import Contact, CadenceFrequency
+from utils.helpers import CADENCE_DAYS
+from utils.recurrence import next_occurrences
+
+# Integer code for each cadence, used to index the interval table
+CADENCE_ORDER = list(CadenceFrequency)
+CADENCE_CODES = {cadence: code for code, cadence in enumerate(CADENCE_ORDER)}
+CADENCE_INTERVALS = np.array([CADENCE_DAYS[cadence] for cadence in CADENCE_ORDER], dtype="timedelta64[D]")
+
+
+def encode_cadences(cadences: Iterable[CadenceFrequency | str]) -> np.ndarray:
+    """Map cadence values to integer codes for bulk_next_outreach_dates"""
+    return np.fromiter((CADENCE_CODES[CadenceFrequency(c)] for c in cadences), dtype=np.int8)
+
+
+def bulk_next_outreach_dates(cadence_codes: np.ndarray, last_contacts: np.ndarray,
+                             now: datetime | np.datetime64 | None = None) -> np.ndarray:
+    """Next outreach dates for many contacts in one vectorized pass
+
+    The rule of get_next_outreach_date: the first date after `now` in each
+    contact's cadence, counted from its last contact. Contacts never
+    reached (NaT) count from `now`, one shared value so the whole batch
+    agrees on the current time.
+    """
+    now = np.datetime64(now or datetime.now(), "us")
+    base = np.asarray(last_contacts, dtype="datetime64[us]")
+    base = np.where(np.isnat(base), now, base)
+    intervals = CADENCE_INTERVALS[np.asarray(cadence_codes)].astype("timedelta64[us]")
+    return base + ((now - base) // intervals + 1) * intervals
+
+
+def recompute_next_outreach_dates(contacts: list[Contact], now: datetime | None = None) -> list[Contact]:
+    """Copies of contacts with next_outreach_date recomputed from their cadence
+
+    Custom cadences with a recurrence rule get the rule's first occurrence
+    after `now`, anchored on the last contact, like get_next_outreach_date.
+    """
+    if not contacts:
+        return []
+    now = now or datetime.now()
+    codes = encode_cadences(c.cadence_frequency for c in contacts)
+    last_contacts = np.array([c.last_contact for c in contacts], dtype="datetime64[us]")
+    next_dates = bulk_next_outreach_dates(codes, last_contacts, now)
+
+    ruled = [i for i, c in enumerate(contacts)
+             if c.cadence_frequency == CadenceFrequency.CUSTOM and c.custom_cadence]
+    if ruled:
+        now64 = np.datetime64(now, "us")
+        anchors = np.where(np.isnat(last_contacts[ruled]), now64, last_contacts[ruled]).astype("datetime64[D]")
+        days = next_occurrences([contacts[i].custom_cadence for i in ruled], anchors, now)
+        time_of_day = now64 - now64.astype("datetime64[D]")
+        next_dates[ruled] = days.astype("datetime64[us]") + time_of_day
+
+    next_dates = next_dates.tolist()
+    return [c.model_copy(update={"next_outreach_date": when}) for c, when in zip(contacts, next_dates)]
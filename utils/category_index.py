@@ -0,0 +1,71 @@
+import threading
+from models.schemas import Category
+
+
+class CategoryIndex:
+    """Two-way index between categories and their member contacts
+
+    Kept up to date by the store on every write so that member counts are
+    O(1) and member/category lookups are O(k) instead of scanning every
+    contact for every category.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._categories: dict[str, Category] = {}
+        self._members: dict[str, set[str]] = {}
+        self._contact_categories: dict[str, list[str]] = {}
+
+    def load(self, categories: list[Category], memberships: list[tuple[str, str]]):
+        """Rebuild the index from categories and (contact_id, category_id) pairs"""
+        with self._lock:
+            self._categories = {cat.id: cat for cat in categories}
+            self._members = {cat.id: set() for cat in categories}
+            self._contact_categories = {}
+            for contact_id, category_id in memberships:
+                self._members.setdefault(category_id, set()).add(contact_id)
+                self._contact_categories.setdefault(contact_id, []).append(category_id)
+
+    def put_category(self, category: Category):
+        with self._lock:
+            self._categories[category.id] = category
+            self._members.setdefault(category.id, set())
+
+    def remove_category(self, category_id: str):
+        with self._lock:
+            self._categories.pop(category_id, None)
+            for contact_id in self._members.pop(category_id, set()):
+                self._contact_categories[contact_id] = [
+                    cid for cid in self._contact_categories.get(contact_id, []) if cid != category_id
+                ]
+
+    def put_contact(self, contact_id: str, category_ids: list[str]):
+        """Record a contact's current categories, replacing any previous ones"""
+        with self._lock:
+            for category_id in self._contact_categories.get(contact_id, []):
+                self._members.get(category_id, set()).discard(contact_id)
+            self._contact_categories[contact_id] = list(dict.fromkeys(category_ids))
+            for category_id in category_ids:
+                self._members.setdefault(category_id, set()).add(contact_id)
+
+    def remove_contact(self, contact_id: str):
+        with self._lock:
+            for category_id in self._contact_categories.pop(contact_id, []):
+                self._members.get(category_id, set()).discard(contact_id)
+
+    def member_ids(self, category_id: str) -> frozenset[str]:
+        """IDs of the contacts in a category"""
+        with self._lock:
+            return frozenset(self._members.get(category_id, ()))
+
+    def member_count(self, category_id: str) -> int:
+        with self._lock:
+            return len(self._members.get(category_id, ()))
+
+    def categories_for(self, contact_id: str) -> list[Category]:
+        """The full category objects for a contact, in the contact's order"""
+        with self._lock:
+            return [
+                self._categories[cid] for cid in self._contact_categories.get(contact_id, [])
+                if cid in self._categories
+            ]
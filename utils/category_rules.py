@@ -0,0 +1,73 @@
+import threading
+from collections import OrderedDict
+from typing import Iterable
+from models.schemas import Category
+from utils.prompts import format_category_rules
+
+
+def resolve_category_rules(categories: Iterable[Category]) -> str:
+    """The Step D block for a set of categories, highest precedence first"""
+    ordered = sorted(categories, key=lambda cat: (-cat.precedence_order, cat.name.lower(), cat.id))
+    return format_category_rules({cat.name: cat.rule_text for cat in ordered})
+
+
+class CategoryRulesCache:
+    """Memoized Step D rule blocks, one per distinct combination of categories
+
+    Entries are keyed by the frozen set of (category_id, version) pairs.
+    Editing or deleting a category bumps its version and evicts every
+    block that used it, so a stale block can never be served; the rest
+    are kept in LRU order up to maxsize.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self._lock = threading.RLock()
+        self.maxsize = maxsize
+        self._versions: dict[str, int] = {}
+        self._blocks: OrderedDict[frozenset[tuple[str, int]], str] = OrderedDict()
+        self._keys_by_category: dict[str, set[frozenset[tuple[str, int]]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._blocks)
+
+    def invalidate(self, category_id: str):
+        """Forget every block built from a category; call when it is edited or deleted"""
+        with self._lock:
+            self._versions[category_id] = self._versions.get(category_id, 0) + 1
+            for key in self._keys_by_category.pop(category_id, set()):
+                self._evict(key)
+
+    def clear(self):
+        with self._lock:
+            for category_id in list(self._keys_by_category):
+                self.invalidate(category_id)
+
+    def _evict(self, key: frozenset[tuple[str, int]]):
+        if self._blocks.pop(key, None) is None:
+            return
+        for category_id, _ in key:
+            keys = self._keys_by_category.get(category_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_category[category_id]
+
+    def rules_for(self, categories: list[Category]) -> str:
+        """The precedence-ordered rule block for these categories, built at most once per combination"""
+        with self._lock:
+            key = frozenset((cat.id, self._versions.get(cat.id, 0)) for cat in categories)
+            block = self._blocks.get(key)
+            if block is not None:
+                self._blocks.move_to_end(key)
+                self.hits += 1
+                return block
+            self.misses += 1
+            block = resolve_category_rules(categories)
+            self._blocks[key] = block
+            for cat in categories:
+                self._keys_by_category.setdefault(cat.id, set()).add(key)
+            while len(self._blocks) > self.maxsize:
+                self._evict(next(iter(self._blocks)))
+            return block
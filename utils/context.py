@@ -0,0 +1,130 @@
+import re
+from typing import NamedTuple
+from models.schemas import Note
+from utils.helpers import format_date
+
+# Word runs and single punctuation marks, roughly how BPE tokenizers split text
+_PIECES = re.compile(r"\w+|[^\w\s]")
+
+# Sections in the order they get a share of the budget
+SECTION_PRIORITY = ("contact_instructions", "category_rules", "notes", "research")
+
+# Don't bother truncating into a gap smaller than this
+MIN_TRUNCATED_TOKENS = 16
+
+
+def _piece_tokens(piece: str) -> int:
+    # Common words are one token; long ones split roughly every six characters
+    return 1 + (len(piece) - 1) // 6
+
+
+def estimate_tokens(text: str) -> int:
+    """Fast local token estimate, within a few percent of GPT tokenizers on English prose"""
+    return sum(_piece_tokens(piece) for piece in _PIECES.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """The longest prefix of text that fits in max_tokens, cut at a piece boundary and marked with an ellipsis"""
+    used = 0
+    for match in _PIECES.finditer(text):
+        used += _piece_tokens(match.group())
+        if used > max_tokens - 1:  # Leave room for the ellipsis
+            return text[:match.start()].rstrip() + " …"
+    return text
+
+
+class AssembledContext(NamedTuple):
+    sections: dict[str, str]  # Section name -> text to put in the prompt
+    token_counts: dict[str, int]  # Estimated tokens per section, after trimming
+    source_token_counts: dict[str, int]  # Estimated tokens per section before trimming
+    budget: int
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(self.token_counts.values())
+
+    @property
+    def trimmed(self) -> bool:
+        return self.token_counts != self.source_token_counts
+
+
+class _Budget:
+    def __init__(self, tokens: int):
+        self.remaining = tokens
+
+    def take(self, text: str) -> str | None:
+        """text if it fits, else a truncated copy if there's room worth using, else None"""
+        tokens = estimate_tokens(text)
+        if tokens <= self.remaining:
+            self.remaining -= tokens
+            return text
+        if self.remaining >= MIN_TRUNCATED_TOKENS:
+            text = truncate_to_tokens(text, self.remaining)
+            self.remaining -= estimate_tokens(text)
+            return text
+        return None
+
+
+def _format_note(note: Note) -> str:
+    return f"- {format_date(note.created_at)}: {note.text.strip()}"
+
+
+def _omitted_notes(count: int, oldest: Note) -> str:
+    return f"- ({count} older notes back to {format_date(oldest.created_at)} omitted for length)"
+
+
+def assemble_context(contact_instructions: str | None, category_rules: str, notes: list[Note],
+                     research: list[str], budget: int) -> AssembledContext:
+    """Fill a token budget with prompt context, most important sections first
+
+    Priority is contact instructions, then category rules, then notes
+    newest first, then research summaries in the order given. A section
+    that doesn't fit is truncated; notes that don't fit at all are
+    summarized as a one-line count of what was left out.
+    """
+    remaining = _Budget(budget)
+    sections = {name: "(none)" for name in SECTION_PRIORITY}
+    source_counts = dict.fromkeys(SECTION_PRIORITY, 0)
+
+    for name, text in (("contact_instructions", contact_instructions or ""), ("category_rules", category_rules)):
+        source_counts[name] = estimate_tokens(text)
+        if text:
+            sections[name] = remaining.take(text) or "(omitted for length)"
+
+    ordered_notes = [_format_note(n) for n in sorted(notes, key=lambda n: n.created_at, reverse=True)]
+    source_counts["notes"] = estimate_tokens("\n".join(ordered_notes))
+    oldest = min(notes, key=lambda n: n.created_at) if notes else None
+    # If some notes won't fit, hold back room for the line that counts them
+    reserved = 0
+    if sum(estimate_tokens(line) for line in ordered_notes) > remaining.remaining:
+        reserved = min(estimate_tokens(_omitted_notes(len(ordered_notes), oldest)), remaining.remaining)
+        remaining.remaining -= reserved
+    kept = []
+    for line in ordered_notes:
+        taken = remaining.take(line)
+        if taken is None:
+            break
+        kept.append(taken)
+        if taken is not line:
+            break
+    remaining.remaining += reserved
+    omitted = len(ordered_notes) - len(kept)
+    if omitted:
+        summary = _omitted_notes(omitted, oldest)
+        if estimate_tokens(summary) <= remaining.remaining:
+            kept.append(remaining.take(summary))
+    if kept:
+        sections["notes"] = "\n".join(kept)
+
+    source_counts["research"] = estimate_tokens("\n\n".join(research))
+    kept = []
+    for summary in research:
+        taken = remaining.take(summary)
+        if taken is None:
+            break
+        kept.append(taken)
+    if kept:
+        sections["research"] = "\n\n".join(kept)
+
+    token_counts = {name: estimate_tokens(text) if text != "(none)" else 0 for name, text in sections.items()}
+    return AssembledContext(sections, token_counts, source_counts, budget)
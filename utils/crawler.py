@@ -0,0 +1,212 @@
+"""Polite, connection-pooling fetcher for a batch's web pages
+
+A Crawler keeps idle keep-alive connections per host, so a batch that
+reads many pages from one site pays for one TCP/TLS handshake instead of
+one per page. Each host gets at most max_per_host requests at once and
+request starts at least crawl_delay seconds apart, whatever the global
+max_connections allows. Bodies past max_bytes are cut off rather than
+read to the end.
+
+A Crawler belongs to the event loop it is used on; make one per batch:
+
+    async with Crawler() as crawler:
+        pages = await get_fetch_cache().fetch_many(urls, crawler)
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, NamedTuple
+from urllib.parse import urlsplit
+from utils.http_client import Response, connect, iter_body, send_request
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONNECTIONS = 16
+DEFAULT_MAX_PER_HOST = 2
+DEFAULT_CRAWL_DELAY = 0.5  # Seconds between request starts to one host
+DEFAULT_TIMEOUT = 20.0  # Per request, from sending it to the end of the body
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024
+IDLE_SECONDS = 15.0  # Idle connections older than this are closed rather than reused
+
+
+class HostStats(NamedTuple):
+    requests: int
+    errors: int
+    bytes: int
+    seconds: float  # Summed request latency, not counting waits for a slot or the crawl delay
+    reused: int  # Requests sent on a kept-alive connection
+
+    @property
+    def mean_latency(self) -> float:
+        return self.seconds / self.requests if self.requests else 0.0
+
+
+class OpenResponse(NamedTuple):
+    status: int
+    headers: dict[str, str]  # Lower-cased names
+    chunks: AsyncIterator[bytes]  # The body, read as it is iterated
+
+
+class _Host:
+    """Connection pool, politeness state and counters for one scheme://host:port"""
+
+    def __init__(self, max_per_host: int):
+        self.slots = asyncio.Semaphore(max_per_host)
+        self.idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter, float]] = []
+        self.next_start = 0.0
+        self.stats = HostStats(0, 0, 0, 0.0, 0)
+
+    def count(self, error: bool, size: int, seconds: float, reused: bool):
+        requests, errors, total, elapsed, reuses = self.stats
+        self.stats = HostStats(requests + 1, errors + error, total + size, elapsed + seconds, reuses + reused)
+
+
+class Crawler:
+    """Fetches many URLs in parallel within global and per-host limits
+
+    open streams a response body; request reads it whole, like
+    http_client.request. Failed requests raise like http_client.request
+    does, and a body over max_bytes is cut off.
+    """
+
+    def __init__(self, max_connections: int = DEFAULT_MAX_CONNECTIONS, max_per_host: int = DEFAULT_MAX_PER_HOST,
+                 crawl_delay: float = DEFAULT_CRAWL_DELAY, timeout: float = DEFAULT_TIMEOUT,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_per_host = max_per_host
+        self.crawl_delay = crawl_delay
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self._connections = asyncio.Semaphore(max_connections)
+        self._hosts: dict[str, _Host] = {}
+
+    async def __aenter__(self) -> "Crawler":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def origin(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc.lower()}"
+
+    def _host(self, origin: str) -> _Host:
+        if origin not in self._hosts:
+            self._hosts[origin] = _Host(self.max_per_host)
+        return self._hosts[origin]
+
+    async def _wait_turn(self, host: _Host):
+        """Hold off until crawl_delay has passed since the host's last request started"""
+        now = time.monotonic()
+        start = max(now, host.next_start)
+        host.next_start = start + self.crawl_delay
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    @asynccontextmanager
+    async def open(self, method: str, url: str, headers: dict[str, str] | None = None,
+                   body: bytes | None = None) -> AsyncIterator[OpenResponse]:
+        """Send a request and hand over its response with the body still to be read
+
+        The body comes in chunks, at most max_bytes of them in all, and
+        reading it counts against the timeout. A connection whose body was
+        read to the end goes back to the pool; one left early is closed.
+        """
+        host = self._host(self.origin(url))
+        async with host.slots, self._connections:
+            await self._wait_turn(host)
+            started = time.monotonic()
+            deadline = started + self.timeout
+            try:
+                reader, writer, version, status, response_headers, reused = await asyncio.wait_for(
+                    self._send(host, method, url, headers, body), self.timeout)
+            except BaseException:
+                host.count(True, 0, time.monotonic() - started, False)
+                raise
+            read = {"bytes": 0, "complete": not _has_body(method, status)}
+
+            async def chunks() -> AsyncIterator[bytes]:
+                if read["complete"]:
+                    return
+                pieces = aiter(iter_body(reader, response_headers))
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(anext(pieces), max(0.0, deadline - time.monotonic()))
+                    except StopAsyncIteration:
+                        read["complete"] = True
+                        return
+                    chunk = chunk[:self.max_bytes - read["bytes"]]
+                    read["bytes"] += len(chunk)
+                    yield chunk
+                    if read["bytes"] >= self.max_bytes:
+                        logger.debug("Cut a response off at %d bytes", self.max_bytes)
+                        return
+
+            body_chunks = chunks()
+            failed = True
+            try:
+                yield OpenResponse(status, response_headers, body_chunks)
+                failed = False
+            finally:
+                await body_chunks.aclose()
+                framed = "content-length" in response_headers or "chunked" in response_headers.get(
+                    "transfer-encoding", "") or not _has_body(method, status)
+                if (not failed and read["complete"] and framed and version == "HTTP/1.1"
+                        and response_headers.get("connection", "").lower() != "close"):
+                    host.idle.append((reader, writer, time.monotonic()))
+                else:
+                    writer.close()
+                host.count(failed, read["bytes"], time.monotonic() - started, reused)
+
+    async def request(self, method: str, url: str, headers: dict[str, str] | None = None,
+                      body: bytes | None = None) -> Response:
+        """open, reading the whole body (up to max_bytes)"""
+        async with self.open(method, url, headers, body) as response:
+            content = b"".join([chunk async for chunk in response.chunks])
+        return Response(response.status, response.headers, content)
+
+    async def _send(self, host: _Host, method: str, url: str, headers: dict[str, str] | None, body: bytes | None):
+        """Send on an idle connection if there is one, or a new one
+
+        (reader, writer, HTTP version, status, headers, whether the connection was reused)
+        """
+        while True:
+            idle = self._checkout(host)
+            reader, writer = idle or await connect(url)
+            try:
+                version, status, response_headers = await send_request(
+                    reader, writer, method, url, headers, body, keep_alive=True)
+            except (ConnectionError, OSError):
+                writer.close()
+                if idle:
+                    continue  # The server had closed the idle connection; try a fresh one
+                raise
+            except BaseException:
+                writer.close()
+                raise
+            return reader, writer, version, status, response_headers, idle is not None
+
+    def _checkout(self, host: _Host) -> tuple[asyncio.StreamReader, asyncio.StreamWriter] | None:
+        """The most recently used idle connection still worth trying, closing any that have aged out"""
+        while host.idle:
+            reader, writer, since = host.idle.pop()
+            if time.monotonic() - since < IDLE_SECONDS and not reader.at_eof():
+                return reader, writer
+            writer.close()
+        return None
+
+    def report(self) -> dict[str, HostStats]:
+        """Counters per scheme://host since the crawler was made"""
+        return {origin: host.stats for origin, host in self._hosts.items()}
+
+    def close(self):
+        """Close every idle connection"""
+        for host in self._hosts.values():
+            for _, writer, _ in host.idle:
+                writer.close()
+            host.idle.clear()
+
+
+def _has_body(method: str, status: int) -> bool:
+    return method != "HEAD" and status >= 200 and status not in (204, 304)
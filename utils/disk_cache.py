@@ -0,0 +1,124 @@
+import logging
+import os
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Eviction trims to this fraction of max_bytes, so it doesn't run on every write
+_LOW_WATER = 0.9
+
+
+class DiskCache:
+    """Byte-bounded directory of files by key, safe to share between processes
+
+    Files are written to a temporary name and renamed into place, so a
+    reader in another process never sees a half-written entry. Reads
+    refresh a file's mtime, and when the directory grows past max_bytes
+    the least recently used files are removed until it is back under 90%
+    of that. Keys should be hex digests; the first two characters pick a
+    subdirectory so no one directory gets huge.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, suffix: str = ".json"):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(size for _, _, size in self._entries())
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + self.suffix)
+
+    def _entries(self) -> list[tuple[float, str, int]]:
+        """(mtime, path, size) of every entry on disk; other processes may delete them at any time"""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(self.suffix):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+
+    def read(self, key: str) -> bytes | None:
+        """The entry's bytes, marking it recently used, or None"""
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return data
+
+    def write(self, key: str, data: bytes):
+        """Save an entry atomically, then evict if the cache has grown too big"""
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            replaced = self._file_size(path)
+            os.replace(temp_path, path)
+        except BaseException:
+            self._remove(temp_path)
+            raise
+        with self._lock:
+            self._size += len(data) - replaced
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def delete(self, key: str):
+        path = self.path(key)
+        size = self._file_size(path)
+        if self._remove(path):
+            with self._lock:
+                self._size -= size
+
+    def evict(self):
+        """Remove least recently used entries until the cache is under its low-water mark"""
+        with self._lock:
+            entries = sorted(self._entries())
+            size = sum(entry_size for _, _, entry_size in entries)
+            target = self.max_bytes * _LOW_WATER
+            removed = 0
+            for _, path, entry_size in entries:
+                if size <= target:
+                    break
+                self._remove(path)
+                size -= entry_size
+                removed += 1
+            self._size = size
+        if removed:
+            logger.debug("Evicted %d entries from %s", removed, self.directory)
+
+    def clear(self):
+        with self._lock:
+            for _, path, _ in self._entries():
+                self._remove(path)
+            self._size = 0
+
+    @staticmethod
+    def _file_size(path: str) -> int:
+        """Size of the file at path, 0 if there is none"""
+        try:
+            return os.stat(path).st_size
+        except FileNotFoundError:
+            return 0
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        """Remove a file; False if it was already gone"""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        return True
@@ -0,0 +1,313 @@
+"""Rate-limit-aware gate in front of LLM requests
+
+Every request waits for its share of a requests-per-minute and a
+tokens-per-minute bucket, is retried with jittered exponential backoff on
+429s, 5xx responses and connection failures, and fails fast while a
+circuit breaker is open. Waiting requests are served in priority order:
+the interactive lane (a user waiting on "Generate Now") always goes
+before the batch lane (worker and overnight runs), and the batch lane
+leaves part of each bucket untouched so interactive requests from the
+app find headroom even while a worker in another process is busy.
+
+State is shared by every event loop in the process, since Streamlit
+sessions and the worker each run their own loops.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from enum import IntEnum
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Callable, Iterator
+from utils.context import estimate_tokens
+from utils.http_client import HTTPError
+
+if TYPE_CHECKING:
+    from utils.llm import LLMProvider
+
+logger = logging.getLogger(__name__)
+
+LLM_REQUESTS_PER_MINUTE = float(os.environ.get("KADENCE_LLM_RPM", "500"))
+LLM_TOKENS_PER_MINUTE = float(os.environ.get("KADENCE_LLM_TPM", "200000"))
+LLM_MAX_RETRIES = int(os.environ.get("KADENCE_LLM_MAX_RETRIES", "5"))
+
+# Tokens to reserve for a reply before its length is known
+EXPECTED_REPLY_TOKENS = 800
+
+# Status codes worth retrying: rate limited, or the provider having a bad moment
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+class Lane(IntEnum):
+    INTERACTIVE = 0
+    BATCH = 1
+
+
+current_lane: contextvars.ContextVar[Lane] = contextvars.ContextVar("current_lane", default=Lane.BATCH)
+
+
+@contextmanager
+def use_lane(lane: Lane) -> Iterator[None]:
+    """Send LLM requests made inside the block, including from tasks it starts, in this lane"""
+    token = current_lane.set(lane)
+    try:
+        yield
+    finally:
+        current_lane.reset(token)
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the provider while too many recent requests have failed"""
+
+
+class TokenBucket:
+    """Continuously refilling allowance of `per_minute` units, holding at most a minute's worth
+
+    Not thread-safe by itself; the Dispatcher calls it under its lock.
+    `clock` gives the time in seconds, time.monotonic unless a test fakes it.
+    """
+
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.clock = clock
+        self._updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float, reserve: float = 0.0) -> float:
+        """Seconds until `amount` can be taken while leaving `reserve` behind; 0 if it can now
+
+        A request bigger than the bucket can go once the bucket is full, so
+        it is delayed rather than stuck forever.
+        """
+        self._refill()
+        needed = min(amount, self.capacity - reserve) + reserve
+        return max(0.0, (needed - self.level) / self.rate)
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= amount
+
+    def give_back(self, amount: float):
+        """Settle an estimate: positive amounts return units, negative ones take more"""
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class CircuitBreaker:
+    """Opens after `threshold` failures in a row; after `reset_seconds` lets one trial request through
+
+    A successful trial closes it again, a failed one reopens it.
+    """
+
+    def __init__(self, threshold: int = 8, reset_seconds: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if self.clock() - self.opened_at >= self.reset_seconds else "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._trial_running:
+            self._trial_running = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def release(self):
+        """End a trial request without judging the provider, e.g. when it was cancelled"""
+        self._trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._trial_running or self.failures >= self.threshold:
+            if self.opened_at is None or self._trial_running:
+                logger.warning("LLM circuit open after %d failures in a row", self.failures)
+            self.opened_at = self.clock()
+        self._trial_running = False
+
+
+class Dispatcher:
+    """Shared rate limits, retry policy and circuit breaker for LLM requests
+
+    `batch_share` is the fraction of each bucket the batch lane may use.
+    `clock` and `sleep` are how it tells and waits out time, so tests can
+    run it on a fake clock.
+    """
+
+    def __init__(self, requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = LLM_TOKENS_PER_MINUTE, max_retries: int = LLM_MAX_RETRIES,
+                 base_delay: float = 1.0, max_delay: float = 30.0, batch_share: float = 0.8,
+                 breaker: CircuitBreaker | None = None, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], Awaitable[None]] = asyncio.sleep):
+        self.requests = TokenBucket(requests_per_minute, clock)
+        self.tokens = TokenBucket(tokens_per_minute, clock)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.batch_share = batch_share
+        self.breaker = breaker or CircuitBreaker(clock=clock)
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._waiting: list[tuple[int, int]] = []  # Heap of (lane, arrival) tickets
+        self._arrivals = itertools.count()
+
+    def _reserve(self, bucket: TokenBucket, lane: Lane) -> float:
+        return bucket.capacity * (1 - self.batch_share) if lane == Lane.BATCH else 0.0
+
+    async def _admit(self, lane: Lane, tokens: int):
+        """Wait for this request's turn and quota, then take it"""
+        ticket = (int(lane), next(self._arrivals))
+        with self._lock:
+            heapq.heappush(self._waiting, ticket)
+        try:
+            while True:
+                with self._lock:
+                    if self.breaker.state == "open":
+                        raise CircuitOpenError("LLM provider is failing; not sending requests for now")
+                    wait = 0.02  # Someone ahead in the queue; check back shortly
+                    if self._waiting[0] == ticket:
+                        wait = max(self.requests.wait_time(1, self._reserve(self.requests, lane)),
+                                   self.tokens.wait_time(tokens, self._reserve(self.tokens, lane)))
+                        if wait == 0:
+                            if not self.breaker.allow():
+                                raise CircuitOpenError("LLM provider is failing; a trial request is in flight")
+                            heapq.heappop(self._waiting)
+                            self.requests.take(1)
+                            self.tokens.take(tokens)
+                            return
+                await self.sleep(min(wait, 1.0))
+        except BaseException:
+            with self._lock:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+            raise
+
+    def _settle(self, estimated: int, actual: int):
+        with self._lock:
+            self.tokens.give_back(estimated - actual)
+
+    def _retry_delay(self, attempt: int, error: Exception) -> float:
+        """Full-jitter exponential backoff, but never sooner than a Retry-After header asks"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = getattr(error, "headers", {}).get("retry-after")
+        if retry_after:
+            try:
+                delay = max(delay, min(self.max_delay, float(retry_after)))
+            except ValueError:
+                pass
+        return delay
+
+    @staticmethod
+    def retryable(error: Exception) -> bool:
+        if isinstance(error, HTTPError):
+            return error.status in RETRYABLE_STATUSES
+        return isinstance(error, (ConnectionError, OSError, asyncio.TimeoutError))
+
+    def _record(self, error: BaseException | None):
+        with self._lock:
+            if error is None:
+                self.breaker.record_success()
+            elif isinstance(error, Exception) and self.retryable(error):
+                self.breaker.record_failure()
+            else:
+                # Cancelled, or the request was at fault rather than the provider
+                self.breaker.release()
+
+    async def complete(self, provider: "LLMProvider", prompt: str, system: str | None, json_mode: bool) -> str:
+        estimated = estimate_tokens(prompt) + estimate_tokens(system or "") + EXPECTED_REPLY_TOKENS
+        lane = current_lane.get()
+        for attempt in range(self.max_retries + 1):
+            await self._admit(lane, estimated)
+            try:
+                reply = await provider.complete(prompt, system, json_mode)
+            except BaseException as e:
+                self._record(e)
+                if not isinstance(e, Exception) or not self.retryable(e) or attempt == self.max_retries:
+                    raise
+                delay = self._retry_delay(attempt, e)
+                logger.info("LLM request failed (%s); retry %d in %.1fs", e, attempt + 1, delay)
+                await self.sleep(delay)
+                continue
+            self._record(None)
+            self._settle(estimated, estimated - EXPECTED_REPLY_TOKENS + estimate_tokens(reply))
+            return reply
+
+    async def stream(self, provider: "LLMProvider", prompt: str, system: str | None,
+                     json_mode: bool) -> AsyncIterator[str]:
+        """Like complete, but a failure is only retried if no chunk has been yielded yet"""
+        estimated = estimate_tokens(prompt) + estimate_tokens(system or "") + EXPECTED_REPLY_TOKENS
+        lane = current_lane.get()
+        for attempt in range(self.max_retries + 1):
+            await self._admit(lane, estimated)
+            parts = []
+            try:
+                async for chunk in provider.stream(prompt, system, json_mode):
+                    parts.append(chunk)
+                    yield chunk
+            except BaseException as e:
+                self._record(e)
+                if parts or not isinstance(e, Exception) or not self.retryable(e) or attempt == self.max_retries:
+                    raise
+                delay = self._retry_delay(attempt, e)
+                logger.info("LLM stream failed (%s); retry %d in %.1fs", e, attempt + 1, delay)
+                await self.sleep(delay)
+                continue
+            self._record(None)
+            self._settle(estimated, estimated - EXPECTED_REPLY_TOKENS + estimate_tokens("".join(parts)))
+            return
+
+
+class DispatchedProvider:
+    """Sends a provider's requests through a Dispatcher"""
+
+    def __init__(self, provider: "LLMProvider", dispatcher: Dispatcher):
+        self.provider = provider
+        self.dispatcher = dispatcher
+        identity = getattr(provider, "identity", None)
+        if identity:
+            self.identity = identity
+
+    async def complete(self, prompt: str, system: str | None = None, json_mode: bool = False) -> str:
+        return await self.dispatcher.complete(self.provider, prompt, system, json_mode)
+
+    def stream(self, prompt: str, system: str | None = None, json_mode: bool = False) -> AsyncIterator[str]:
+        return self.dispatcher.stream(self.provider, prompt, system, json_mode)
+
+
+_dispatcher: Dispatcher | None = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher() -> Dispatcher:
+    """The process-wide dispatcher, with limits from KADENCE_LLM_RPM / KADENCE_LLM_TPM"""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = Dispatcher()
+        return _dispatcher
@@ -0,0 +1,50 @@
+import hashlib
+import json
+import threading
+from typing import Mapping
+from models.schemas import Contact
+
+# Fields that only say when to write, not what to write
+_SCHEDULING_FIELDS = {"next_outreach_date"}
+
+
+def draft_fingerprint(contact: Contact, prompt: str, system_prompt: str,
+                      context: Mapping[str, str] | None = None) -> str:
+    """Hash of everything a draft depends on
+
+    Covers the contact's fields, the rendered prompt (and with it the
+    template and the resolved category rules), the system prompt, and any
+    extra context such as notes or research summaries. Two drafts with the
+    same fingerprint would be written from identical inputs.
+    """
+    payload = {
+        "contact": contact.model_dump(mode="json", exclude=_SCHEDULING_FIELDS),
+        "prompt": prompt,
+        "system_prompt": system_prompt,
+        "context": dict(context or {}),
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class CacheStats:
+    """Thread-safe hit/miss counters for a cache"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hits: int = 0, misses: int = 0):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def snapshot(self) -> dict[str, float]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate}
@@ -0,0 +1,257 @@
+"""Shared, revalidating cache of web pages for Step A
+
+Each page's extracted text (see utils.html_text) is stored on disk under
+the sha256 of its canonical URL, with the ETag and Last-Modified
+validators the server sent. Within its
+freshness window an entry is served without touching the network; after
+that it is revalidated with If-None-Match / If-Modified-Since, so an
+unchanged page costs a 304 instead of a download. However many contacts
+list the same company blog, it is fetched once per window.
+"""
+import asyncio
+import codecs
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import AsyncIterator, NamedTuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+from utils.disk_cache import DiskCache
+from utils.draft_cache import CacheStats
+from utils.crawler import Crawler
+from utils.html_text import DEFAULT_TEXT_TOKENS, PageText, PlainTextExtractor, TextExtractor
+
+logger = logging.getLogger(__name__)
+
+FETCH_CACHE_DIR = os.environ.get("KADENCE_FETCH_CACHE_DIR", ".kadence_cache/pages")
+DEFAULT_MAX_BYTES = int(os.environ.get("KADENCE_FETCH_CACHE_MAX_MB", "512")) * 1024 * 1024
+DEFAULT_FRESH_SECONDS = 6 * 3600  # Used when the server doesn't say how long a page stays fresh
+MAX_FRESH_SECONDS = 7 * 24 * 3600
+PAGE_TEXT_TOKENS = int(os.environ.get("KADENCE_PAGE_TEXT_TOKENS", str(DEFAULT_TEXT_TOKENS)))  # Kept per page
+ERROR_FRESH_SECONDS = 15 * 60  # How long a failed fetch is remembered before trying again
+MAX_REDIRECTS = 5
+USER_AGENT = "KadenceBot/1.0 (relationship research; respects Cache-Control)"
+
+# Bumped when the stored entry or its extraction changes, so older entries are refetched
+_ENTRY_VERSION = 3
+# Query parameters that only track where a click came from
+_TRACKING_PARAMS = re.compile(r"^(utm_\w+|fbclid|gclid|mc_cid|mc_eid|ref|ref_src)$", re.IGNORECASE)
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+def canonicalize_url(url: str) -> str:
+    """One spelling per page: https assumed if missing, lower-case host, no default port,
+    fragment or tracking parameters, and the query sorted"""
+    url = url.strip()
+    if "://" not in url:
+        url = "https://" + url
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+        host += f":{parts.port}"
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not _TRACKING_PARAMS.match(k))
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+
+class FetchedPage(NamedTuple):
+    url: str  # Canonical URL
+    status: int  # Of the last full response; 0 if the page could not be fetched
+    content_type: str
+    title: str
+    published: str | None
+    text: str  # Extracted article text, never markup
+    source: str  # "fresh", "revalidated", "network", "stale" (served after a failed revalidation) or "error"
+    error: str | None = None
+
+
+class FetchCache:
+    """Conditional-GET page cache in a DiskCache
+
+    fresh_seconds applies when a response has no Cache-Control max-age;
+    a max-age is honored up to MAX_FRESH_SECONDS, and no-store responses
+    aren't kept. Failures are remembered for ERROR_FRESH_SECONDS, and a
+    stale copy is served if revalidation fails. Concurrent fetches of one
+    URL on the same event loop share a single request.
+
+    Only the text extracted while the page streams in is kept, at most
+    text_tokens of it; reading stops once that is full. Requests go
+    through the Crawler passed in, or one made for the call.
+    """
+
+    def __init__(self, directory: str = FETCH_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES,
+                 fresh_seconds: float = DEFAULT_FRESH_SECONDS, text_tokens: int = PAGE_TEXT_TOKENS):
+        self.files = DiskCache(directory, max_bytes)
+        self.fresh_seconds = fresh_seconds
+        self.text_tokens = text_tokens
+        self.stats = CacheStats()  # Hits are pages served without a download, 304s included
+        self.revalidations = 0
+        self._lock = threading.Lock()
+        self._in_flight: dict[tuple[int, str], asyncio.Future] = {}
+
+    @staticmethod
+    def key(canonical_url: str) -> str:
+        return hashlib.sha256(canonical_url.encode("utf-8")).hexdigest()
+
+    def _load(self, key: str) -> dict | None:
+        data = self.files.read(key)
+        try:
+            entry = json.loads(data) if data is not None else None
+        except ValueError:
+            return None
+        return entry if entry and entry.get("version") == _ENTRY_VERSION else None
+
+    def _save(self, key: str, entry: dict):
+        self.files.write(key, json.dumps({**entry, "version": _ENTRY_VERSION}).encode("utf-8"))
+
+    def _fresh_for(self, headers: dict[str, str]) -> float | None:
+        """Seconds the response may be served without revalidating; None if it must not be stored"""
+        cache_control = headers.get("cache-control", "").lower()
+        if "no-store" in cache_control:
+            return None
+        if "no-cache" in cache_control:
+            return 0.0
+        match = _MAX_AGE.search(cache_control)
+        return min(float(match.group(1)), MAX_FRESH_SECONDS) if match else self.fresh_seconds
+
+    async def fetch(self, url: str, crawler: Crawler | None = None) -> FetchedPage:
+        """The page at url, from the cache when fresh; never raises for network or HTTP errors"""
+        if crawler is None:
+            async with Crawler() as crawler:
+                return await self.fetch(url, crawler)
+        canonical = canonicalize_url(url)
+        flight = (id(asyncio.get_running_loop()), canonical)
+        with self._lock:
+            shared = self._in_flight.get(flight)
+            if shared is None:
+                future = self._in_flight[flight] = asyncio.get_running_loop().create_future()
+        if shared is not None:
+            return await asyncio.shield(shared)
+        try:
+            page = await self._fetch(canonical, crawler)
+            future.set_result(page)
+            return page
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when no one else was waiting
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[flight]
+
+    async def fetch_many(self, urls: list[str], crawler: Crawler | None = None) -> list[FetchedPage]:
+        """fetch for several URLs at once, in the order given"""
+        if crawler is None:
+            async with Crawler() as crawler:
+                return await self.fetch_many(urls, crawler)
+        return list(await asyncio.gather(*(self.fetch(url, crawler) for url in urls)))
+
+    async def _fetch(self, canonical: str, crawler: Crawler) -> FetchedPage:
+        key = self.key(canonical)
+        entry = self._load(key)
+        now = time.time()
+        if entry and now - entry["validated_at"] < entry["fresh_for"]:
+            self.stats.record(hits=1)
+            return self._page(canonical, entry, "error" if entry.get("error") else "fresh")
+
+        headers = {"User-Agent": USER_AGENT, "Accept": "text/html,application/xhtml+xml,text/plain;q=0.9,*/*;q=0.5"}
+        if entry and not entry.get("error"):
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        try:
+            status, response_headers, page = await self._get(canonical, headers, crawler)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+            return self._failed(canonical, key, entry, error)
+
+        if status == 304 and entry and not entry.get("error"):
+            # A 304 without Cache-Control keeps the lifetime the full response had
+            fresh_for = self._fresh_for(response_headers) if "cache-control" in response_headers else entry["fresh_for"]
+            entry.update(validated_at=now, fresh_for=fresh_for or 0.0)
+            self._save(key, entry)
+            with self._lock:
+                self.revalidations += 1
+            self.stats.record(hits=1)
+            return self._page(canonical, entry, "revalidated")
+        if page is None:
+            return self._failed(canonical, key, entry, f"HTTP {status}")
+
+        self.stats.record(misses=1)
+        entry = {"url": canonical, "status": status, "content_type": response_headers.get("content-type", ""),
+                 "title": page.title, "published": page.published, "text": page.text,
+                 "etag": response_headers.get("etag"), "last_modified": response_headers.get("last-modified"),
+                 "validated_at": now, "fresh_for": self._fresh_for(response_headers)}
+        if entry["fresh_for"] is None:
+            self.files.delete(key)
+            entry["fresh_for"] = 0.0
+        else:
+            self._save(key, entry)
+        return self._page(canonical, entry, "network")
+
+    async def _get(self, url: str, headers: dict[str, str],
+                   crawler: Crawler) -> tuple[int, dict[str, str], PageText | None]:
+        """GET following up to MAX_REDIRECTS redirects: (status, headers, extracted text of a 2xx page)"""
+        for _ in range(MAX_REDIRECTS + 1):
+            async with crawler.open("GET", url, headers) as response:
+                location = response.headers.get("location")
+                if response.status in (301, 302, 303, 307, 308) and location:
+                    url = urljoin(url, location)
+                    continue
+                if not 200 <= response.status < 300:
+                    return response.status, response.headers, None
+                return response.status, response.headers, await self._extract(response.headers, response.chunks)
+        raise ConnectionError(f"More than {MAX_REDIRECTS} redirects")
+
+    async def _extract(self, headers: dict[str, str], chunks: AsyncIterator[bytes]) -> PageText:
+        """Text of a page body as it streams in, leaving the rest unread once text_tokens are collected"""
+        content_type = headers.get("content-type", "").lower()
+        if content_type.startswith("text/plain"):
+            extractor = PlainTextExtractor(self.text_tokens)
+        elif not content_type or "html" in content_type:
+            extractor = TextExtractor(self.text_tokens)
+        else:
+            return PageText("", None, "", False)  # PDFs, images and the like have no text we can read
+        match = re.search(r"charset=\"?([\w-]+)", content_type)
+        try:
+            decoder = codecs.getincrementaldecoder(match.group(1) if match else "utf-8")("replace")
+        except LookupError:
+            decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        async for chunk in chunks:
+            if extractor.feed(decoder.decode(chunk)):
+                return extractor.result()
+        extractor.feed(decoder.decode(b"", final=True))
+        extractor.close()
+        return extractor.result()
+
+    def _failed(self, canonical: str, key: str, entry: dict | None, error: str) -> FetchedPage:
+        self.stats.record(misses=1)
+        if entry and not entry.get("error"):
+            logger.info("Serving a stale copy of %s: %s", canonical, error)
+            return self._page(canonical, entry, "stale", error)
+        logger.info("Could not fetch %s: %s", canonical, error)
+        self._save(key, {"url": canonical, "status": 0, "content_type": "", "title": "", "published": None, "text": "",
+                         "error": error, "validated_at": time.time(), "fresh_for": ERROR_FRESH_SECONDS})
+        return FetchedPage(canonical, 0, "", "", None, "", "error", error)
+
+    @staticmethod
+    def _page(canonical: str, entry: dict, source: str, error: str | None = None) -> FetchedPage:
+        return FetchedPage(canonical, entry["status"], entry["content_type"], entry["title"], entry["published"],
+                           entry["text"], source, error or entry.get("error"))
+
+
+_cache: FetchCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_fetch_cache() -> FetchCache:
+    """The process-wide page cache in FETCH_CACHE_DIR"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = FetchCache()
+        return _cache
@@ -0,0 +1,335 @@
+import asyncio
+import contextvars
+import hashlib
+import logging
+from datetime import date
+from typing import Iterator, NamedTuple
+from models.schemas import Contact, Draft, DraftVariants, SystemSettings
+from utils.context import AssembledContext, assemble_context, estimate_tokens
+from utils.crawler import Crawler
+from utils.dispatcher import Lane, current_lane, use_lane
+from utils.draft_cache import draft_fingerprint
+from utils.fetch_cache import FetchedPage, canonicalize_url, get_fetch_cache
+from utils.llm import LimitedProvider, LLMProvider, get_provider
+from utils.outreach_steps import (PAGE_TOKEN_BUDGET, VariantsStream, compose_draft, format_pages,
+                                  variants_prompt_in_steps, write_draft_in_steps, write_variants)
+from utils.prompts import contact_outreach_values, get_template, render_outreach_prefixes, render_outreach_prompts
+from utils.topic_research import distinct_keywords, format_topics, get_topic_research, normalize_keyword
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_TIMEOUT = 180.0  # Per request, including waiting out rate limits and retries
+# Rough length of a Steps F-I reply: three subject lines and three emails
+ESTIMATED_COMPLETION_TOKENS = 800
+# Rough length of a Step A or Step B reply: a summary of a few paragraphs
+ESTIMATED_SUMMARY_TOKENS = 300
+
+
+class BatchResult(NamedTuple):
+    drafts: list[Draft]
+    failures: dict[str, str]  # contact_id -> error
+
+
+def build_contexts(store, contacts: list[Contact], budget: int) -> list[AssembledContext]:
+    """Budgeted prompt context per contact; category rules come from the store's cache"""
+    return [assemble_context(c.personal_instructions, store.category_rules_for(c.id), c.notes, [], budget)
+            for c in contacts]
+
+
+def _prompt_rows(store, contacts: list[Contact], settings: SystemSettings) -> list[dict[str, str]]:
+    """Outreach template values for many contacts"""
+    contexts = build_contexts(store, contacts, settings.context_token_budget)
+    if contexts:
+        trimmed = sum(1 for context in contexts if context.trimmed)
+        totals = [context.total_tokens for context in contexts]
+        logger.debug("Context for %d prompts: %d-%d tokens, %d trimmed to the %d token budget",
+                     len(contexts), min(totals), max(totals), trimmed, settings.context_token_budget)
+    return [contact_outreach_values(c, context, settings.system_prompt) for c, context in zip(contacts, contexts)]
+
+
+def build_prompts(store, contacts: list[Contact], settings: SystemSettings) -> list[str]:
+    """Outreach prompts for many contacts"""
+    return list(render_outreach_prompts(_prompt_rows(store, contacts, settings)))
+
+
+def estimate_draft_tokens(store, contacts: list[Contact], settings: SystemSettings) -> list[int]:
+    """Estimated prompt plus completion tokens of the requests each contact's draft sends, in order
+
+    Follows the configured pipeline. Without the step pipeline that is the
+    whole prompt. With it, it is Step A over up to PAGE_TOKEN_BUDGET of
+    text per website, Step B for each keyword not already costed to an
+    earlier contact in the list (research is shared), and Steps F-I over
+    those summaries. Replies are costed at ESTIMATED_SUMMARY_TOKENS and
+    ESTIMATED_COMPLETION_TOKENS. A repair request isn't counted, and cached
+    pages, research and drafts make the estimate high.
+    """
+    rows = _prompt_rows(store, contacts, settings)
+    system_tokens = estimate_tokens(settings.system_prompt)
+    if not settings.step_pipeline:
+        return [estimate_tokens(prompt) + system_tokens + ESTIMATED_COMPLETION_TOKENS
+                for prompt in render_outreach_prompts(rows)]
+    sources, topic, variants = get_template("step_sources"), get_template("step_topic"), get_template("step_variants")
+    today = date.today().isoformat()
+    researched: set[str] = set()
+    costs = []
+    for values in rows:
+        keywords = [k for k in dict.fromkeys(normalize_keyword(k) for k in values["topics"].split(", ")) if k]
+        summaries = len(keywords)
+        cost = 0
+        if values["content_sources"]:
+            urls = values["content_sources"].split(", ")
+            cost += (estimate_tokens(sources.render({**values, "pages": ""})) + system_tokens
+                     + len(urls) * PAGE_TOKEN_BUDGET + ESTIMATED_SUMMARY_TOKENS)
+            summaries += 1
+        for keyword in keywords:
+            if keyword not in researched:
+                researched.add(keyword)
+                cost += estimate_tokens(topic.render({"keyword": keyword, "today": today})) + ESTIMATED_SUMMARY_TOKENS
+        cost += (estimate_tokens(variants.render({**values, "research": ""})) + system_tokens
+                 + summaries * ESTIMATED_SUMMARY_TOKENS + ESTIMATED_COMPLETION_TOKENS)
+        costs.append(cost)
+    return costs
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def research_context(contact: Contact, pages: dict[str, FetchedPage], summaries: dict[str, str]) -> dict[str, str]:
+    """Fingerprint context for a step-pipeline draft: hashes of the page text and topic research it uses
+
+    The prompt only names the websites and keywords, so without this a
+    draft would be reused after the pages or summaries it was written from
+    had changed. Summaries expire with the research cache's TTL, so a
+    draft lasts at most as long as its research.
+    """
+    urls = [canonicalize_url(url) for url in contact.relevant_websites if url.strip()]
+    keywords = distinct_keywords([contact.keywords])
+    return {"pipeline": "steps", "pages": _digest(format_pages([pages[url] for url in urls])),
+            "topics": _digest(format_topics({k: summaries[k] for k in keywords if k in summaries}))}
+
+
+def prefix_order(prefixes: list[str]) -> list[int]:
+    """Indexes ordered so prompts sharing a prefix are adjacent, groups in order of first appearance"""
+    first_seen: dict[str, int] = {}
+    for i, prefix in enumerate(prefixes):
+        first_seen.setdefault(prefix, i)
+    return sorted(range(len(prefixes)), key=lambda i: first_seen[prefixes[i]])
+
+
+async def prefetch_websites(contacts: list[Contact]) -> dict[str, FetchedPage]:
+    """Fetch the distinct websites of many contacts through the shared page cache, in parallel through one Crawler
+
+    Returns the pages by canonical URL.
+    """
+    urls = list(dict.fromkeys(canonicalize_url(url) for c in contacts for url in c.relevant_websites if url.strip()))
+    if not urls:
+        return {}
+    async with Crawler() as crawler:
+        pages = dict(zip(urls, await get_fetch_cache().fetch_many(urls, crawler)))
+    for origin, stats in crawler.report().items():
+        logger.debug("%s: %d requests (%d failed, %d on reused connections), %d bytes, %.2fs mean latency",
+                     origin, stats.requests, stats.errors, stats.reused, stats.bytes, stats.mean_latency)
+    return pages
+
+
+async def research_keywords(provider: LLMProvider, contacts: list[Contact]) -> dict[str, str]:
+    """Step B summaries for the distinct keywords of many contacts, by normalized keyword"""
+    keywords = distinct_keywords(c.keywords for c in contacts)
+    if not keywords:
+        return {}
+    logger.debug("Researching %d distinct keywords", len(keywords))
+    return await get_topic_research().summaries(provider, keywords)
+
+
+async def generate_drafts(store, contacts: list[Contact], provider: LLMProvider | None = None,
+                          concurrency: int = DEFAULT_CONCURRENCY, timeout: float = DEFAULT_TIMEOUT,
+                          save_every: int = 50, use_cache: bool = True, lane: Lane = Lane.BATCH) -> BatchResult:
+    """Draft emails for many contacts with concurrent LLM requests
+
+    Contacts whose inputs match an earlier draft's fingerprint reuse that
+    draft without calling the LLM, unless use_cache is off. For the rest,
+    at most `concurrency` requests are in flight and each one gets
+    `timeout` seconds. Drafts are saved in groups of `save_every` as they
+    finish, so an interrupted run keeps what it has. A failed request is
+    logged and reported in the result without stopping the batch. `lane`
+    is the dispatcher priority for the requests; pass Lane.INTERACTIVE when
+    a user is waiting on the result.
+
+    With the step pipeline setting on, each draft is Steps A-I run as a
+    graph of smaller requests (see utils.outreach_steps); otherwise it is
+    one request with the whole prompt. Either way the reply is structured
+    DraftVariants, and at most `concurrency` contacts are in progress.
+    Before any draft starts, the distinct websites of every contact are
+    fetched in parallel (Step A) and their distinct keywords researched
+    (Step B), each once and through shared caches. The draft cache is
+    checked after that, since what those steps return is part of each
+    fingerprint: a draft is only reused while its research is unchanged.
+
+    Requests go out grouped by prompt prefix (the system prompt, the
+    generation steps and the category rules), so contacts in the same
+    categories are sent back to back while the provider still has that
+    prefix cached.
+    """
+    provider = provider or get_provider()
+    settings = store.get_settings()
+    system_prompt = settings.system_prompt
+    rows = _prompt_rows(store, contacts, settings)
+    prefixes = list(render_outreach_prefixes(rows))
+    order = prefix_order(prefixes)
+    logger.debug("%d prompts share %d distinct prefixes", len(prefixes), len(set(prefixes)))
+    contacts = [contacts[i] for i in order]
+    prompts = list(render_outreach_prompts(rows[i] for i in order))
+    rows = [rows[i] for i in order]
+    limited = LimitedProvider(provider, concurrency, timeout)
+    in_progress = asyncio.Semaphore(concurrency)
+
+    topic_summaries: dict[str, str] = {}
+    pages: dict[str, FetchedPage] = {}
+
+    async def write(prompt: str, values: dict[str, str]) -> DraftVariants:
+        if settings.step_pipeline:
+            return await write_draft_in_steps(limited, values, system_prompt, topic_summaries=topic_summaries,
+                                              fetched_pages=pages)
+        return await write_variants(limited, prompt, system_prompt)
+
+    def new_draft(contact: Contact, body: str, fingerprint: str, variants: DraftVariants | None) -> Draft:
+        return Draft(contact_id=contact.id, due_at=contact.next_outreach_date, body=body,
+                     fingerprint=fingerprint, variants=variants)
+
+    async def draft(contact: Contact, prompt: str, values: dict[str, str],
+                    fingerprint: str) -> tuple[Contact, Draft | None, str | None]:
+        async with in_progress:
+            try:
+                variants = await write(prompt, values)
+            except Exception as e:
+                return contact, None, f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+        return contact, new_draft(contact, compose_draft(variants), fingerprint, variants), None
+
+    with use_lane(lane):
+        if settings.step_pipeline:
+            # Steps A and B for the whole batch first: each website is fetched and each keyword researched once
+            fetched, found = await asyncio.gather(prefetch_websites(contacts), research_keywords(limited, contacts))
+            pages.update(fetched)
+            topic_summaries.update(found)
+            contexts = [research_context(c, pages, topic_summaries) for c in contacts]
+        else:
+            contexts = [None] * len(contacts)
+        fingerprints = [draft_fingerprint(c, p, system_prompt, context)
+                        for c, p, context in zip(contacts, prompts, contexts)]
+        cached = store.cached_drafts(fingerprints) if use_cache else {}
+        reused = [new_draft(c, cached[f].body, f, cached[f].variants)
+                  for c, f in zip(contacts, fingerprints) if f in cached]
+        if reused:
+            store.save_drafts(reused)
+        # Tasks take a copy of the context, lane included, when created
+        tasks = [asyncio.ensure_future(draft(c, p, v, f))
+                 for c, p, v, f in zip(contacts, prompts, rows, fingerprints) if f not in cached]
+    drafts, failures, unsaved = reused, {}, []
+    try:
+        for done in asyncio.as_completed(tasks):
+            contact, result, error = await done
+            if error is not None:
+                logger.warning("Draft for %s failed: %s", contact.id, error)
+                failures[contact.id] = error
+                continue
+            unsaved.append(result)
+            if len(unsaved) >= save_every:
+                store.save_drafts(unsaved)
+                drafts += unsaved
+                unsaved = []
+    finally:
+        if unsaved:
+            store.save_drafts(unsaved)
+            drafts += unsaved
+        for task in tasks:
+            task.cancel()
+    return BatchResult(drafts, failures)
+
+
+def stream_draft(store, contact: Contact, provider: LLMProvider | None = None,
+                 timeout: float = DEFAULT_TIMEOUT, use_cache: bool = True,
+                 lane: Lane = Lane.INTERACTIVE) -> Iterator[str]:
+    """Yield a contact's draft chunk by chunk as the LLM writes it, then save it
+
+    A plain generator, so Streamlit can render it with st.write_stream; the
+    provider's async calls are driven on a private event loop. `timeout`
+    bounds each research request and the wait for each chunk, including
+    the first. The draft follows the same pipeline and fingerprint as
+    generate_drafts, so either can reuse the other's drafts: with the step
+    pipeline on, Steps A-E run first and the Steps F-I reply is what
+    streams. A cached draft for the same inputs is yielded whole. The
+    structured reply is decoded as it arrives (see VariantsStream).
+    Requests go in the interactive dispatcher lane unless `lane` says otherwise.
+    """
+    provider = provider or get_provider()
+    settings = store.get_settings()
+    system_prompt = settings.system_prompt
+    values = _prompt_rows(store, [contact], settings)[0]
+    prompt = next(render_outreach_prompts([values]))
+    loop = asyncio.new_event_loop()
+    # The loop is driven from this thread between yields, so give its tasks their own context for the lane
+    context = contextvars.copy_context()
+    context.run(current_lane.set, lane)
+
+    def run(awaitable):
+        return context.run(loop.run_until_complete, awaitable)
+
+    async def research(limited: LLMProvider) -> tuple[dict[str, FetchedPage], dict[str, str]]:
+        return await asyncio.gather(prefetch_websites([contact]), research_keywords(limited, [contact]))
+
+    try:
+        request, fingerprint_context = prompt, None
+        if settings.step_pipeline:
+            limited = LimitedProvider(provider, DEFAULT_CONCURRENCY, timeout)
+            pages, summaries = run(research(limited))
+            fingerprint_context = research_context(contact, pages, summaries)
+        fingerprint = draft_fingerprint(contact, prompt, system_prompt, fingerprint_context)
+        cached = store.cached_drafts([fingerprint]).get(fingerprint) if use_cache else None
+        if cached is not None:
+            yield cached.body
+            store.save_drafts([Draft(contact_id=contact.id, due_at=contact.next_outreach_date, body=cached.body,
+                                     fingerprint=fingerprint, variants=cached.variants)])
+            return
+        if settings.step_pipeline:
+            request = run(variants_prompt_in_steps(limited, values, system_prompt, topic_summaries=summaries,
+                                                   fetched_pages=pages))
+        chunks = aiter(provider.stream(request, system_prompt, json_mode=True))
+        decoder = VariantsStream()
+        try:
+            while True:
+                try:
+                    chunk = run(asyncio.wait_for(anext(chunks), timeout))
+                except StopAsyncIteration:
+                    break
+                text = decoder.feed(chunk)
+                if text:
+                    yield text
+        finally:
+            run(chunks.aclose())
+    finally:
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+    rest, body, variants = decoder.finish()
+    if rest:
+        yield rest
+    if variants is None and hasattr(provider, "revise"):
+        # Don't serve an unusable reply from the cache next time
+        provider.revise(request, system_prompt, True, None)
+    store.save_drafts([Draft(contact_id=contact.id, due_at=contact.next_outreach_date,
+                             body=body, fingerprint=fingerprint, variants=variants)])
+
+
+def split_draft(text: str) -> tuple[str, str]:
+    """(subject, body) from a draft that starts with a 'Subject:' line"""
+    first, _, rest = text.strip().partition("\n")
+    if first.lower().startswith("subject:"):
+        return first[len("subject:"):].strip(), rest.strip()
+    return "", text.strip()
+
+
+def generate_drafts_sync(store, contacts: list[Contact], provider: LLMProvider | None = None,
+                         **kwargs) -> BatchResult:
+    """generate_drafts for callers without an event loop, like Streamlit scripts and the worker"""
+    return asyncio.run(generate_drafts(store, contacts, provider, **kwargs))
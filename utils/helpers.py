@@ -1,20 +1,34 @@
 from datetime import datetime, timedelta
-from models.schemas import Contact, Category
+from models.schemas import Contact, Category, CadenceFrequency
+from utils.recurrence import compile_rule
+
+# Days between outreaches for each cadence; custom falls back to monthly
+CADENCE_DAYS = {
+    CadenceFrequency.WEEKLY: 7,
+    CadenceFrequency.MONTHLY: 30,
+    CadenceFrequency.QUARTERLY: 90,
+    CadenceFrequency.CUSTOM: 30,
+}
 
 def format_date(dt: datetime) -> str:
     """Format a datetime for display"""
     return dt.strftime("%B %d, %Y")
 
-def get_next_outreach_date(contact: Contact) -> datetime:
-    """Calculate the next outreach date based on cadence"""
-    if contact.cadence_frequency == "weekly":
-        return datetime.now() + timedelta(days=7)
-    elif contact.cadence_frequency == "monthly":
-        return datetime.now() + timedelta(days=30)
-    elif contact.cadence_frequency == "quarterly":
-        return datetime.now() + timedelta(days=90)
-    else:  # custom - default to monthly
-        return datetime.now() + timedelta(days=30)
+def get_next_outreach_date(contact: Contact, now: datetime | None = None) -> datetime:
+    """Calculate the next outreach date based on cadence
+
+    The first date after `now` in the contact's cadence, counted from the
+    last contact (or from `now` if there was none): right after an
+    outreach that is now plus one interval. utils.cadence does the same
+    for many contacts at once.
+    """
+    now = now or datetime.now()
+    anchor = contact.last_contact or now
+    if contact.cadence_frequency == CadenceFrequency.CUSTOM and contact.custom_cadence:
+        next_day = compile_rule(contact.custom_cadence).next_after(anchor.date(), now.date())
+        return datetime.combine(next_day, now.time())
+    interval = timedelta(days=CADENCE_DAYS.get(contact.cadence_frequency, CADENCE_DAYS[CadenceFrequency.CUSTOM]))
+    return anchor + ((now - anchor) // interval + 1) * interval
 
 def get_category_by_id(categories: list[Category], category_id: str) -> Category | None:
     """Get a category by its ID"""
@@ -25,7 +39,8 @@ def get_category_by_id(categories: list[Category], category_id: str) -> Category
 
 def get_contact_categories(contact: Contact, all_categories: list[Category]) -> list[Category]:
     """Get the full category objects for a contact"""
-    return [cat for cat in all_categories if cat.id in contact.categories]
+    category_ids = set(contact.categories)
+    return [cat for cat in all_categories if cat.id in category_ids]
 
 def generate_mock_email_draft(contact: Contact, categories: list[Category]) -> str:
     """Generate a mock email draft for demonstration"""
@@ -0,0 +1,219 @@
+"""Article text from HTML, extracted while it streams in
+
+TextExtractor is an html.parser.HTMLParser fed a page piece by piece as
+it arrives. It drops markup, scripts, styles and navigation boilerplate,
+keeps block structure as line breaks, picks up the title and publication
+date, and reports when the text budget is full so the caller can stop
+reading the page.
+"""
+import re
+from html.parser import HTMLParser
+from typing import Iterable, NamedTuple
+from utils.context import estimate_tokens, truncate_to_tokens
+
+DEFAULT_TEXT_TOKENS = 4000
+
+# Elements whose content is never article text
+_SKIPPED_TAGS = {"script", "style", "noscript", "template", "svg", "canvas", "iframe", "object", "nav", "header",
+                 "footer", "aside", "form", "button", "select", "dialog", "menu"}
+_SKIPPED_ROLES = {"navigation", "banner", "contentinfo", "complementary", "search", "menu", "dialog"}
+# class / id words that mark boilerplate blocks
+_BOILERPLATE = re.compile(r"(?:^|[\s_-])(nav|navbar|menu|sidebar|footer|cookies?|consent|newsletter|subscribe|share|"
+                          r"social|related|comments?|breadcrumbs?|advert\w*|ads?|promo|popup|modal)(?:$|[\s_-])",
+                          re.IGNORECASE)
+# Elements that hold the whole page or its main content, never boilerplate by class or id
+_PAGE_CONTAINERS = {"html", "body", "main", "article"}
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+_BLOCK_TAGS = {"p", "div", "section", "article", "main", "blockquote", "pre", "ul", "ol", "li", "dl", "dt", "dd",
+               "table", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "figure", "figcaption", "br", "hr", "address"}
+# Start tags that end an open <p>
+_CLOSES_P = {"p", "div", "section", "article", "main", "blockquote", "pre", "ul", "ol", "dl", "table", "h1", "h2", "h3",
+             "h4", "h5", "h6", "figure", "hr", "address", "nav", "header", "footer", "aside", "form", "menu", "details"}
+_SPACES = re.compile(r"\s+")
+_DATE_META = {"article:published_time", "og:published_time", "date", "pubdate", "publish-date", "publishdate",
+              "dc.date", "dc.date.issued", "datepublished", "sailthru.date", "parsely-pub-date"}
+
+
+class PageText(NamedTuple):
+    title: str
+    published: str | None  # As the page gives it, usually ISO 8601
+    text: str
+    truncated: bool  # The text budget ran out before the page did
+
+
+def _clean(text: str) -> str:
+    """Collapse runs of spaces within lines and of blank lines between them"""
+    lines = [" ".join(line.split()) for line in text.splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+class TextExtractor(HTMLParser):
+    """Incremental HTML-to-text converter with a token budget
+
+    feed returns True once max_tokens of text have been collected; later
+    input is ignored, so the rest of the page needn't be read. Nothing
+    but the unparsed tail of the last chunk and the kept text is held.
+    """
+
+    def __init__(self, max_tokens: int = DEFAULT_TEXT_TOKENS):
+        super().__init__(convert_charrefs=True)
+        self.max_tokens = max_tokens
+        self.tokens = 0
+        self.done = False
+        self.title = ""
+        self.published: str | None = None
+        self._meta_title = ""
+        self._parts: list[str] = []
+        self._open: list[str] = []  # Tags of the elements open at this point, outermost first
+        self._skip_from: int | None = None  # Depth in _open of the boilerplate element being skipped
+        self._in_title = False
+        self._pre = 0
+
+    def feed(self, data: str) -> bool:
+        if not self.done:
+            super().feed(data)
+        return self.done
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]):
+        attributes = {name: value or "" for name, value in attrs}
+        if tag == "meta":
+            self._meta(attributes)
+            return
+        if tag == "time" and self.published is None and attributes.get("datetime"):
+            self.published = attributes["datetime"]
+        self._close_implied(tag)
+        if tag in _VOID_TAGS:
+            if tag in _BLOCK_TAGS and self._skip_from is None:
+                self._parts.append("\n")
+            return
+        self._open.append(tag)
+        if self._skip_from is not None:
+            return
+        if tag == "title":
+            self._in_title = True
+        elif self._is_boilerplate(tag, attributes):
+            self._skip_from = len(self._open) - 1
+        elif tag in _BLOCK_TAGS:
+            self._parts.append("\n\n" if tag in ("p", "h1", "h2", "h3", "h4", "h5", "h6") else "\n")
+            if tag == "li":
+                self._parts.append("- ")
+            elif tag == "pre":
+                self._pre += 1
+
+    def handle_endtag(self, tag: str):
+        if tag in _VOID_TAGS:
+            return
+        for index in range(len(self._open) - 1, -1, -1):
+            if self._open[index] == tag:
+                self._close_to(index)
+                return
+        # A stray end tag with nothing open to close is ignored
+
+    def _close_implied(self, tag: str):
+        """Close what a start tag ends without an end tag, as an li starting ends the previous li"""
+        if tag == "li":
+            self._close_nearest("li", stop={"ul", "ol", "menu"})
+        elif tag in ("dt", "dd"):
+            self._close_nearest(("dt", "dd"), stop={"dl"})
+        if tag in _CLOSES_P:
+            self._close_nearest("p", stop=_BLOCK_TAGS | {"table", "td", "th", "button"})
+
+    def _close_nearest(self, tags: str | tuple[str, ...], stop: set[str]):
+        for index in range(len(self._open) - 1, -1, -1):
+            if self._open[index] in tags:
+                self._close_to(index)
+                return
+            if self._open[index] in stop:
+                return
+
+    def _close_to(self, index: int):
+        """Close the open element at index and everything opened inside it"""
+        while len(self._open) > index:
+            tag = self._open.pop()
+            skipped = self._skip_from is not None and len(self._open) >= self._skip_from
+            if tag == "title":
+                self._in_title = False
+            elif tag == "pre" and not skipped:
+                self._pre = max(0, self._pre - 1)
+            if tag in _BLOCK_TAGS and tag != "li" and not skipped:
+                self._parts.append("\n")
+            if self._skip_from is not None and len(self._open) <= self._skip_from:
+                self._skip_from = None
+
+    def handle_data(self, data: str):
+        if self._in_title:
+            self.title += data
+            return
+        if self._skip_from is not None or self.done:
+            return
+        if not self._pre:
+            # One space keeps inline elements apart, as in "<b>very</b> good"
+            data = _SPACES.sub(" ", data)
+        tokens = estimate_tokens(data)
+        if self.tokens + tokens > self.max_tokens:
+            data = truncate_to_tokens(data, self.max_tokens - self.tokens)
+            self.done = True
+        self.tokens += tokens
+        self._parts.append(data)
+
+    def _meta(self, attributes: dict[str, str]):
+        name = (attributes.get("property") or attributes.get("name") or attributes.get("itemprop") or "").lower()
+        content = attributes.get("content", "").strip()
+        if not content:
+            return
+        if name in ("og:title", "twitter:title") and not self._meta_title:
+            self._meta_title = content
+        elif name in _DATE_META and self.published is None:
+            self.published = content
+
+    @staticmethod
+    def _is_boilerplate(tag: str, attributes: dict[str, str]) -> bool:
+        if tag in _SKIPPED_TAGS or "hidden" in attributes or attributes.get("aria-hidden") == "true":
+            return True
+        if attributes.get("role", "").lower() in _SKIPPED_ROLES:
+            return True
+        if tag in _PAGE_CONTAINERS:
+            return False  # Theme classes like "has-sidebar" on these describe the page, not a block of it
+        return bool(_BOILERPLATE.search(f"{attributes.get('class', '')} {attributes.get('id', '')}"))
+
+    def result(self) -> PageText:
+        """What was extracted so far; call close first when the whole page has been fed"""
+        title = " ".join((self.title or self._meta_title).split())
+        return PageText(title, self.published, _clean("".join(self._parts)), self.done)
+
+
+class PlainTextExtractor:
+    """TextExtractor's interface for text/plain pages"""
+
+    def __init__(self, max_tokens: int = DEFAULT_TEXT_TOKENS):
+        self.max_tokens = max_tokens
+        self.tokens = 0
+        self.done = False
+        self._parts: list[str] = []
+
+    def feed(self, data: str) -> bool:
+        if not self.done:
+            tokens = estimate_tokens(data)
+            if self.tokens + tokens > self.max_tokens:
+                data = truncate_to_tokens(data, self.max_tokens - self.tokens)
+                self.done = True
+            self.tokens += tokens
+            self._parts.append(data)
+        return self.done
+
+    def close(self):
+        pass
+
+    def result(self) -> PageText:
+        return PageText("", None, _clean("".join(self._parts)), self.done)
+
+
+def extract_text(html: str | Iterable[str], max_tokens: int = DEFAULT_TEXT_TOKENS) -> PageText:
+    """Article text, title and date of a page, given whole or as an iterable of pieces"""
+    extractor = TextExtractor(max_tokens)
+    for piece in [html] if isinstance(html, str) else html:
+        if extractor.feed(piece):
+            break
+    else:
+        extractor.close()
+    return extractor.result()
@@ -0,0 +1,165 @@
+import asyncio
+import json
+import ssl
+from typing import AsyncIterator, NamedTuple
+from urllib.parse import urlsplit
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, body: bytes = b"", headers: dict[str, str] | None = None):
+        super().__init__(f"HTTP {status}: {body[:200].decode('utf-8', 'replace')}")
+        self.status = status
+        self.body = body
+        self.headers = headers or {}  # Lower-cased names
+
+
+class Response(NamedTuple):
+    status: int
+    headers: dict[str, str]  # Lower-cased names
+    body: bytes
+
+    def text(self) -> str:
+        return self.body.decode("utf-8", "replace")
+
+    def json(self):
+        return json.loads(self.body)
+
+
+async def connect(url: str) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    """Open a connection to the host serving url, over TLS for https"""
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https"):
+        raise ValueError(f"Unsupported URL scheme: {url}")
+    secure = parts.scheme == "https"
+    return await asyncio.open_connection(parts.hostname, parts.port or (443 if secure else 80),
+                                         ssl=ssl.create_default_context() if secure else None)
+
+
+async def send_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, method: str, url: str,
+                       headers: dict[str, str] | None, body: bytes | None,
+                       keep_alive: bool = False) -> tuple[str, int, dict[str, str]]:
+    """Send a request on an open connection and read the (HTTP version, status, headers) of the response"""
+    parts = urlsplit(url)
+    target = parts.path or "/"
+    if parts.query:
+        target += "?" + parts.query
+    lines = [f"{method} {target} HTTP/1.1", f"Host: {parts.netloc}",
+             f"Connection: {'keep-alive' if keep_alive else 'close'}", "Accept-Encoding: identity"]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    if body is not None:
+        lines.append(f"Content-Length: {len(body)}")
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + (body or b""))
+    await writer.drain()
+    status_line = await reader.readline()
+    try:
+        version, status = status_line.split()[0].decode("latin-1"), int(status_line.split()[1])
+    except (IndexError, ValueError):
+        raise ConnectionError(f"Malformed response from {parts.netloc}: {status_line[:100]!r}")
+    response_headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        response_headers[name.strip().lower()] = value.strip()
+    return version, status, response_headers
+
+
+async def _open(method: str, url: str, headers: dict[str, str] | None,
+                body: bytes | None) -> tuple[asyncio.StreamReader, asyncio.StreamWriter, int, dict[str, str]]:
+    """Send a request on a new connection and read the status line and headers"""
+    reader, writer = await connect(url)
+    try:
+        _, status, response_headers = await send_request(reader, writer, method, url, headers, body)
+    except BaseException:
+        # Includes cancellation by a caller's timeout
+        writer.close()
+        raise
+    return reader, writer, status, response_headers
+
+
+async def iter_body(reader: asyncio.StreamReader, headers: dict[str, str]) -> AsyncIterator[bytes]:
+    """Yield the response body as it arrives, for chunked, sized or read-to-close bodies"""
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size_line = await reader.readline()
+            if not size_line:
+                raise ConnectionError("Connection closed before the body was complete")
+            size = int(size_line.split(b";")[0], 16)
+            if size == 0:
+                break
+            yield await reader.readexactly(size)
+            await reader.readline()
+        # Trailer fields, then the blank line that ends the message; a kept-alive connection starts after it
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+    elif "content-length" in headers:
+        remaining = int(headers["content-length"])
+        while remaining:
+            chunk = await reader.read(min(remaining, 65536))
+            if not chunk:
+                raise ConnectionError("Connection closed before the body was complete")
+            remaining -= len(chunk)
+            yield chunk
+    else:
+        while chunk := await reader.read(65536):
+            yield chunk
+
+
+async def request(method: str, url: str, headers: dict[str, str] | None = None,
+                  body: bytes | None = None) -> Response:
+    """Make one HTTP/1.1 request and read the whole response
+
+    Deliberately small: no redirects, no compression, one connection per
+    request. Callers bound the time with asyncio.wait_for.
+    """
+    reader, writer, status, response_headers = await _open(method, url, headers, body)
+    try:
+        chunks = [chunk async for chunk in iter_body(reader, response_headers)]
+    finally:
+        writer.close()
+    return Response(status, response_headers, b"".join(chunks))
+
+
+async def post_json(url: str, payload: dict, headers: dict[str, str] | None = None) -> dict:
+    """POST a JSON body and decode the JSON reply; non-2xx statuses raise HTTPError"""
+    headers = {"Content-Type": "application/json", "Accept": "application/json", **(headers or {})}
+    response = await request("POST", url, headers, json.dumps(payload).encode("utf-8"))
+    if not 200 <= response.status < 300:
+        raise HTTPError(response.status, response.body, response.headers)
+    return response.json()
+
+
+async def stream(method: str, url: str, headers: dict[str, str] | None = None,
+                 body: bytes | None = None) -> AsyncIterator[bytes]:
+    """Make one request and yield the response body as it arrives; non-2xx statuses raise HTTPError"""
+    reader, writer, status, response_headers = await _open(method, url, headers, body)
+    try:
+        if not 200 <= status < 300:
+            raise HTTPError(status, b"".join([chunk async for chunk in iter_body(reader, response_headers)]),
+                            response_headers)
+        async for chunk in iter_body(reader, response_headers):
+            yield chunk
+    finally:
+        writer.close()
+
+
+async def stream_events(url: str, payload: dict, headers: dict[str, str] | None = None) -> AsyncIterator[str]:
+    """POST a JSON body and yield the data field of each server-sent event in the reply"""
+    headers = {"Content-Type": "application/json", "Accept": "text/event-stream", **(headers or {})}
+    buffer = b""
+    data = []
+    async for chunk in stream("POST", url, headers, json.dumps(payload).encode("utf-8")):
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line = line.rstrip(b"\r").decode("utf-8")
+            if not line:
+                # A blank line ends the event
+                if data:
+                    yield "\n".join(data)
+                    data = []
+            elif line.startswith("data:"):
+                data.append(line[5:].removeprefix(" "))
+    if data:
+        yield "\n".join(data)
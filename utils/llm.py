@@ -0,0 +1,167 @@
+import asyncio
+import json
+import os
+import re
+from typing import AsyncIterator, Protocol
+from utils.http_client import post_json, stream_events
+from utils.dispatcher import DispatchedProvider, get_dispatcher
+from utils.response_cache import LLM_CACHE_ENABLED, CachedProvider, get_response_cache
+
+# An OpenAI-compatible chat completions endpoint, e.g. http://localhost:8765/v1
+LLM_BASE_URL = os.environ.get("KADENCE_LLM_URL")
+LLM_API_KEY = os.environ.get("KADENCE_LLM_API_KEY")
+LLM_MODEL = os.environ.get("KADENCE_LLM_MODEL", "gpt-4o-mini")
+
+
+class LLMProvider(Protocol):
+    """Anything that can turn a prompt into a completion"""
+
+    async def complete(self, prompt: str, system: str | None = None, json_mode: bool = False) -> str:
+        """The completion; json_mode asks for a reply that is a single JSON object"""
+        ...
+
+    def stream(self, prompt: str, system: str | None = None, json_mode: bool = False) -> AsyncIterator[str]:
+        """Yield the completion in chunks as it is generated"""
+        ...
+
+
+def mock_completion(prompt: str) -> str:
+    """A canned reply to an outreach prompt, shaped like what the prompt's task asks for"""
+    match = re.search(r"Prompt to send (.+?) to LLM", prompt)
+    name = match.group(1) if match else "there"
+    first_name = name.split()[0]
+    task = re.search(r"^TASK \((\w+)\)", prompt, re.MULTILINE)
+    task = task.group(1) if task else None
+    if task == "sources":
+        return f"[An LLM would summarize recent sources for {name} here]"
+    if task == "topic":
+        keyword = re.search(r"sources on (.+?), scrape", prompt)
+        return f"[An LLM would summarize recent news on {keyword.group(1) if keyword else 'this topic'} here]"
+    if task == "variants":
+        def email(kind: str) -> str:
+            return (f"Hi {first_name},\n\nI hope this email finds you well! [An LLM would write a {kind} email "
+                    f"here from the research and category rules]\n\nBest regards,\n[Your name]")
+        return json.dumps({
+            "subjects": [f"Catching up, {first_name}", f"Thought of you, {first_name}", "Quick hello"],
+            "variants": {"short": email("short"), "medium": email("medium"), "reply_optimized": email("response-optimized")},
+        }, indent=2)
+    return f"""Subject: Catching up, {first_name}
+
+Hi {first_name},
+
+I hope this email finds you well! [An LLM would write personalized content here from the research and category rules]
+
+Best regards,
+[Your name]
+"""
+
+
+def split_tokens(text: str) -> list[str]:
+    """Word-sized pieces of text that join back to it exactly, for simulated streaming"""
+    return re.findall(r"\s*\S+|\s+$", text)
+
+
+class MockProvider:
+    """Offline stand-in that answers every prompt with a canned draft"""
+
+    def __init__(self, latency: float = 0.0, token_delay: float = 0.0):
+        self.latency = latency
+        self.token_delay = token_delay
+
+    def identity(self) -> dict:
+        return {"provider": "mock"}
+
+    async def complete(self, prompt: str, system: str | None = None, json_mode: bool = False) -> str:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return mock_completion(prompt)
+
+    async def stream(self, prompt: str, system: str | None = None, json_mode: bool = False) -> AsyncIterator[str]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        for token in split_tokens(mock_completion(prompt)):
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            yield token
+
+
+class ChatCompletionsProvider:
+    """Client for an OpenAI-compatible /chat/completions endpoint"""
+
+    def __init__(self, base_url: str, api_key: str | None = None, model: str = LLM_MODEL,
+                 temperature: float = 0.7):
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.api_key = api_key
+        self.model = model
+        self.temperature = temperature
+
+    def identity(self) -> dict:
+        """What besides the prompt shapes a reply, for cache keys"""
+        return {"url": self.url, "model": self.model, "temperature": self.temperature}
+
+    def _payload(self, prompt: str, system: str | None, json_mode: bool) -> dict:
+        messages = [{"role": "system", "content": system}] if system else []
+        messages.append({"role": "user", "content": prompt})
+        payload = {"model": self.model, "messages": messages, "temperature": self.temperature}
+        if json_mode:
+            payload["response_format"] = {"type": "json_object"}
+        return payload
+
+    def _headers(self) -> dict[str, str]:
+        return {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+
+    async def complete(self, prompt: str, system: str | None = None, json_mode: bool = False) -> str:
+        reply = await post_json(self.url, self._payload(prompt, system, json_mode), self._headers())
+        return reply["choices"][0]["message"]["content"]
+
+    async def stream(self, prompt: str, system: str | None = None, json_mode: bool = False) -> AsyncIterator[str]:
+        payload = {**self._payload(prompt, system, json_mode), "stream": True}
+        async for data in stream_events(self.url, payload, self._headers()):
+            if data == "[DONE]":
+                break
+            delta = json.loads(data)["choices"][0].get("delta", {})
+            if delta.get("content"):
+                yield delta["content"]
+
+
+class LimitedProvider:
+    """Wraps a provider so at most `concurrency` requests are in flight, each bounded by `timeout` seconds"""
+
+    def __init__(self, provider: LLMProvider, concurrency: int, timeout: float):
+        self.provider = provider
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(concurrency)
+        for name in ("identity", "revise"):
+            if hasattr(provider, name):
+                setattr(self, name, getattr(provider, name))
+
+    async def complete(self, prompt: str, system: str | None = None, json_mode: bool = False) -> str:
+        async with self._semaphore:
+            return await asyncio.wait_for(self.provider.complete(prompt, system, json_mode), self.timeout)
+
+    async def stream(self, prompt: str, system: str | None = None, json_mode: bool = False) -> AsyncIterator[str]:
+        async with self._semaphore:
+            chunks = aiter(self.provider.stream(prompt, system, json_mode))
+            try:
+                while True:
+                    try:
+                        yield await asyncio.wait_for(anext(chunks), self.timeout)
+                    except StopAsyncIteration:
+                        break
+            finally:
+                await chunks.aclose()
+
+
+def get_provider() -> LLMProvider:
+    """The configured provider: KADENCE_LLM_URL if set, otherwise the offline mock
+
+    Requests go through the process-wide rate limits and retry policy (see
+    utils.dispatcher) and, unless KADENCE_LLM_CACHE=0, replies are cached on
+    disk (see utils.response_cache), so cache hits don't use up the limits.
+    """
+    if LLM_BASE_URL:
+        provider = ChatCompletionsProvider(LLM_BASE_URL, LLM_API_KEY, LLM_MODEL)
+    else:
+        provider = MockProvider(token_delay=0.02)
+    provider = DispatchedProvider(provider, get_dispatcher())
+    return CachedProvider(provider, get_response_cache()) if LLM_CACHE_ENABLED else provider
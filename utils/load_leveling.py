@@ -0,0 +1,99 @@
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from models.schemas import Contact, SystemSettings
+from utils.special_dates import special_date_outreach
+
+
+def _offsets(tolerance_days: int) -> list[int]:
+    """Day offsets nearest first, earlier before later on ties: 0, -1, 1, -2, 2, ..."""
+    offsets = [0]
+    for i in range(1, tolerance_days + 1):
+        offsets += [-i, i]
+    return offsets
+
+
+def plan_send_days(due_days: list[date], cap: int, tolerance_days: int,
+                   today: date | None = None, pinned: list[bool] | None = None) -> list[date]:
+    """Assign each due day a send day with at most `cap` sends per day where possible
+
+    Days under the cap are left alone. Pinned days never move but count
+    toward their day's load. On a day over the cap the first contacts up
+    to `cap`, pinned ones first, stay and the rest, in due order, take the
+    free day closest to their due date within +/- tolerance_days (never
+    before today); if
+    the whole window is full the least-loaded day in it takes the overflow.
+    Cost is O(n * tolerance_days). Rerunning on a leveled schedule only
+    moves leftover overflow into room that has opened up. Results are in
+    the order of `due_days`.
+    """
+    today = today or date.today()
+    targets = [max(day, today) for day in due_days]
+    if cap <= 0 or tolerance_days <= 0:
+        return targets
+    pinned = pinned or [False] * len(targets)
+    load: Counter[date] = Counter(day for day, fixed in zip(targets, pinned) if fixed)
+    excess = []
+    for i in sorted(range(len(targets)), key=targets.__getitem__):
+        if pinned[i]:
+            continue
+        if load[targets[i]] < cap:
+            load[targets[i]] += 1
+        else:
+            excess.append(i)
+
+    offsets = _offsets(tolerance_days)
+    planned = list(targets)
+    for i in excess:
+        window = [targets[i] + timedelta(days=o) for o in offsets]
+        window = [day for day in window if day >= today]
+        day = next((d for d in window if load[d] < cap), None)
+        if day is None:
+            day = min(window, key=load.__getitem__)
+        load[day] += 1
+        planned[i] = day
+    return planned
+
+
+def level_outreach(store, settings: SystemSettings | None = None, today: date | None = None) -> list[Contact]:
+    """Spread the saved schedule so no sender address goes over its daily cap
+
+    Contacts without a sender_email count against the default address.
+    Overdue contacts are only moved if today is already full, and outreach
+    on one of the contact's special dates is never moved; moved contacts
+    keep their time of day. Saves and returns the moved contacts.
+    """
+    settings = settings or store.get_settings()
+    today = today or date.today()
+    by_sender: dict[str | None, list[tuple[str, datetime]]] = defaultdict(list)
+    for contact_id, when, sender in store.outreach_schedule():
+        by_sender[sender or settings.user_email].append((contact_id, when))
+
+    moves: dict[str, datetime] = {}
+    for sender, rows in by_sender.items():
+        rows.sort(key=lambda row: (row[1], row[0]))
+        cap = settings.daily_send_caps.get(sender, settings.default_daily_send_cap)
+        pinned = [store.special_dates.falls_on(contact_id, when.date()) for contact_id, when in rows]
+        days = plan_send_days([when.date() for _, when in rows], cap, settings.load_leveling_tolerance_days, today,
+                              pinned)
+        for (contact_id, when), day in zip(rows, days):
+            if day != max(when.date(), today):
+                moves[contact_id] = datetime.combine(day, when.time())
+
+    moved = [c.model_copy(update={"next_outreach_date": moves[c.id]}) for c in store.get_contacts(list(moves))]
+    if moved:
+        store.save_contacts(moved)
+    return moved
+
+
+def adjust_schedule(store, settings: SystemSettings | None = None, today: date | None = None) -> list[Contact]:
+    """Line outreach up with birthdays and anniversaries in the next two weeks, then level it if enabled
+
+    Meant to run once a day from the worker, not on page loads. Returns
+    the contacts that moved, each once.
+    """
+    settings = settings or store.get_settings()
+    today = today or date.today()
+    moved = {c.id: c for c in special_date_outreach(store, today)}
+    if settings.load_leveling:
+        moved.update((c.id, c) for c in level_outreach(store, settings, today))
+    return list(moved.values())
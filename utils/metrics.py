@@ -0,0 +1,108 @@
+import threading
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+
+def _month(dt: datetime) -> tuple[int, int]:
+    return dt.year, dt.month
+
+
+class DashboardMetrics:
+    """Incrementally maintained counters behind the dashboard's Key Metrics
+
+    Due dates are bucketed per day; buckets that fall into the past are
+    folded into an overdue counter when the day rolls over, so every
+    metric is a handful of lookups no matter how many contacts there are.
+    """
+
+    def __init__(self, today: date | None = None):
+        self._lock = threading.RLock()
+        self._today = today or date.today()
+        self._due_on: Counter[date] = Counter()  # Only days >= self._today
+        self._overdue = 0
+        self._due_day: dict[str, date] = {}
+        self._created_month: dict[str, tuple[int, int]] = {}
+        self._added_in_month: Counter[tuple[int, int]] = Counter()
+
+    def load(self, rows: list[tuple[str, datetime, datetime]], today: date | None = None):
+        """Rebuild from (contact_id, next_outreach_date, created_at) rows"""
+        with self._lock:
+            self._today = today or date.today()
+            self._due_on = Counter()
+            self._overdue = 0
+            self._due_day = {}
+            self._created_month = {}
+            self._added_in_month = Counter()
+            for contact_id, due, created in rows:
+                self._add(contact_id, due.date(), _month(created))
+
+    def _add(self, contact_id: str, due_day: date, created_month: tuple[int, int]):
+        self._due_day[contact_id] = due_day
+        if due_day < self._today:
+            self._overdue += 1
+        else:
+            self._due_on[due_day] += 1
+        self._created_month[contact_id] = created_month
+        self._added_in_month[created_month] += 1
+
+    def _discard_due(self, contact_id: str):
+        due_day = self._due_day.pop(contact_id)
+        if due_day < self._today:
+            self._overdue -= 1
+        else:
+            self._due_on[due_day] -= 1
+            if not self._due_on[due_day]:
+                del self._due_on[due_day]
+
+    def _roll_over(self, today: date):
+        """Fold the buckets of days that have passed into the overdue count"""
+        if today == self._today:
+            return
+        if today < self._today:
+            # Clock went backwards; recount from the per-contact due days
+            self._today = today
+            self._due_on = Counter(d for d in self._due_day.values() if d >= today)
+            self._overdue = len(self._due_day) - sum(self._due_on.values())
+            return
+        elapsed = (today - self._today).days
+        if elapsed < len(self._due_on):
+            past_days = [self._today + timedelta(days=i) for i in range(elapsed)]
+        else:
+            past_days = [d for d in self._due_on if d < today]
+        for day in past_days:
+            self._overdue += self._due_on.pop(day, 0)
+        self._today = today
+
+    def put_contact(self, contact_id: str, next_outreach_date: datetime, created_at: datetime | None = None):
+        """Record a new or changed contact"""
+        with self._lock:
+            self._roll_over(date.today())
+            if contact_id in self._due_day:
+                self._discard_due(contact_id)
+                created_month = self._created_month[contact_id]
+                self._added_in_month[created_month] -= 1
+            else:
+                created_month = _month(created_at or datetime.now())
+            self._add(contact_id, next_outreach_date.date(), created_month)
+
+    def remove_contact(self, contact_id: str):
+        with self._lock:
+            if contact_id not in self._due_day:
+                return
+            self._roll_over(date.today())
+            self._discard_due(contact_id)
+            self._added_in_month[self._created_month.pop(contact_id)] -= 1
+
+    def snapshot(self, today: date | None = None) -> dict[str, int]:
+        """Current values for the Key Metrics cards"""
+        with self._lock:
+            today = today or date.today()
+            self._roll_over(today)
+            due_today = self._overdue + self._due_on[today]
+            due_this_week = due_today + sum(self._due_on[today + timedelta(days=i)] for i in range(1, 7))
+            return {
+                "total_contacts": len(self._due_day),
+                "due_today": due_today,
+                "due_this_week": due_this_week,
+                "growth_this_month": self._added_in_month[(today.year, today.month)],
+            }
@@ -0,0 +1,106 @@
+"""Local stand-in for an OpenAI-compatible chat completions API
+
+Answers POST /v1/chat/completions with utils.llm.mock_completion, after an
+optional delay, either whole or as a server-sent event stream when the
+request sets "stream": true. The generation pipeline can then be
+exercised end to end without network access or an API key:
+
+    python -m utils.mock_llm_server --port 8765 --latency 0.5
+    KADENCE_LLM_URL=http://127.0.0.1:8765/v1 python worker.py
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils.llm import mock_completion, split_tokens
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    token_delay = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream(self, request: dict, completion: str):
+        """Send the completion as chat.completion.chunk events, one token per event"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for token in split_tokens(completion):
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            event = {"object": "chat.completion.chunk", "model": request.get("model", "mock"),
+                     "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+            self._write_chunk(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self._reply(404, {"error": {"message": f"No route for {self.path}"}})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            prompt = request["messages"][-1]["content"]
+        except (ValueError, KeyError, IndexError):
+            self._reply(400, {"error": {"message": "Expected a chat completions request"}})
+            return
+        if self.latency:
+            time.sleep(self.latency)
+        if request.get("stream"):
+            self._stream(request, mock_completion(prompt))
+            return
+        self._reply(200, {
+            "object": "chat.completion",
+            "model": request.get("model", "mock"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": mock_completion(prompt)}}],
+        })
+
+
+def start_server(port: int = 0, latency: float = 0.0, token_delay: float = 0.0,
+                 handler: type[MockLLMHandler] = MockLLMHandler) -> ThreadingHTTPServer:
+    """Serve on 127.0.0.1 from a daemon thread; port 0 picks a free port (see server.server_port)
+
+    `handler` may be a MockLLMHandler subclass, for instance one that
+    records or delays requests.
+    """
+    handler = type("Handler", (handler,), {"latency": latency, "token_delay": token_delay})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Serve a mock chat completions API")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each reply")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds between streamed tokens")
+    args = parser.parse_args(argv)
+    server = start_server(args.port, args.latency, args.token_delay)
+    print(f"Mock LLM listening on http://127.0.0.1:{server.server_port}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
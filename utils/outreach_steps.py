@@ -0,0 +1,223 @@
+import asyncio
+import logging
+from typing import Mapping
+from models.schemas import DraftVariants
+from utils.context import truncate_to_tokens
+from utils.fetch_cache import FetchCache, FetchedPage, canonicalize_url, get_fetch_cache
+from utils.llm import LLMProvider
+from utils.prompts import get_template
+from utils.step_graph import Step, StepGraph
+from utils.structured_output import PartialJSON, parse_model
+from utils.topic_research import TopicResearch, format_topics, get_topic_research, normalize_keyword
+
+logger = logging.getLogger(__name__)
+
+# Template slots the writing step (F-I) takes from the merged context steps
+CONTEXT_SLOTS = ("research", "notes", "category_rules", "contact_instructions")
+
+# Most page text Step A passes on per website
+PAGE_TOKEN_BUDGET = 1500
+
+
+def compose_draft(variants: DraftVariants) -> str:
+    """One draft from the Steps F-I reply: the best subject and short email first, then the alternatives"""
+    subjects = variants.subjects
+    parts = [f"Subject: {subjects[0]}", variants.variants.short.strip()]
+    if subjects[1:]:
+        parts.append("--- Other subject lines ---\n" + "\n".join(f"- {subject}" for subject in subjects[1:]))
+    parts.append("--- Medium version ---\n" + variants.variants.medium.strip())
+    parts.append("--- Response-focused version ---\n" + variants.variants.reply_optimized.strip())
+    return "\n\n".join(parts)
+
+
+def format_pages(pages: list[FetchedPage]) -> str:
+    """The pages Step A could read, each cut to PAGE_TOKEN_BUDGET; empty if none could be"""
+    sections = []
+    for page in pages:
+        if page.text:
+            heading = f"{page.title} ({page.url})" if page.title else page.url
+            if page.published:
+                heading += f", published {page.published}"
+            sections.append(f"--- {heading} ---\n{truncate_to_tokens(page.text, PAGE_TOKEN_BUDGET)}")
+    return "\n\n".join(sections)
+
+
+async def write_variants(provider: LLMProvider, prompt: str, system_prompt: str) -> DraftVariants:
+    """Ask for the structured Steps F-I reply, repairing it if it doesn't validate
+
+    Small defects like a truncated end or a trailing comma are fixed
+    locally. A reply that still doesn't fit DraftVariants goes back to the
+    LLM once with the validation error; if that fails too, the error is
+    raised. With a caching provider only a reply that validates stays
+    cached for the prompt, the repaired one if it took a repair, so later
+    runs don't pay for the repair again.
+    """
+    reply = await provider.complete(prompt, system_prompt, json_mode=True)
+    try:
+        return parse_model(reply, DraftVariants)
+    except ValueError as e:
+        logger.info("Asking the LLM to repair a malformed reply: %s", e)
+        revise = getattr(provider, "revise", lambda *args: None)
+        revise(prompt, system_prompt, True, None)
+        repair = get_template("repair_variants").render({"error": str(e), "reply": reply})
+        repaired = await provider.complete(repair, system_prompt, json_mode=True)
+        try:
+            variants = parse_model(repaired, DraftVariants)
+        except ValueError:
+            revise(repair, system_prompt, True, None)
+            raise
+        revise(prompt, system_prompt, True, variants.model_dump_json())
+        return variants
+
+
+def outreach_graph(provider: LLMProvider, values: Mapping[str, str], system_prompt: str,
+                   pages: FetchCache | None = None, topic_research: TopicResearch | None = None,
+                   topic_summaries: Mapping[str, str] | None = None,
+                   fetched_pages: Mapping[str, FetchedPage] | None = None) -> StepGraph:
+    """Steps A-I for one contact, from outreach_values slot values
+
+    A (site content) takes the contact's websites from fetched_pages (by
+    canonical URL) when a batch has fetched them already, fetches the rest
+    through the shared page cache, and has the LLM summarize them; B (topic research) collects
+    the per-keyword summaries, taking them from topic_summaries (by
+    normalized keyword) when a batch has researched them already and from
+    the shared research cache otherwise. Each is skipped when the contact
+    has no URLs or topics. C (notes) and D/E (rules) come from the
+    budgeted context already in values. Steps F-I need all of those and
+    are one structured request for every variant; its prompt is a step of
+    its own, so it can be had without sending it.
+    """
+    pages = pages or get_fetch_cache()
+    topic_research = topic_research or get_topic_research()
+    topic_summaries = topic_summaries or {}
+    fetched_pages = fetched_pages or {}
+
+    def ask(template: str, extra: Mapping[str, str] | None = None):
+        return provider.complete(get_template(template).render({**values, **(extra or {})}), system_prompt)
+
+    async def sources(results):
+        if not values["content_sources"]:
+            return "(none)"
+        urls = [canonicalize_url(url) for url in values["content_sources"].split(", ")]
+        missing = [url for url in dict.fromkeys(urls) if url not in fetched_pages]
+        found = {**fetched_pages, **dict(zip(missing, await pages.fetch_many(missing)))}
+        fetched = format_pages([found[url] for url in urls])
+        if not fetched:
+            return "(their websites could not be read)"
+        return await ask("step_sources", {"pages": fetched})
+
+    async def topics(results):
+        keywords = [k for k in dict.fromkeys(normalize_keyword(k) for k in values["topics"].split(", ")) if k]
+        if not keywords:
+            return "(none)"
+        missing = [keyword for keyword in keywords if keyword not in topic_summaries]
+        found = dict(zip(missing, await asyncio.gather(*(topic_research.summary(provider, k) for k in missing))))
+        found = {**topic_summaries, **found}
+        return format_topics({keyword: found[keyword] for keyword in keywords})
+
+    async def research(results):
+        found = [f"From their websites:\n{results['sources']}" if values["content_sources"] else "",
+                 f"On their topics:\n{results['topics']}" if values["topics"] else "",
+                 values["research"] if values["research"] != "(none)" else ""]
+        return "\n\n".join(part for part in found if part) or "(none)"
+
+    def context(slot: str):
+        async def run(results):
+            return values[slot]
+        return run
+
+    async def prompt(results):
+        return get_template("step_variants").render({**values, **{slot: results[slot] for slot in CONTEXT_SLOTS}})
+
+    async def variants(results):
+        return await write_variants(provider, results["prompt"], system_prompt)
+
+    return StepGraph([
+        Step("sources", sources),
+        Step("topics", topics),
+        Step("research", research, after=("sources", "topics")),
+        Step("notes", context("notes")),
+        Step("category_rules", context("category_rules")),
+        Step("contact_instructions", context("contact_instructions")),
+        Step("prompt", prompt, after=CONTEXT_SLOTS),
+        Step("variants", variants, after=("prompt",)),
+    ])
+
+
+async def write_draft_in_steps(provider: LLMProvider, values: Mapping[str, str], system_prompt: str,
+                               pages: FetchCache | None = None, topic_research: TopicResearch | None = None,
+                               topic_summaries: Mapping[str, str] | None = None,
+                               fetched_pages: Mapping[str, FetchedPage] | None = None) -> DraftVariants:
+    """Run Steps A-I for one contact as a graph"""
+    graph = outreach_graph(provider, values, system_prompt, pages, topic_research, topic_summaries, fetched_pages)
+    return (await graph.run())["variants"]
+
+
+async def variants_prompt_in_steps(provider: LLMProvider, values: Mapping[str, str], system_prompt: str,
+                                   pages: FetchCache | None = None, topic_research: TopicResearch | None = None,
+                                   topic_summaries: Mapping[str, str] | None = None,
+                                   fetched_pages: Mapping[str, FetchedPage] | None = None) -> str:
+    """Run Steps A-E for one contact and return the Steps F-I prompt, for sending it some other way (like streamed)"""
+    graph = outreach_graph(provider, values, system_prompt, pages, topic_research, topic_summaries, fetched_pages)
+    return (await StepGraph(step for name, step in graph.steps.items() if name != "variants").run())["prompt"]
+
+
+def _partial_text(data: dict) -> str:
+    """The subject and short email decoded so far, as they lead the composed draft"""
+    subjects = data.get("subjects")
+    if not isinstance(subjects, list) or not subjects or not isinstance(subjects[0], str):
+        return ""
+    text = f"Subject: {subjects[0]}"
+    short = data.get("variants", {}).get("short") if isinstance(data.get("variants"), dict) else None
+    if isinstance(short, str) and short:
+        text += "\n\n" + short.strip()
+    return text
+
+
+class VariantsStream:
+    """Turns a streamed structured reply into draft text as it arrives
+
+    feed returns the new text to show: the first subject line and the short
+    email grow as their JSON strings do. finish returns the rest of the
+    composed draft, the full body and the parsed variants. A reply that
+    isn't JSON at all is passed through as plain text, with no variants.
+    """
+
+    def __init__(self):
+        self._json = PartialJSON()
+        self.shown = ""
+        self.plain: bool | None = None  # Decided by the reply's first visible character
+
+    def feed(self, chunk: str) -> str:
+        if self.plain is None:
+            start = (self._json.text + chunk).lstrip()
+            if not start:
+                self._json.text += chunk
+                return ""
+            self.plain = start[0] not in "{`"
+            if self.plain:
+                chunk, self._json.text = self._json.text + chunk, ""
+        if self.plain:
+            self.shown += chunk
+            return chunk
+        data = self._json.feed(chunk)
+        text = _partial_text(data) if data else ""
+        if len(text) <= len(self.shown) or not text.startswith(self.shown):
+            return ""
+        new, self.shown = text[len(self.shown):], text
+        return new
+
+    def finish(self) -> tuple[str, str, DraftVariants | None]:
+        """(text still to show, draft body, variants)"""
+        if self.plain is not False:
+            return "", self.shown + self._json.text, None
+        try:
+            variants = parse_model(self._json.text, DraftVariants)
+        except ValueError as e:
+            logger.warning("Streamed reply did not parse as variants: %s", e)
+            return "", self._json.text, None
+        body = compose_draft(variants)
+        if not body.startswith(self.shown):
+            # The repaired reply differs from what was shown; the saved body wins
+            return "", body, variants
+        return body[len(self.shown):], body, variants
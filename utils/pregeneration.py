@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+from typing import NamedTuple
+from models.schemas import Draft, SystemSettings
+from utils.generation import DEFAULT_CONCURRENCY, estimate_draft_tokens, generate_drafts_sync
+
+
+class PregenerationResult(NamedTuple):
+    drafts: list[Draft]
+    estimated_tokens: int  # Prompt plus expected completion tokens for the requests the drafts send
+    deferred: int  # Upcoming contacts left undrafted because the budget ran out
+
+
+def in_off_peak(now: datetime, start_hour: int, end_hour: int) -> bool:
+    """Whether now falls in the daily [start_hour, end_hour) window, which may wrap midnight"""
+    if start_hour == end_hour:
+        return True
+    if start_hour < end_hour:
+        return start_hour <= now.hour < end_hour
+    return now.hour >= start_hour or now.hour < end_hour
+
+
+def off_peak_started(now: datetime, start_hour: int) -> datetime:
+    """When the most recent off-peak window opened, used to key a night's spend"""
+    start = now.replace(hour=start_hour, minute=0, second=0, microsecond=0)
+    return start if start <= now else start - timedelta(days=1)
+
+
+def pregenerate_upcoming(store, now: datetime | None = None, settings: SystemSettings | None = None,
+                         token_budget: int | None = None,
+                         concurrency: int = DEFAULT_CONCURRENCY) -> PregenerationResult:
+    """Draft contacts coming due within the look-ahead window, soonest first, within a token budget
+
+    Only contacts without a draft for their current due date are
+    considered. Each draft is costed as the requests the configured
+    pipeline sends for it (see estimate_draft_tokens), and contacts are
+    taken in due order until the next one would go over token_budget (the
+    settings' nightly budget by default). Drafts whose inputs are unchanged
+    are reused from the draft cache, so their cost is an overestimate.
+    """
+    now = now or datetime.now()
+    settings = settings or store.get_settings()
+    budget = settings.pregeneration_token_budget if token_budget is None else token_budget
+    horizon = now + timedelta(hours=settings.pregeneration_horizon_hours)
+    upcoming = [(contact_id, when) for when, contact_id in store.scheduler.upcoming(start=now, end=horizon)]
+    drafted = store.drafted_ids(upcoming)
+    pending = store.get_contacts([contact_id for contact_id, _ in upcoming if contact_id not in drafted])
+    pending.sort(key=lambda c: c.next_outreach_date)
+
+    chosen, spent = [], 0
+    for contact, cost in zip(pending, estimate_draft_tokens(store, pending, settings)):
+        if spent + cost > budget:
+            break
+        chosen.append(contact)
+        spent += cost
+    if not chosen:
+        return PregenerationResult([], 0, len(pending))
+    result = generate_drafts_sync(store, chosen, concurrency=concurrency)
+    return PregenerationResult(result.drafts, spent, len(pending) - len(chosen))
@@ -0,0 +1,221 @@
+from string import Formatter
+from typing import Iterable, Iterator, Mapping
+from models.schemas import Contact
+from utils.context import AssembledContext
+
+DEFAULT_SYSTEM_PROMPT = """You are an AI assistant that helps me nurture my professional and personal relationships.
+
+When generating emails:
+1. Use a tone appropriate for the relationship category (professional, personal, etc.)
+2. Reference previous interactions and shared experiences when available
+3. Include relevant, timely topics based on the recipient's interests and our relationship
+4. Keep messages concise but meaningful
+5. End with a clear next step or question to encourage response
+6. Maintain authenticity - the email should sound like it's coming from me
+
+The goal is to maintain and strengthen relationships through consistent, thoughtful communication."""
+
+# The JSON every outreach reply is asked for; validated as models.schemas.DraftVariants
+VARIANTS_SHAPE = '{"subjects": ["...", "...", "..."], "variants": {"short": "...", "medium": "...", "reply_optimized": "..."}}'
+
+# Braces doubled so the shape survives as literal text in a template
+_VARIANTS_SHAPE_LITERAL = VARIANTS_SHAPE.replace("{", "{{").replace("}", "}}")
+
+VARIANTS_TASK = ("TASK (variants): Reply with only a JSON object, no other text, holding the 3 subject lines and the "
+                 "short, medium and response-optimized emails (bodies only), shaped like this: " + _VARIANTS_SHAPE_LITERAL)
+
+# Everything up to the contact's own context is the same for every contact
+# in the same categories, so providers that cache prompt prefixes can reuse
+# it across a batch. Keep per-contact slots out of OUTREACH_PREFIX.
+OUTREACH_PREFIX = """SYSTEM META: Here is the current system prompt: {system_prompt} This will be given to the LLM as the system prompt.
+
+CORE EMAIL CONTENT: Core Instructions for this generation. Steps A, B, C and E are specific to the contact and follow after Step I.
+--Step D: Load all of the rules (LLM) instructions for the following categories that this contact belongs to.
+{category_rules}
+Summarize and synthesize these into a single LLM guidance. Where there is a conflict between rules from two different categories, use your best judgment from the data in the notes section to prioritize which rule to prioritize.
+
+--Step F: Using all of the generated context in A,B,C,D,E write 3 subject lines that will be highly likely to resonate with this contact and get them to open the email.
+
+--Step G: Using all of the generated in A,B,C,D,E write a short, powerful email to the contact with timely information and value add content from the research notes. Make this email match in tone everything you know from context and history.
+
+--Step H: Using all of the generated in A,B,C,D,E write a medium length, powerful email to the contact with timely information and value add content from the research notes. Make this email match in tone everything you know from context and history.
+
+--Step I: Using all of the generated in A,B,C,D,E write a short length, powerful email that is optimized to get a response and add deep value to the relationship. Make this email match in tone everything you know from context and history."""
+
+OUTREACH_CONTACT = """HEADER: "Prompt to send {contact_name} to LLM for example generations. This is generation 1: Serious mode."
+
+--Step A: Scrape the most recent content from these URLs {content_sources} summarize and then set this data summary as context for the prompt that follows. (Prioritize timely new information over older information.)
+
+--Step B: Search Google for the most authoritative 3 sources on {topics} and then go to those sources and scrape the most recent content, summarize and then set this data summary as context for the prompt that follows. (Prioritize timely new information over older information.)
+
+Research notes gathered so far:
+{research}
+
+--Step C: Analyze 'All Notes' in the contact. Use this as context to make the email you write better. Pay attention to threads and continuity and tone and style of previous interactions.
+All Notes (newest first):
+{notes}
+
+--Step E: Load all of the rules (LLM) instructions for this contact which is on the contact details page:
+{contact_instructions}
+Add this to the LLM guidance from Step D. Where there is a conflict between rules from categories versus contact LLM instructions, prioritize the rules from the contact.
+
+""" + VARIANTS_TASK
+
+OUTREACH_PROMPT = OUTREACH_PREFIX + "\n\n" + OUTREACH_CONTACT
+
+# Steps A-I as separate requests, for running them as a graph (utils.outreach_steps).
+# A and B gather research; F-I are one request over the merged context.
+STEP_HEADER = 'HEADER: "Prompt to send {contact_name} to LLM for example generations. This is generation 1: Serious mode."'
+
+SOURCES_STEP_PROMPT = STEP_HEADER + """
+
+Here is the current content of their websites ({content_sources}):
+
+{pages}
+
+TASK (sources): Summarize this content as context for an email to this contact. Prioritize timely new information over older information. Reply with the summary only."""
+
+# Not about any one contact, so its summary can be shared by everyone with the keyword
+TOPIC_STEP_PROMPT = """Today is {today}.
+
+TASK (topic): Search Google for the most authoritative 3 sources on {keyword}, scrape their most recent content and summarize it as background for emails to people interested in it. Prioritize timely new information over older information. Reply with the summary only."""
+
+WRITING_CONTEXT_PROMPT = """SYSTEM META: Here is the current system prompt: {system_prompt} This will be given to the LLM as the system prompt.
+
+Guidance from the categories this contact belongs to:
+{category_rules}
+Where there is a conflict between rules from two different categories, use your best judgment from the notes to decide which rule to prioritize.
+
+""" + STEP_HEADER + """
+
+Guidance for this contact, which wins over the category rules where they conflict:
+{contact_instructions}
+
+All Notes (newest first). Pay attention to threads and continuity and tone and style of previous interactions:
+{notes}
+
+Research notes (prioritize timely new information over older information):
+{research}"""
+
+REPAIR_PROMPT = """Your previous reply could not be used: {error}
+
+Previous reply:
+{reply}
+
+""" + VARIANTS_TASK
+
+
+class PromptTemplate:
+    """A prompt with named {slots}, parsed once into literal and slot parts
+
+    The static text between slots is precomputed, so rendering is filling
+    a list and one join. render_many reuses that list across rows.
+    """
+
+    def __init__(self, name: str, text: str):
+        self.name = name
+        self._parts: list[str] = []
+        self._slots: list[tuple[int, str]] = []  # (index into _parts, slot name)
+        literal = []
+        for literal_text, field, spec, conversion in Formatter().parse(text):
+            literal.append(literal_text)
+            if field is None:
+                continue
+            if not field.isidentifier() or spec or conversion:
+                raise ValueError(f"Template {name!r}: unsupported slot {{{field}}}")
+            self._parts.append("".join(literal))
+            literal = []
+            self._slots.append((len(self._parts), field))
+            self._parts.append("")
+        self._parts.append("".join(literal))
+        self.fields = frozenset(field for _, field in self._slots)
+
+    def render(self, values: Mapping[str, str]) -> str:
+        """Fill every slot from values; missing slots raise KeyError"""
+        parts = self._parts.copy()
+        for i, field in self._slots:
+            parts[i] = values[field]
+        return "".join(parts)
+
+    def render_many(self, rows: Iterable[Mapping[str, str]]) -> Iterator[str]:
+        """Render once per row of values, lazily"""
+        parts = self._parts.copy()
+        slots = self._slots
+        join = "".join
+        for values in rows:
+            for i, field in slots:
+                parts[i] = values[field]
+            yield join(parts)
+
+
+TEMPLATES = {
+    "outreach": PromptTemplate("outreach", OUTREACH_PROMPT),
+    "outreach_prefix": PromptTemplate("outreach_prefix", OUTREACH_PREFIX),
+    "step_sources": PromptTemplate("step_sources", SOURCES_STEP_PROMPT),
+    "step_topic": PromptTemplate("step_topic", TOPIC_STEP_PROMPT),
+    "step_variants": PromptTemplate("step_variants", WRITING_CONTEXT_PROMPT + "\n\n" + VARIANTS_TASK),
+    "repair_variants": PromptTemplate("repair_variants", REPAIR_PROMPT),
+}
+
+
+def get_template(name: str) -> PromptTemplate:
+    return TEMPLATES[name]
+
+
+def format_category_rules(category_instructions: Mapping[str, str]) -> str:
+    """The Step D block listing each category and its instructions"""
+    lines = [f"Categories: {', '.join(category_instructions)}", "Instructions:"]
+    lines += [f"- {name}: {instructions}" for name, instructions in category_instructions.items()]
+    return "\n".join(lines)
+
+
+def outreach_values(contact_name: str, content_sources: list[str], topics: list[str],
+                    category_instructions: Mapping[str, str] | str, contact_instructions: str,
+                    system_prompt: str = DEFAULT_SYSTEM_PROMPT, notes: str = "(none)",
+                    research: str = "(none)") -> dict[str, str]:
+    """Slot values for the outreach template
+
+    category_instructions is either a name -> instructions mapping or a
+    block already built by format_category_rules, e.g. from the store's
+    category rules cache.
+    """
+    if not isinstance(category_instructions, str):
+        category_instructions = format_category_rules(category_instructions)
+    return {
+        "contact_name": contact_name,
+        "system_prompt": system_prompt,
+        "content_sources": ", ".join(content_sources),
+        "topics": ", ".join(topics),
+        "category_rules": category_instructions,
+        "contact_instructions": contact_instructions,
+        "notes": notes,
+        "research": research,
+    }
+
+
+def contact_outreach_values(contact: Contact, context: AssembledContext,
+                            system_prompt: str = DEFAULT_SYSTEM_PROMPT) -> dict[str, str]:
+    """Slot values for the outreach template from a saved contact and its budgeted context"""
+    sections = context.sections
+    return outreach_values(contact.name, contact.relevant_websites, contact.keywords, sections["category_rules"],
+                           sections["contact_instructions"], system_prompt, sections["notes"], sections["research"])
+
+
+def render_outreach_prompt(contact_name: str, content_sources: list[str], topics: list[str],
+                           category_instructions: Mapping[str, str] | str, contact_instructions: str,
+                           system_prompt: str = DEFAULT_SYSTEM_PROMPT, notes: str = "(none)",
+                           research: str = "(none)") -> str:
+    """The Step A-I prompt for one contact"""
+    values = outreach_values(contact_name, content_sources, topics, category_instructions,
+                             contact_instructions, system_prompt, notes, research)
+    return TEMPLATES["outreach"].render(values)
+
+
+def render_outreach_prompts(rows: Iterable[Mapping[str, str]]) -> Iterator[str]:
+    """Step A-I prompts for many contacts from outreach_values rows"""
+    return TEMPLATES["outreach"].render_many(rows)
+
+
+def render_outreach_prefixes(rows: Iterable[Mapping[str, str]]) -> Iterator[str]:
+    """The shared leading part of each row's outreach prompt, for grouping requests"""
+    return TEMPLATES["outreach_prefix"].render_many(rows)
@@ -0,0 +1,267 @@
+import re
+from datetime import date, datetime
+from functools import lru_cache
+import numpy as np
+
+WEEKDAYS = {
+    "monday": 0, "mon": 0, "tuesday": 1, "tue": 1, "tues": 1, "wednesday": 2, "wed": 2,
+    "thursday": 3, "thu": 3, "thur": 3, "thurs": 3, "friday": 4, "fri": 4,
+    "saturday": 5, "sat": 5, "sunday": 6, "sun": 6,
+}
+MONTHS = {
+    "january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3, "april": 4, "apr": 4,
+    "may": 5, "june": 6, "jun": 6, "july": 7, "jul": 7, "august": 8, "aug": 8,
+    "september": 9, "sep": 9, "sept": 9, "october": 10, "oct": 10, "november": 11, "nov": 11,
+    "december": 12, "dec": 12,
+}
+ORDINALS = {"1st": 1, "first": 1, "2nd": 2, "second": 2, "3rd": 3, "third": 3, "4th": 4, "fourth": 4, "last": -1}
+
+_WEEKDAY = "|".join(sorted(WEEKDAYS, key=len, reverse=True))
+_MONTH = "|".join(sorted(MONTHS, key=len, reverse=True))
+_ORDINAL = "|".join(ORDINALS)
+_UNIT_DAYS = {"day": 1, "week": 7}
+
+_PATTERNS = [
+    ("connector", re.compile(r"(?:,|;|but|and|only|on)\b\s*|[,;]\s*")),
+    ("nth_weekday", re.compile(rf"every\s+({_ORDINAL})\s+({_WEEKDAY})s?(?:\s+of\s+(?:the|each|every)\s+month)?\b")),
+    ("weekday", re.compile(rf"every\s+({_WEEKDAY})s?\b")),
+    ("interval", re.compile(r"every\s+(\d+|other)\s+(day|week|month)s?\b")),
+    ("simple", re.compile(r"(?:every\s+(day|week|month)|(daily|weekly|monthly))\b")),
+    ("skip", re.compile(rf"(?:skip|skipping|except|excluding|not\s+in)\s+((?:{_MONTH})(?:\s*(?:,|and|or)\s*(?:{_MONTH}))*)\b")),
+    ("day_filter", re.compile(r"(weekdays|weekends|business\s+days)\b")),
+]
+
+# How far past a window to look when rolling an occurrence onto an allowed day
+_ROLL_SCAN_DAYS = 800
+
+
+def _weekday(days: np.ndarray) -> np.ndarray:
+    """Monday=0 weekday for an array of datetime64[D] (1970-01-01 was a Thursday)"""
+    return (days.astype(np.int64) + 3) % 7
+
+
+def _month_parts(days: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(month number 1-12, day of month, days in month) for datetime64[D] values"""
+    months = days.astype("datetime64[M]")
+    first = months.astype("datetime64[D]")
+    month_len = ((months + 1).astype("datetime64[D]") - first).astype(np.int64)
+    return months.astype(np.int64) % 12 + 1, (days - first).astype(np.int64) + 1, month_len
+
+
+class RecurrenceRule:
+    """A compiled custom cadence such as "every 45 days but skip december"
+
+    Interval rules ("every 2 weeks") step from an anchor date, normally the
+    last contact, and roll any occurrence that lands on an excluded day
+    forward to the next allowed one. Calendar rules ("every 2nd tuesday")
+    match days directly and ignore the anchor. Every method works on whole
+    NumPy arrays so that many contacts can share one compiled rule.
+    """
+
+    def __init__(self, text: str, step_days: int | None = None, step_months: int | None = None,
+                 weekday: int | None = None, nth: int | None = None,
+                 allowed_weekdays: frozenset[int] = frozenset(range(7)),
+                 skipped_months: frozenset[int] = frozenset()):
+        self.text = text
+        self.step_days = step_days
+        self.step_months = step_months
+        self.weekday = weekday
+        self.nth = nth
+        self.allowed_weekdays = allowed_weekdays
+        self.skipped_months = skipped_months
+        self.is_calendar = step_days is None and step_months is None
+
+        # Longest run of excluded days, bounding how far a roll-forward can go
+        scan = np.datetime64("2000-01-01") + np.arange(2 * 366)
+        allowed = self.allowed(scan)
+        if self.is_calendar:
+            allowed &= self._pattern(scan)
+        if not allowed.any():
+            raise ValueError(f"Recurrence rule never occurs: {text!r}")
+        gaps = np.diff(np.flatnonzero(np.concatenate(([True], allowed, [True]))))
+        self.max_roll = int(gaps.max())
+
+        # Window that is guaranteed to contain the next occurrence
+        if self.step_days is not None:
+            self.search_span = self.step_days + self.max_roll + 1
+        elif self.step_months is not None:
+            self.search_span = 31 * (self.step_months + 1) + self.max_roll
+        else:
+            self.search_span = self.max_roll + 1
+
+    def __repr__(self) -> str:
+        return f"RecurrenceRule({self.text!r})"
+
+    def allowed(self, days: np.ndarray) -> np.ndarray:
+        """Mask of days the weekday/month filters permit"""
+        mask = np.ones(days.shape, dtype=bool)
+        if len(self.allowed_weekdays) < 7:
+            mask &= np.isin(_weekday(days), list(self.allowed_weekdays))
+        if self.skipped_months:
+            mask &= ~np.isin(_month_parts(days)[0], list(self.skipped_months))
+        return mask
+
+    def _pattern(self, days: np.ndarray) -> np.ndarray:
+        if self.weekday is None:
+            return np.ones(days.shape, dtype=bool)
+        mask = _weekday(days) == self.weekday
+        if self.nth is not None:
+            _, day_of_month, month_len = _month_parts(days)
+            if self.nth == -1:
+                mask &= day_of_month + 7 > month_len
+            else:
+                mask &= (day_of_month - 1) // 7 == self.nth - 1
+        return mask
+
+    def _raw_occurrences(self, anchors: np.ndarray, start: np.datetime64, end: np.datetime64):
+        """(row, day) pairs for un-rolled interval occurrences that could land in [start, end)"""
+        lead = start - np.timedelta64(self.max_roll, "D")
+        if self.step_days is not None:
+            step = self.step_days
+            first_k = np.maximum(1, -(-(lead - anchors).astype(np.int64) // step))
+            count = (end - lead).astype(np.int64) // step + 2
+            ks = first_k[:, None] + np.arange(count)
+            days = anchors[:, None] + ks * np.timedelta64(step, "D")
+        else:
+            step = self.step_months
+            anchor_months = anchors.astype("datetime64[M]")
+            _, anchor_dom, _ = _month_parts(anchors)
+            months_behind = (lead.astype("datetime64[M]") - anchor_months).astype(np.int64)
+            first_k = np.maximum(1, -(-months_behind // step))
+            count = (end.astype("datetime64[M]") - lead.astype("datetime64[M]")).astype(np.int64) // step + 2
+            ks = first_k[:, None] + np.arange(count)
+            months = anchor_months[:, None] + ks * step
+            first = months.astype("datetime64[D]")
+            month_len = ((months + 1).astype("datetime64[D]") - first).astype(np.int64)
+            days = first + (np.minimum(anchor_dom[:, None], month_len) - 1)
+        rows = np.broadcast_to(np.arange(len(anchors))[:, None], days.shape)
+        keep = (days < end) & (days >= lead)
+        return rows[keep], days[keep]
+
+    def expand(self, anchors: np.ndarray, start: date, end: date) -> tuple[np.ndarray, np.ndarray]:
+        """All occurrences in [start, end) for each anchor, as (row index, datetime64[D]) arrays"""
+        anchors = np.asarray(anchors, dtype="datetime64[D]")
+        start, end = np.datetime64(start, "D"), np.datetime64(end, "D")
+        window = start + np.arange((end - start).astype(np.int64))
+        if self.is_calendar:
+            days = window[self._pattern(window) & self.allowed(window)]
+            return np.repeat(np.arange(len(anchors)), len(days)), np.tile(days, len(anchors))
+
+        rows, days = self._raw_occurrences(anchors, start, end)
+        # Roll each occurrence forward to the next allowed day via a lookup table
+        lead = start - np.timedelta64(self.max_roll, "D")
+        table_days = lead + np.arange((end - lead).astype(np.int64) + _ROLL_SCAN_DAYS)
+        allowed_idx = np.flatnonzero(self.allowed(table_days))
+        rolled = table_days[allowed_idx[np.searchsorted(allowed_idx, (days - lead).astype(np.int64))]]
+        keep = (rolled >= start) & (rolled < end) & (rolled > anchors[rows])
+        rows, rolled = rows[keep], rolled[keep]
+        # Several occurrences can roll onto the same day
+        order = np.lexsort((rolled, rows))
+        rows, rolled = rows[order], rolled[order]
+        distinct = np.ones(len(rows), dtype=bool)
+        distinct[1:] = (rows[1:] != rows[:-1]) | (rolled[1:] != rolled[:-1])
+        return rows[distinct], rolled[distinct]
+
+    def next_after(self, anchor: date, after: date) -> date:
+        """First occurrence strictly after `after`"""
+        return next_occurrences([self], np.array([anchor], dtype="datetime64[D]"), after)[0].item()
+
+
+def _parse(text: str) -> RecurrenceRule:
+    source = text
+    text = " ".join(text.lower().split())
+    base = {}
+    allowed_weekdays = frozenset(range(7))
+    skipped_months = set()
+    pos = 0
+    while pos < len(text):
+        for kind, pattern in _PATTERNS:
+            match = pattern.match(text, pos)
+            if match:
+                break
+        else:
+            raise ValueError(f"Unrecognized recurrence rule near {text[pos:]!r}")
+        pos = match.end()
+        while pos < len(text) and text[pos] == " ":
+            pos += 1
+        if kind == "connector":
+            continue
+        if kind == "skip":
+            skipped_months.update(MONTHS[m] for m in re.findall(_MONTH, match.group(1)))
+            continue
+        if kind == "day_filter":
+            allowed_weekdays = frozenset(range(5, 7)) if match.group(1) == "weekends" else frozenset(range(5))
+            continue
+        if base:
+            raise ValueError(f"Recurrence rule has more than one schedule: {source!r}")
+        if kind == "nth_weekday":
+            base = {"weekday": WEEKDAYS[match.group(2)], "nth": ORDINALS[match.group(1)]}
+        elif kind == "weekday":
+            base = {"weekday": WEEKDAYS[match.group(1)]}
+        else:
+            if kind == "interval":
+                count = 2 if match.group(1) == "other" else int(match.group(1))
+                unit = match.group(2)
+            else:
+                count = 1
+                unit = match.group(1) or {"daily": "day", "weekly": "week", "monthly": "month"}[match.group(2)]
+            if count < 1:
+                raise ValueError(f"Recurrence interval must be positive: {source!r}")
+            base = {"step_months": count} if unit == "month" else {"step_days": count * _UNIT_DAYS[unit]}
+    if not base:
+        if len(allowed_weekdays) == 7:
+            raise ValueError(f"Recurrence rule has no schedule: {source!r}")
+        base = {"step_days": 1}  # "weekdays only" on its own means every allowed day
+    return RecurrenceRule(source, allowed_weekdays=allowed_weekdays,
+                          skipped_months=frozenset(skipped_months), **base)
+
+
+@lru_cache(maxsize=1024)
+def compile_rule(text: str) -> RecurrenceRule:
+    """Parse and compile a custom cadence rule, once per distinct text"""
+    return _parse(text)
+
+
+def _group_by_rule(rules: list[RecurrenceRule | str]) -> dict[RecurrenceRule, np.ndarray]:
+    groups: dict[RecurrenceRule, list[int]] = {}
+    for i, rule in enumerate(rules):
+        if isinstance(rule, str):
+            rule = compile_rule(rule)
+        groups.setdefault(rule, []).append(i)
+    return {rule: np.array(rows) for rule, rows in groups.items()}
+
+
+def expand_occurrences(rules: list[RecurrenceRule | str], anchors: np.ndarray, start: date,
+                       horizon_days: int = 90) -> tuple[np.ndarray, np.ndarray]:
+    """Occurrences for many contacts over a horizon, as (contact index, datetime64[D]) arrays
+
+    Contacts are grouped by rule so each distinct rule is evaluated once
+    over the whole window; np.bincount on the dates gives the daily load.
+    """
+    anchors = np.asarray(anchors, dtype="datetime64[D]")
+    end = np.datetime64(start, "D") + horizon_days
+    all_rows, all_days = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype="datetime64[D]")]
+    for rule, rows in _group_by_rule(rules).items():
+        group_rows, days = rule.expand(anchors[rows], start, end.item())
+        all_rows.append(rows[group_rows])
+        all_days.append(days)
+    return np.concatenate(all_rows), np.concatenate(all_days)
+
+
+def next_occurrences(rules: list[RecurrenceRule | str], anchors: np.ndarray,
+                     after: date | datetime) -> np.ndarray:
+    """The first occurrence strictly after `after` for each (rule, anchor) pair"""
+    anchors = np.asarray(anchors, dtype="datetime64[D]")
+    start = np.datetime64(after, "D") + 1
+    result = np.full(len(anchors), np.datetime64("NaT"), dtype="datetime64[D]")
+    for rule, rows in _group_by_rule(rules).items():
+        group_anchors = anchors[rows]
+        # An anchor in the future pushes the first interval occurrence out too
+        lag = max(0, int((group_anchors.max() - start).astype(np.int64))) if not rule.is_calendar else 0
+        group_rows, days = rule.expand(group_anchors, start.item(), (start + rule.search_span + lag).item())
+        first = np.full(len(rows), np.datetime64("NaT"), dtype="datetime64[D]")
+        # Rows come back sorted by (row, day), so the first hit per row is the earliest
+        unique_rows, first_idx = np.unique(group_rows, return_index=True)
+        first[unique_rows] = days[first_idx]
+        result[rows] = first
+    return result
@@ -0,0 +1,121 @@
+"""Disk cache of LLM replies, keyed by everything that determines a reply
+
+Entries are JSON files named by the sha256 of (provider identity, model
+parameters, system prompt, prompt), so a byte-identical request is served
+from disk instead of the provider. The files live in a DiskCache, so the
+Streamlit app and workers can share one directory safely.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any, AsyncIterator
+from utils.disk_cache import DiskCache
+from utils.draft_cache import CacheStats
+
+if TYPE_CHECKING:
+    from utils.llm import LLMProvider
+
+LLM_CACHE_DIR = os.environ.get("KADENCE_LLM_CACHE_DIR", ".kadence_cache/llm")
+LLM_CACHE_ENABLED = os.environ.get("KADENCE_LLM_CACHE", "1") != "0"
+DEFAULT_MAX_BYTES = int(os.environ.get("KADENCE_LLM_CACHE_MAX_MB", "256")) * 1024 * 1024
+DEFAULT_TTL_SECONDS = float(os.environ.get("KADENCE_LLM_CACHE_TTL_HOURS", "168")) * 3600
+
+
+def request_key(identity: dict[str, Any], prompt: str, system: str | None, json_mode: bool) -> str:
+    """Content address of one LLM request"""
+    payload = {"identity": identity, "prompt": prompt, "system": system, "json_mode": json_mode}
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class ResponseCache:
+    """Size-bounded, expiring, multi-process-safe store of replies by request key
+
+    Entries older than ttl_seconds are misses and get deleted on sight.
+    Storage and LRU eviction are a DiskCache.
+    """
+
+    def __init__(self, directory: str = LLM_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.files = DiskCache(directory, max_bytes)
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+
+    def get(self, key: str) -> str | None:
+        """The cached reply, or None; counts a hit or a miss"""
+        data = self.files.read(key)
+        try:
+            entry = json.loads(data) if data is not None else None
+        except ValueError:
+            entry = None
+        if entry is None or time.time() - entry["created_at"] > self.ttl_seconds:
+            if entry is not None:
+                self.files.delete(key)
+            self.stats.record(misses=1)
+            return None
+        self.stats.record(hits=1)
+        return entry["reply"]
+
+    def put(self, key: str, reply: str):
+        self.files.write(key, json.dumps({"created_at": time.time(), "reply": reply}).encode("utf-8"))
+
+    def clear(self):
+        self.files.clear()
+
+
+class CachedProvider:
+    """Wraps a provider so byte-identical requests are answered from a ResponseCache
+
+    Every reply is cached as it arrives; a caller that finds it unusable
+    calls revise to drop it or to keep a corrected one in its place.
+    """
+
+    def __init__(self, provider: "LLMProvider", cache: ResponseCache):
+        self.provider = provider
+        self.cache = cache
+        identity = getattr(provider, "identity", None)
+        self.identity = identity() if identity else {"provider": type(provider).__name__}
+
+    async def complete(self, prompt: str, system: str | None = None, json_mode: bool = False) -> str:
+        key = request_key(self.identity, prompt, system, json_mode)
+        reply = self.cache.get(key)
+        if reply is None:
+            reply = await self.provider.complete(prompt, system, json_mode)
+            self.cache.put(key, reply)
+        return reply
+
+    def revise(self, prompt: str, system: str | None, json_mode: bool, reply: str | None):
+        """Replace the cached reply to a request with a usable one, or drop it if reply is None"""
+        key = request_key(self.identity, prompt, system, json_mode)
+        if reply is None:
+            self.cache.files.delete(key)
+        else:
+            self.cache.put(key, reply)
+
+    async def stream(self, prompt: str, system: str | None = None, json_mode: bool = False) -> AsyncIterator[str]:
+        """A cached reply comes as one chunk; a fresh one is cached once the stream completes"""
+        key = request_key(self.identity, prompt, system, json_mode)
+        reply = self.cache.get(key)
+        if reply is not None:
+            yield reply
+            return
+        parts = []
+        async for chunk in self.provider.stream(prompt, system, json_mode):
+            parts.append(chunk)
+            yield chunk
+        self.cache.put(key, "".join(parts))
+
+
+_cache: ResponseCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """The process-wide cache in LLM_CACHE_DIR"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
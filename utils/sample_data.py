@@ -2,10 +2,17 @@ from faker import Faker
 from datetime import datetime, timedelta, date
 import random
 import uuid
-from models.schemas import Contact, Category, CadenceFrequency
+from models.schemas import Contact, Category, CadenceFrequency, Note
 
 fake = Faker()
 
+CUSTOM_CADENCES = [
+    "every 2nd tuesday",
+    "every 45 days but skip december",
+    "every 2 weeks, weekdays only",
+    "every last friday of the month",
+]
+
 def generate_sample_categories() -> list[Category]:
     categories = [
         Category(
@@ -48,6 +55,7 @@ def generate_sample_contacts(categories: list[Category], num_contacts: int = 10)
         
         # Generate a random next outreach date between now and 30 days from now
         next_outreach = datetime.now() + timedelta(days=random.randint(1, 30))
+        cadence = random.choice(list(CadenceFrequency))
         
         contact = Contact(
             id=str(uuid.uuid4()),
@@ -57,10 +65,15 @@ def generate_sample_contacts(categories: list[Category], num_contacts: int = 10)
             special_dates={"birthday": fake.date_of_birth(minimum_age=25, maximum_age=80)},
             categories=contact_categories,
             personal_instructions=random.choice([None, "Always mention our shared love of coffee", "Reference our last golf game", "Ask about their kids"]),
-            cadence_frequency=random.choice(list(CadenceFrequency)),
+            cadence_frequency=cadence,
+            custom_cadence=random.choice(CUSTOM_CADENCES) if cadence == CadenceFrequency.CUSTOM else None,
             next_outreach_date=next_outreach,
             relevant_websites=[fake.url() for _ in range(random.randint(0, 2))],
             keywords=random.sample(["real estate", "local news", "pickleball", "business", "technology"], k=random.randint(0, 3)),
+            notes=[
+                Note(created_at=datetime.now() - timedelta(days=random.randint(7, 365)), text=fake.paragraph(nb_sentences=3))
+                for _ in range(random.randint(0, 4))
+            ],
             last_contact=datetime.now() - timedelta(days=random.randint(7, 90))
         )
         contacts.append(contact)
@@ -0,0 +1,131 @@
+import heapq
+import itertools
+import threading
+from datetime import datetime
+from models.schemas import Contact
+from utils.helpers import get_next_outreach_date
+
+
+class OutreachScheduler:
+    """Priority queue of contact IDs keyed by next_outreach_date
+
+    Entries are (when, seq, contact_id) tuples on a binary heap. Moving or
+    removing a contact leaves its old entry behind and bumps the contact's
+    sequence number; stale entries are skipped when they surface and the
+    heap is compacted once they outnumber the live ones.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._heap: list[tuple[datetime, int, str]] = []
+        self._entries: dict[str, tuple[datetime, int]] = {}
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, contact_id: str) -> bool:
+        return contact_id in self._entries
+
+    def load(self, schedule: list[tuple[str, datetime]]):
+        """Replace the queue with (contact_id, when) pairs in one O(n) heapify"""
+        with self._lock:
+            self._entries = {}
+            for contact_id, when in schedule:
+                self._entries[contact_id] = (when, next(self._seq))
+            self._heap = [(when, seq, cid) for cid, (when, seq) in self._entries.items()]
+            heapq.heapify(self._heap)
+
+    def schedule(self, contact_id: str, when: datetime):
+        """Add a contact to the queue or move it to a new time"""
+        with self._lock:
+            current = self._entries.get(contact_id)
+            if current is not None and current[0] == when:
+                return
+            seq = next(self._seq)
+            self._entries[contact_id] = (when, seq)
+            heapq.heappush(self._heap, (when, seq, contact_id))
+            self._maybe_compact()
+
+    def unschedule(self, contact_id: str):
+        with self._lock:
+            if self._entries.pop(contact_id, None) is not None:
+                self._maybe_compact()
+
+    def reschedule(self, contact: Contact, contacted_at: datetime | None = None) -> Contact:
+        """Record an outreach and queue the contact's next one from its cadence
+
+        Returns the updated contact; the caller is responsible for saving it.
+        """
+        updated = contact.model_copy(update={"last_contact": contacted_at or datetime.now()})
+        updated.next_outreach_date = get_next_outreach_date(updated, updated.last_contact)
+        self.schedule(updated.id, updated.next_outreach_date)
+        return updated
+
+    def _is_live(self, entry: tuple[datetime, int, str]) -> bool:
+        current = self._entries.get(entry[2])
+        return current is not None and current[1] == entry[1]
+
+    def _prune(self):
+        # Drop stale entries sitting at the top of the heap
+        while self._heap and not self._is_live(self._heap[0]):
+            heapq.heappop(self._heap)
+
+    def _maybe_compact(self):
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [entry for entry in self._heap if self._is_live(entry)]
+            heapq.heapify(self._heap)
+
+    def peek(self) -> tuple[datetime, str] | None:
+        """The next (when, contact_id) to come due, without removing it"""
+        with self._lock:
+            self._prune()
+            if not self._heap:
+                return None
+            when, _, contact_id = self._heap[0]
+            return when, contact_id
+
+    def next_due_time(self) -> datetime | None:
+        entry = self.peek()
+        return entry[0] if entry else None
+
+    def upcoming(self, start: datetime | None = None, end: datetime | None = None,
+                 limit: int | None = None) -> list[tuple[datetime, str]]:
+        """(when, contact_id) pairs with start <= when < end in due order, without removing them
+
+        Walks the heap in order with a small frontier heap, so the cost is
+        O((skipped + returned) log n) rather than a full sort.
+        """
+        results = []
+        with self._lock:
+            frontier = [(self._heap[0], 0)] if self._heap else []
+            while frontier:
+                entry, index = heapq.heappop(frontier)
+                when, _, contact_id = entry
+                if end is not None and when >= end:
+                    break
+                if (start is None or when >= start) and self._is_live(entry):
+                    results.append((when, contact_id))
+                    if limit is not None and len(results) >= limit:
+                        break
+                for child in (2 * index + 1, 2 * index + 2):
+                    if child < len(self._heap):
+                        heapq.heappush(frontier, (self._heap[child], child))
+        return results
+
+    def peek_due_before(self, t: datetime, limit: int | None = None) -> list[tuple[datetime, str]]:
+        """Everything due before t, soonest first, without removing it"""
+        return self.upcoming(end=t, limit=limit)
+
+    def pop_due(self, t: datetime, limit: int | None = None) -> list[tuple[datetime, str]]:
+        """Remove and return everything due before t, soonest first"""
+        results = []
+        with self._lock:
+            while limit is None or len(results) < limit:
+                self._prune()
+                if not self._heap or self._heap[0][0] >= t:
+                    break
+                when, _, contact_id = heapq.heappop(self._heap)
+                del self._entries[contact_id]
+                results.append((when, contact_id))
+        return results
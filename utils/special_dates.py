@@ -0,0 +1,119 @@
+import bisect
+import calendar
+import threading
+from datetime import date, datetime, timedelta
+from models.schemas import Contact
+
+# Outreach isn't pulled onto a special date this soon after the last contact
+MIN_GAP_DAYS = 14
+
+# Keys are day-of-year in a leap year, so Feb 29 has its own slot (60)
+_LEAP_YEAR = 2000
+_FEB_29_KEY = 60
+
+
+def _key(month: int, day: int) -> int:
+    return date(_LEAP_YEAR, month, day).timetuple().tm_yday
+
+
+def _occurrence(original: date, year: int) -> date:
+    """The anniversary of a date in a given year; Feb 29 falls on Feb 28 in common years"""
+    if original.month == 2 and original.day == 29 and not calendar.isleap(year):
+        return date(year, 2, 28)
+    return original.replace(year=year)
+
+
+class SpecialDatesIndex:
+    """Annual-recurrence index over Contact.special_dates
+
+    Entries are kept in a sorted list keyed by month/day, so a window query
+    is a bisect per calendar year it spans: O(log n + k).
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries: list[tuple[int, str, str, date]] = []
+        self._by_contact: dict[str, list[tuple[int, str, str, date]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def load(self, special_dates: list[tuple[str, dict[str, date]]]):
+        """Rebuild the index from (contact_id, special_dates) pairs"""
+        with self._lock:
+            self._by_contact = {}
+            for contact_id, dates in special_dates:
+                entries = [(_key(d.month, d.day), contact_id, label, d) for label, d in dates.items()]
+                if entries:
+                    self._by_contact[contact_id] = entries
+            self._entries = sorted(e for entries in self._by_contact.values() for e in entries)
+
+    def put_contact(self, contact_id: str, dates: dict[str, date]):
+        """Record a contact's current special dates, replacing any previous ones"""
+        with self._lock:
+            self.remove_contact(contact_id)
+            entries = [(_key(d.month, d.day), contact_id, label, d) for label, d in dates.items()]
+            for entry in entries:
+                bisect.insort(self._entries, entry)
+            if entries:
+                self._by_contact[contact_id] = entries
+
+    def remove_contact(self, contact_id: str):
+        with self._lock:
+            for entry in self._by_contact.pop(contact_id, []):
+                i = bisect.bisect_left(self._entries, entry)
+                if i < len(self._entries) and self._entries[i] == entry:
+                    del self._entries[i]
+
+    def falls_on(self, contact_id: str, day: date) -> bool:
+        """Whether one of the contact's special dates recurs on day"""
+        with self._lock:
+            return any(_occurrence(original, day.year) == day for _, _, _, original in self._by_contact.get(contact_id, []))
+
+    def upcoming(self, start: date, days: int) -> list[tuple[date, str, str, date]]:
+        """(occurrence, contact_id, label, original date) for anniversaries in [start, start + days)
+
+        Results are in date order and the window may wrap the new year.
+        """
+        results = []
+        if days <= 0:
+            return results
+        last = start + timedelta(days=days - 1)
+        with self._lock:
+            segment_start = start
+            while segment_start <= last:
+                year = segment_start.year
+                segment_end = min(last, date(year, 12, 31))
+                lo = _key(segment_start.month, segment_start.day)
+                hi = _key(segment_end.month, segment_end.day)
+                if not calendar.isleap(year) and segment_end == date(year, 2, 28):
+                    hi = _FEB_29_KEY  # Feb 29 anniversaries fall on the 28th
+                i = bisect.bisect_left(self._entries, (lo,))
+                j = bisect.bisect_left(self._entries, (hi + 1,))
+                for _, contact_id, label, original in self._entries[i:j]:
+                    results.append((_occurrence(original, year), contact_id, label, original))
+                segment_start = segment_end + timedelta(days=1)
+        return results
+
+
+def special_date_outreach(store, start: date, days: int = 14, min_gap_days: int = MIN_GAP_DAYS) -> list[Contact]:
+    """Pull outreach forward so it lands on upcoming birthdays and anniversaries
+
+    Any contact with a special date in the window whose next outreach is
+    later than that date is rescheduled onto it, unless they were last
+    contacted fewer than min_gap_days before it. Returns the moved contacts.
+    """
+    earliest: dict[str, date] = {}
+    for occurrence, contact_id, _, _ in store.special_dates.upcoming(start, days):
+        earliest.setdefault(contact_id, occurrence)
+    moved = []
+    for contact in store.get_contacts(list(earliest)):
+        occurrence = earliest[contact.id]
+        if contact.last_contact and (occurrence - contact.last_contact.date()).days < min_gap_days:
+            continue
+        if contact.next_outreach_date.date() > occurrence:
+            when = datetime.combine(occurrence, contact.next_outreach_date.time())
+            moved.append(contact.model_copy(update={"next_outreach_date": when}))
+    if moved:
+        store.save_contacts(moved)
+    return moved
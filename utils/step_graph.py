@@ -0,0 +1,61 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Iterable, Mapping, NamedTuple
+
+
+class Step(NamedTuple):
+    name: str
+    run: Callable[[Mapping[str, Any]], Awaitable[Any]]  # Gets the results of every step finished so far
+    after: tuple[str, ...] = ()  # Steps whose results this one needs
+
+
+class StepGraph:
+    """Async steps with dependencies, each started as soon as its inputs are ready
+
+    Independent steps run concurrently, so a run takes as long as its
+    slowest chain of dependent steps rather than the sum of all of them.
+    The graph is checked for unknown dependencies and cycles up front.
+    """
+
+    def __init__(self, steps: Iterable[Step]):
+        self.steps = {step.name: step for step in steps}
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> list[str]:
+        for step in self.steps.values():
+            unknown = [name for name in step.after if name not in self.steps]
+            if unknown:
+                raise ValueError(f"Step {step.name!r} depends on unknown steps {unknown}")
+        order, done = [], set()
+        pending = list(self.steps.values())
+        while pending:
+            ready = [step for step in pending if done.issuperset(step.after)]
+            if not ready:
+                raise ValueError(f"Steps {[step.name for step in pending]} form a cycle")
+            for step in ready:
+                order.append(step.name)
+                done.add(step.name)
+            pending = [step for step in pending if step.name not in done]
+        return order
+
+    async def run(self, inputs: Mapping[str, Any] | None = None) -> dict[str, Any]:
+        """Run every step and return all results by step name, plus the inputs
+
+        If a step fails, the steps still running are cancelled and its
+        exception propagates.
+        """
+        results = dict(inputs or {})
+        tasks: dict[str, asyncio.Task] = {}
+
+        async def run_step(step: Step):
+            if step.after:
+                await asyncio.gather(*(tasks[name] for name in step.after))
+            results[step.name] = await step.run(results)
+
+        for name in self.order:
+            tasks[name] = asyncio.ensure_future(run_step(self.steps[name]))
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+        return results
@@ -0,0 +1,428 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import date, datetime
+from models.schemas import CadenceFrequency, Contact, Category, Draft, SystemSettings
+from utils.category_index import CategoryIndex
+from utils.category_rules import CategoryRulesCache
+from utils.scheduler import OutreachScheduler
+from utils.special_dates import SpecialDatesIndex
+from utils.metrics import DashboardMetrics
+from utils.draft_cache import CacheStats
+
+DEFAULT_DB_PATH = os.environ.get("KADENCE_DB_PATH", "kadence.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contacts (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    next_outreach_date TEXT NOT NULL,
+    last_contact TEXT,
+    created_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_contacts_next_outreach ON contacts (next_outreach_date);
+CREATE INDEX IF NOT EXISTS idx_contacts_last_contact ON contacts (last_contact);
+CREATE INDEX IF NOT EXISTS idx_contacts_name ON contacts (name COLLATE NOCASE);
+
+CREATE TABLE IF NOT EXISTS categories (
+    id TEXT PRIMARY KEY,
+    precedence_order INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS contact_categories (
+    contact_id TEXT NOT NULL REFERENCES contacts (id) ON DELETE CASCADE,
+    category_id TEXT NOT NULL,
+    PRIMARY KEY (contact_id, category_id)
+);
+CREATE INDEX IF NOT EXISTS idx_contact_categories_category ON contact_categories (category_id, contact_id);
+
+CREATE TABLE IF NOT EXISTS drafts (
+    contact_id TEXT NOT NULL REFERENCES contacts (id) ON DELETE CASCADE,
+    due_at TEXT NOT NULL,
+    fingerprint TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (contact_id, due_at)
+);
+
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+# Columns list_contacts() may sort on, mapped to their SQL expression
+SORT_COLUMNS = {
+    "name": "name COLLATE NOCASE",
+    "email": "email COLLATE NOCASE",
+    "next_outreach_date": "next_outreach_date",
+    "last_contact": "last_contact",
+}
+
+# created_at of contacts stored before the column existed
+UNKNOWN_CREATED_AT = datetime.min
+
+
+def _to_db(dt: datetime | None) -> str | None:
+    """Serialize a datetime so that string order matches time order"""
+    if dt is None:
+        return None
+    return dt.isoformat(sep=" ", timespec="microseconds")
+
+
+class ContactStore:
+    """SQLite-backed repository for contacts and categories"""
+
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        # Streamlit reruns happen on different threads, so the connection is
+        # shared and every access goes through the lock
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self.category_index = CategoryIndex()
+        self.category_rules = CategoryRulesCache()
+        self.reload_category_index()
+        self.scheduler = OutreachScheduler()
+        self.reload_scheduler()
+        self.special_dates = SpecialDatesIndex()
+        self.reload_special_dates()
+        self.metrics = DashboardMetrics()
+        self.reload_metrics()
+        self.draft_cache_stats = CacheStats()
+        self._data_version = self._data_version_now()
+
+    def _migrate(self):
+        """Bring databases created by older versions up to the current schema"""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(contacts)")}
+        if "created_at" not in columns:
+            with self._conn:
+                self._conn.execute("ALTER TABLE contacts ADD COLUMN created_at TEXT")
+        # When contacts from before created_at were added is unknown, so they
+        # all predate everything and none of them count as a month's growth
+        with self._conn:
+            self._conn.execute("UPDATE contacts SET created_at = ? WHERE created_at IS NULL", (_to_db(UNKNOWN_CREATED_AT),))
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(drafts)")}
+        if "fingerprint" not in columns:
+            with self._conn:
+                self._conn.execute("ALTER TABLE drafts ADD COLUMN fingerprint TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_drafts_fingerprint ON drafts (fingerprint)")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _data_version_now(self) -> int:
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def reload_if_changed(self) -> bool:
+        """Rebuild the scheduler and category index if another connection has written since the last check
+
+        Writes through this store keep the indexes current themselves.
+        """
+        with self._lock:
+            version = self._data_version_now()
+            if version == self._data_version:
+                return False
+            self._data_version = version
+            self.reload_scheduler()
+            self.reload_category_index()
+            return True
+
+    def reload_category_index(self):
+        """Rebuild the in-memory category index from the database"""
+        with self._lock:
+            memberships = self._query("SELECT contact_id, category_id FROM contact_categories ORDER BY rowid")
+            self.category_index.load(self.list_categories(), memberships)
+            self.category_rules.clear()
+
+    def reload_scheduler(self):
+        """Rebuild the outreach queue from the database"""
+        with self._lock:
+            rows = self._query("SELECT id, next_outreach_date FROM contacts")
+            self.scheduler.load([(cid, datetime.fromisoformat(when)) for cid, when in rows])
+
+    def reload_special_dates(self):
+        """Rebuild the birthday/anniversary index from the database"""
+        with self._lock:
+            rows = self._query("SELECT id, json_extract(data, '$.special_dates') FROM contacts")
+            self.special_dates.load([
+                (cid, {label: date.fromisoformat(d) for label, d in json.loads(dates).items()})
+                for cid, dates in rows if dates
+            ])
+
+    def reload_metrics(self):
+        """Rebuild the dashboard counters from the database"""
+        with self._lock:
+            rows = self._query("SELECT id, next_outreach_date, created_at FROM contacts")
+            self.metrics.load([
+                (cid, datetime.fromisoformat(due), datetime.fromisoformat(created) if created else UNKNOWN_CREATED_AT)
+                for cid, due, created in rows
+            ])
+
+    def _query(self, sql: str, params: tuple = ()) -> list[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _contacts(self, where: str = "", params: tuple = (), order: str = "name COLLATE NOCASE",
+                  limit: int | None = None) -> list[Contact]:
+        sql = "SELECT data FROM contacts"
+        if where:
+            sql += f" WHERE {where}"
+        sql += f" ORDER BY {order}, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params = params + (limit,)
+        return [Contact.model_validate_json(row[0]) for row in self._query(sql, params)]
+
+    # Contacts
+
+    def get_contact(self, contact_id: str) -> Contact | None:
+        """Get a contact by its ID"""
+        rows = self._query("SELECT data FROM contacts WHERE id = ?", (contact_id,))
+        return Contact.model_validate_json(rows[0][0]) if rows else None
+
+    def get_contacts(self, contact_ids: list[str]) -> list[Contact]:
+        """Get several contacts by ID, in the order given"""
+        if not contact_ids:
+            return []
+        found = {}
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(contact_ids), 500):
+            chunk = contact_ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for row in self._query(f"SELECT id, data FROM contacts WHERE id IN ({placeholders})", tuple(chunk)):
+                found[row[0]] = Contact.model_validate_json(row[1])
+        return [found[cid] for cid in contact_ids if cid in found]
+
+    def count_contacts(self) -> int:
+        return self._query("SELECT COUNT(*) FROM contacts")[0][0]
+
+    def list_contacts(self, search: str | None = None, order_by: str = "name", descending: bool = False,
+                      limit: int | None = None) -> list[Contact]:
+        """List contacts, optionally filtered by a name/email substring"""
+        order = SORT_COLUMNS[order_by] + (" DESC" if descending else "")
+        if order_by == "last_contact":
+            # Contacts never reached sort last either way
+            order = f"last_contact IS NULL, {order}"
+        if search:
+            pattern = f"%{search}%"
+            return self._contacts("name LIKE ? OR email LIKE ?", (pattern, pattern), order, limit)
+        return self._contacts(order=order, limit=limit)
+
+    def contacts_due_between(self, start: datetime | None = None, end: datetime | None = None,
+                             limit: int | None = None) -> list[Contact]:
+        """Contacts with start <= next_outreach_date < end, soonest first"""
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("next_outreach_date >= ?")
+            params.append(_to_db(start))
+        if end is not None:
+            clauses.append("next_outreach_date < ?")
+            params.append(_to_db(end))
+        return self._contacts(" AND ".join(clauses), tuple(params), "next_outreach_date", limit)
+
+    def contacts_by_last_contact(self, start: datetime | None = None, end: datetime | None = None,
+                                 limit: int | None = None, descending: bool = False,
+                                 include_never: bool = False) -> list[Contact]:
+        """Contacts with start <= last_contact < end, oldest contact first by default"""
+        clauses, params = ["last_contact IS NOT NULL"], []
+        if start is not None:
+            clauses.append("last_contact >= ?")
+            params.append(_to_db(start))
+        if end is not None:
+            clauses.append("last_contact < ?")
+            params.append(_to_db(end))
+        where = "(" + " AND ".join(clauses) + ")"
+        if include_never:
+            where += " OR last_contact IS NULL"
+        order = "last_contact IS NULL, last_contact" + (" DESC" if descending else "")
+        return self._contacts(where, tuple(params), order, limit)
+
+    def outreach_schedule(self) -> list[tuple[str, datetime, str | None]]:
+        """(contact_id, next_outreach_date, sender_email) for every contact, without loading full records"""
+        rows = self._query("SELECT id, next_outreach_date, json_extract(data, '$.sender_email') FROM contacts")
+        return [(cid, datetime.fromisoformat(when), sender) for cid, when, sender in rows]
+
+    def custom_cadences(self) -> list[tuple[str, str, datetime]]:
+        """(contact_id, recurrence rule, next_outreach_date) for contacts on a custom rule"""
+        rows = self._query("SELECT id, json_extract(data, '$.custom_cadence'), next_outreach_date FROM contacts "
+                           "WHERE json_extract(data, '$.cadence_frequency') = ? "
+                           "AND json_extract(data, '$.custom_cadence') IS NOT NULL", (CadenceFrequency.CUSTOM.value,))
+        return [(cid, rule, datetime.fromisoformat(when)) for cid, rule, when in rows]
+
+    def contacts_in_category(self, category_id: str) -> list[Contact]:
+        """All contacts that belong to a category, by name"""
+        contacts = self.get_contacts(list(self.category_index.member_ids(category_id)))
+        return sorted(contacts, key=lambda c: (c.name.lower(), c.id))
+
+    def count_contacts_in_category(self, category_id: str) -> int:
+        return self.category_index.member_count(category_id)
+
+    def contact_categories(self, contact_id: str) -> list[Category]:
+        """The full category objects for a contact"""
+        return self.category_index.categories_for(contact_id)
+
+    def category_rules_for(self, contact_id: str) -> str:
+        """The precedence-ordered Step D rule block for a contact's categories"""
+        with self._lock:
+            return self.category_rules.rules_for(self.category_index.categories_for(contact_id))
+
+    def save_contact(self, contact: Contact):
+        """Insert or replace a contact"""
+        self.save_contacts([contact])
+
+    def save_contacts(self, contacts: list[Contact]):
+        """Insert or replace many contacts in a single transaction"""
+        now = datetime.now()
+        with self._lock, self._conn:
+            for contact in contacts:
+                self._conn.execute(
+                    "INSERT INTO contacts (id, name, email, next_outreach_date, last_contact, created_at, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET name = excluded.name, "
+                    "email = excluded.email, next_outreach_date = excluded.next_outreach_date, "
+                    "last_contact = excluded.last_contact, data = excluded.data",
+                    (contact.id, contact.name, contact.email, _to_db(contact.next_outreach_date),
+                     _to_db(contact.last_contact), _to_db(now), contact.model_dump_json()),
+                )
+                self._conn.execute("DELETE FROM contact_categories WHERE contact_id = ?", (contact.id,))
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO contact_categories (contact_id, category_id) VALUES (?, ?)",
+                    [(contact.id, category_id) for category_id in contact.categories],
+                )
+            for contact in contacts:
+                self.category_index.put_contact(contact.id, contact.categories)
+                self.scheduler.schedule(contact.id, contact.next_outreach_date)
+                self.special_dates.put_contact(contact.id, contact.special_dates)
+                self.metrics.put_contact(contact.id, contact.next_outreach_date, now)
+
+    def delete_contact(self, contact_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM contacts WHERE id = ?", (contact_id,))
+            self.category_index.remove_contact(contact_id)
+            self.scheduler.unschedule(contact_id)
+            self.special_dates.remove_contact(contact_id)
+            self.metrics.remove_contact(contact_id)
+
+    # Categories
+
+    def get_category(self, category_id: str) -> Category | None:
+        """Get a category by its ID"""
+        rows = self._query("SELECT data FROM categories WHERE id = ?", (category_id,))
+        return Category.model_validate_json(rows[0][0]) if rows else None
+
+    def list_categories(self) -> list[Category]:
+        """All categories, in insertion order"""
+        return [Category.model_validate_json(row[0]) for row in self._query("SELECT data FROM categories ORDER BY rowid")]
+
+    def count_categories(self) -> int:
+        return self._query("SELECT COUNT(*) FROM categories")[0][0]
+
+    def save_category(self, category: Category):
+        """Insert or update a category, keeping its position in the list"""
+        self.save_categories([category])
+
+    def save_categories(self, categories: list[Category]):
+        with self._lock, self._conn:
+            for category in categories:
+                self._conn.execute(
+                    "INSERT INTO categories (id, precedence_order, data) VALUES (?, ?, ?) "
+                    "ON CONFLICT (id) DO UPDATE SET precedence_order = excluded.precedence_order, data = excluded.data",
+                    (category.id, category.precedence_order, category.model_dump_json()),
+                )
+            for category in categories:
+                self.category_index.put_category(category)
+                self.category_rules.invalidate(category.id)
+
+    def delete_category(self, category_id: str):
+        """Delete a category and drop it from every contact that uses it"""
+        with self._lock, self._conn:
+            for contact_id in self.category_index.member_ids(category_id):
+                row = self._conn.execute("SELECT data FROM contacts WHERE id = ?", (contact_id,)).fetchone()
+                contact = Contact.model_validate_json(row[0])
+                contact.categories = [cid for cid in contact.categories if cid != category_id]
+                self._conn.execute("UPDATE contacts SET data = ? WHERE id = ?", (contact.model_dump_json(), contact_id))
+            self._conn.execute("DELETE FROM contact_categories WHERE category_id = ?", (category_id,))
+            self._conn.execute("DELETE FROM categories WHERE id = ?", (category_id,))
+            self.category_index.remove_category(category_id)
+            self.category_rules.invalidate(category_id)
+
+    # Drafts
+
+    def save_drafts(self, drafts: list[Draft]):
+        """Insert or replace drafts; a contact keeps one draft per due date"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO drafts (contact_id, due_at, fingerprint, data) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (contact_id, due_at) DO UPDATE SET fingerprint = excluded.fingerprint, data = excluded.data",
+                [(d.contact_id, _to_db(d.due_at), d.fingerprint, d.model_dump_json()) for d in drafts],
+            )
+
+    def get_draft(self, contact_id: str, due_at: datetime) -> Draft | None:
+        """The draft written for a contact's outreach on a given due date"""
+        rows = self._query("SELECT data FROM drafts WHERE contact_id = ? AND due_at = ?", (contact_id, _to_db(due_at)))
+        return Draft.model_validate_json(rows[0][0]) if rows else None
+
+    def drafted_ids(self, schedule: list[tuple[str, datetime]]) -> set[str]:
+        """The contacts among (contact_id, due_at) pairs that already have a draft for that due date"""
+        due = {(cid, _to_db(when)) for cid, when in schedule}
+        ids = list({cid for cid, _ in schedule})
+        drafted = set()
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._query(f"SELECT contact_id, due_at FROM drafts WHERE contact_id IN ({placeholders})", tuple(chunk))
+            drafted.update(cid for cid, when in rows if (cid, when) in due)
+        return drafted
+
+    def cached_drafts(self, fingerprints: list[str]) -> dict[str, Draft]:
+        """Earlier drafts written from exactly these inputs, by fingerprint
+
+        Each lookup counts as a hit or a miss in draft_cache_stats.
+        """
+        wanted = list(dict.fromkeys(fingerprints))
+        found = {}
+        for start in range(0, len(wanted), 500):
+            chunk = wanted[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._query(f"SELECT fingerprint, data FROM drafts WHERE fingerprint IN ({placeholders})", tuple(chunk))
+            for fingerprint, data in rows:
+                found.setdefault(fingerprint, Draft.model_validate_json(data))
+        hits = sum(1 for fingerprint in fingerprints if fingerprint in found)
+        self.draft_cache_stats.record(hits, len(fingerprints) - hits)
+        return found
+
+    # Settings
+
+    def get_settings(self) -> SystemSettings:
+        """The saved system settings, or the defaults if none have been saved"""
+        rows = self._query("SELECT data FROM settings WHERE key = 'system'")
+        return SystemSettings.model_validate_json(rows[0][0]) if rows else SystemSettings()
+
+    def save_settings(self, settings: SystemSettings):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO settings (key, data) VALUES ('system', ?) "
+                "ON CONFLICT (key) DO UPDATE SET data = excluded.data",
+                (settings.model_dump_json(),),
+            )
+
+
+_stores: dict[str, ContactStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path: str = DEFAULT_DB_PATH) -> ContactStore:
+    """Get the process-wide store for a database path"""
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = ContactStore(path)
+        return _stores[path]
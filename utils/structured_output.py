@@ -0,0 +1,225 @@
+import json
+import re
+from typing import Any, TypeVar
+from pydantic import BaseModel
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+# How many times repair_json backs off to an earlier cut point before giving up
+MAX_REPAIR_STEPS = 64
+
+_WHITESPACE = re.compile(r"[ \t\r\n]*")
+# Up to the closing quote, or a backslash whose escape hasn't arrived yet
+_STRING_RUN = re.compile(r'(?:[^"\\]|\\.)*', re.DOTALL)
+_LITERAL_RUN = re.compile(r"[-+.0-9a-zA-Z]*")
+# A \u escape not all here yet, or a high surrogate whose pair may be next
+_PARTIAL_ESCAPE = re.compile(r"(?<!\\)((?:\\\\)*)(?:\\u[dD][89abAB][0-9a-fA-F]{2})?(?:\\u[0-9a-fA-F]{0,3})?$")
+
+
+def extract_json_text(text: str) -> str:
+    """The JSON object in a reply, without any code fence or prose before it"""
+    start = text.find("{")
+    if start < 0:
+        raise ValueError("Reply contains no JSON object")
+    text = text[start:].rstrip()
+    if text.endswith("```"):
+        text = text[:-3].rstrip()
+    return text
+
+
+def _scan(text: str) -> tuple[list[str], bool, bool, list[int]]:
+    """(open brackets, inside a string, ends mid-escape, cut points) for a JSON prefix
+
+    Cut points are the offsets of commas and just past opening brackets
+    outside strings: places the text can be cut back to and still be a
+    valid prefix once closed.
+    """
+    stack, cuts = [], []
+    in_string = escape = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            cuts.append(i + 1)
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+        elif ch == ",":
+            cuts.append(i)
+    return stack, in_string, escape, cuts
+
+
+def repair_json(text: str) -> Any:
+    """Decode a JSON object that may be truncated or sloppy
+
+    Closes an unterminated string and any open brackets, and drops a
+    trailing comma, dangling key or half-written value by cutting back to
+    the last complete member. A truncated reply decodes to the members
+    that were finished. Raises ValueError if nothing usable is left.
+    """
+    text = extract_json_text(text)
+    for _ in range(MAX_REPAIR_STEPS):
+        stack, in_string, escape, cuts = _scan(text)
+        candidate = text
+        if in_string:
+            candidate = (candidate[:-1] if escape else candidate) + '"'
+        candidate = candidate.rstrip().rstrip(",") + "".join(reversed(stack))
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            earlier = [cut for cut in cuts if cut < len(text)]
+            if not earlier:
+                break
+            text = text[:earlier[-1]]
+    raise ValueError("Reply is not a usable JSON object")
+
+
+def loads_lenient(text: str) -> Any:
+    """json.loads for LLM replies: strict first, then with repair_json"""
+    try:
+        return json.loads(extract_json_text(text))
+    except json.JSONDecodeError:
+        return repair_json(text)
+
+
+def parse_model(text: str, model: type[ModelT]) -> ModelT:
+    """Validate an LLM's JSON reply as a pydantic model; ValueError (or ValidationError) if it won't fit"""
+    return model.model_validate(loads_lenient(text))
+
+
+class PartialJSON:
+    """Decodes a JSON object as it streams in, returning the members seen so far
+
+    The parser keeps its place between feeds and builds the object up in
+    place, so each chunk is scanned and decoded once; a string still
+    being written appears truncated. The dict
+    returned is the same one each time, updated by later feeds. Text the
+    parser can't follow, such as single-quoted strings, falls back to
+    repair_json on the whole reply.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0  # Where the next feed resumes scanning
+        self._root: dict | None = None
+        self._stack: list[list] = []  # [container, expecting, key] for each open bracket
+        self._token: tuple[str, int] | None = None  # (kind, start offset) of a key or value being read
+        self._placed = False  # The innermost container holds the partial token's value
+        self._decoded = ("", 0)  # The partial string so far, and the offset it is decoded up to
+        self._fallback = False
+
+    def feed(self, chunk: str) -> dict | None:
+        self.text += chunk
+        if not self._fallback:
+            try:
+                self._parse()
+                return self._root
+            except ValueError:
+                self._fallback = True
+        try:
+            value = repair_json(self.text)
+        except ValueError:
+            return None
+        return value if isinstance(value, dict) else None
+
+    def _parse(self):
+        text, pos = self.text, self._pos
+        if self._root is None:
+            start = text.find("{", pos)
+            if start < 0:
+                self._pos = len(text)
+                return
+            self._root = {}
+            self._stack = [[self._root, "key", None]]
+            pos = start + 1
+        if self._placed:
+            self._unplace()
+        while self._stack:
+            if self._token:
+                kind, start = self._token
+                run = _STRING_RUN if kind != "literal" else _LITERAL_RUN
+                pos = run.match(text, pos).end()
+                if pos == len(text) or text[pos] == "\\":
+                    break
+                if kind == "literal":
+                    value = json.loads(text[start:pos])
+                else:
+                    value = json.loads(text[start - 1:pos + 1])
+                    pos += 1
+                self._token = None
+                if kind == "key":
+                    self._stack[-1][1:] = ["colon", value]
+                else:
+                    self._add(value)
+                continue
+            pos = _WHITESPACE.match(text, pos).end()
+            if pos == len(text):
+                break
+            ch = text[pos]
+            pos += 1
+            frame = self._stack[-1]
+            is_dict = isinstance(frame[0], dict)
+            expecting = frame[1]
+            if ch == ("}" if is_dict else "]") and expecting in ("key", "value", "comma"):
+                # Also allows a trailing comma, which repair_json would have dropped
+                if expecting == "value" and is_dict:
+                    raise ValueError("Member has no value")
+                self._stack.pop()
+            elif expecting == "key" and ch == '"':
+                self._token = ("key", pos)
+            elif expecting == "colon" and ch == ":":
+                frame[1] = "value"
+            elif expecting == "comma" and ch == ",":
+                frame[1] = "key" if is_dict else "value"
+            elif expecting == "value" and ch == '"':
+                self._token = ("string", pos)
+            elif expecting == "value" and ch in "{[":
+                child = {} if ch == "{" else []
+                self._add(child)
+                self._stack.append([child, "key" if ch == "{" else "value", None])
+            elif expecting == "value" and _LITERAL_RUN.match(ch).end():
+                self._token = ("literal", pos - 1)
+                pos -= 1
+            else:
+                raise ValueError(f"Unexpected {ch!r} in JSON")
+        self._pos = pos
+        if self._token and self._token[0] == "string":
+            self._place(self._token[1], pos)
+
+    def _add(self, value: Any):
+        """Store a finished value in the innermost container"""
+        frame = self._stack[-1]
+        if isinstance(frame[0], dict):
+            frame[0][frame[2]] = value
+        else:
+            frame[0].append(value)
+        frame[1] = "comma"
+
+    def _place(self, start: int, end: int):
+        """Show the string being read, as far as it decodes, until the next feed replaces it"""
+        value, decoded_to = self._decoded if self._decoded[1] >= start else ("", start)
+        raw = _PARTIAL_ESCAPE.sub(r"\1", self.text[decoded_to:end], count=1)
+        value += json.loads('"' + raw + '"')
+        self._decoded = (value, decoded_to + len(raw))
+        frame = self._stack[-1]
+        if isinstance(frame[0], dict):
+            frame[0][frame[2]] = value
+        else:
+            frame[0].append(value)
+        self._placed = True
+
+    def _unplace(self):
+        container, _, key = self._stack[-1]
+        if isinstance(container, dict):
+            del container[key]
+        else:
+            container.pop()
+        self._placed = False
@@ -0,0 +1,137 @@
+"""Step B research, done once per keyword rather than once per contact
+
+Contacts draw their keywords from a small shared vocabulary, so a batch
+of due contacts usually mentions each keyword many times. Summaries are
+cached on disk per normalized keyword (and provider) for ttl_seconds;
+the batch pipeline researches the distinct keywords of all its contacts
+up front and hands each contact the summaries for its own. Those
+summaries are part of each draft's fingerprint, so once a keyword's
+research expires and comes back different, drafts that used it are
+written again.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from datetime import date
+from typing import Iterable, Mapping
+from utils.disk_cache import DiskCache
+from utils.draft_cache import CacheStats
+from utils.llm import LLMProvider
+from utils.prompts import get_template
+
+logger = logging.getLogger(__name__)
+
+TOPIC_CACHE_DIR = os.environ.get("KADENCE_TOPIC_CACHE_DIR", ".kadence_cache/topics")
+DEFAULT_MAX_BYTES = int(os.environ.get("KADENCE_TOPIC_CACHE_MAX_MB", "64")) * 1024 * 1024
+DEFAULT_TTL_SECONDS = float(os.environ.get("KADENCE_TOPIC_CACHE_TTL_HOURS", "24")) * 3600
+
+_PUNCTUATION = re.compile(r"[^\w\s&+#-]+")
+
+
+def normalize_keyword(keyword: str) -> str:
+    """One spelling per keyword: Unicode-normalized, case-folded, punctuation dropped, spaces collapsed"""
+    keyword = _PUNCTUATION.sub(" ", unicodedata.normalize("NFKC", keyword).casefold())
+    return " ".join(keyword.split())
+
+
+def distinct_keywords(keyword_lists: Iterable[Iterable[str]]) -> list[str]:
+    """Normalized keywords across many contacts, each once, in order of first appearance"""
+    seen: dict[str, None] = {}
+    for keywords in keyword_lists:
+        for keyword in keywords:
+            normalized = normalize_keyword(keyword)
+            if normalized:
+                seen.setdefault(normalized)
+    return list(seen)
+
+
+def format_topics(summaries: Mapping[str, str]) -> str:
+    """Keyword summaries as one block of Step B research"""
+    return "\n\n".join(f"{keyword}:\n{summary.strip()}" for keyword, summary in summaries.items())
+
+
+class TopicResearch:
+    """Expiring disk cache of keyword research summaries, filled by LLM requests
+
+    The research prompt carries today's date, so the LLM response cache
+    can't serve a summary from an earlier day once this one has expired.
+    Failed requests aren't cached.
+    """
+
+    def __init__(self, directory: str = TOPIC_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.files = DiskCache(directory, max_bytes)
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+
+    @staticmethod
+    def key(provider: LLMProvider, keyword: str) -> str:
+        identity = getattr(provider, "identity", None)
+        identity = identity() if callable(identity) else identity or {"provider": type(provider).__name__}
+        encoded = json.dumps({"identity": identity, "keyword": keyword}, sort_keys=True).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def cached(self, provider: LLMProvider, keyword: str) -> str | None:
+        """The fresh summary for a normalized keyword, or None; counts a hit or a miss"""
+        key = self.key(provider, keyword)
+        data = self.files.read(key)
+        try:
+            entry = json.loads(data) if data is not None else None
+        except ValueError:
+            entry = None
+        if entry is None or time.time() - entry["created_at"] > self.ttl_seconds:
+            self.stats.record(misses=1)
+            return None
+        self.stats.record(hits=1)
+        return entry["summary"]
+
+    async def summary(self, provider: LLMProvider, keyword: str) -> str:
+        """Research for one keyword, from the cache when fresh"""
+        keyword = normalize_keyword(keyword)
+        summary = self.cached(provider, keyword)
+        if summary is None:
+            prompt = get_template("step_topic").render({"keyword": keyword, "today": date.today().isoformat()})
+            summary = await provider.complete(prompt)
+            entry = {"keyword": keyword, "created_at": time.time(), "summary": summary}
+            self.files.write(self.key(provider, keyword), json.dumps(entry).encode("utf-8"))
+        return summary
+
+    async def summaries(self, provider: LLMProvider, keywords: Iterable[str]) -> dict[str, str]:
+        """Research for each distinct keyword at once, by normalized keyword
+
+        Keywords whose request fails are logged and left out, so one bad
+        keyword doesn't hold up the rest.
+        """
+        keywords = distinct_keywords([keywords])
+        results = await asyncio.gather(*(self.summary(provider, k) for k in keywords), return_exceptions=True)
+        found = {}
+        for keyword, result in zip(keywords, results):
+            if isinstance(result, asyncio.CancelledError):
+                raise result
+            if isinstance(result, BaseException):
+                logger.warning("Research on %r failed: %s", keyword, result)
+                continue
+            found[keyword] = result
+        return found
+
+    def clear(self):
+        self.files.clear()
+
+
+_research: TopicResearch | None = None
+_research_lock = threading.Lock()
+
+
+def get_topic_research() -> TopicResearch:
+    """The process-wide keyword research cache in TOPIC_CACHE_DIR"""
+    global _research
+    with _research_lock:
+        if _research is None:
+            _research = TopicResearch()
+        return _research
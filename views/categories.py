@@ -1,6 +1,7 @@
 import streamlit as st
 import uuid
 from models.schemas import Category
+from utils.store import get_store
 
 def render_category_form(category: Category = None, is_edit: bool = False):
     """Render the category form for adding/editing categories"""
@@ -49,16 +50,11 @@ def render_category_form(category: Category = None, is_edit: bool = False):
             
             new_category = Category(**category_data)
             
+            get_store().save_category(new_category)
+            st.session_state.categories = get_store().list_categories()
             if is_edit:
-                # Update existing category
-                st.session_state.categories = [
-                    new_category if c.id == category.id else c 
-                    for c in st.session_state.categories
-                ]
                 st.success("Category updated successfully!")
             else:
-                # Add new category
-                st.session_state.categories.append(new_category)
                 st.success("Category added successfully!")
             
             return True
@@ -90,10 +86,7 @@ with tab1:
                 st.write("**AI Instructions:**", category.rule_text)
                 
                 # Show usage count
-                usage_count = sum(
-                    1 for contact in st.session_state.contacts 
-                    if category.id in contact.categories
-                )
+                usage_count = get_store().count_contacts_in_category(category.id)
                 st.write(f"**Used by {usage_count} contacts**")
             
             with col2:
@@ -106,10 +99,8 @@ with tab1:
                 # Only allow deletion if category is not in use
                 if usage_count == 0:
                     if st.button("Delete", key=f"delete_{category.id}"):
-                        st.session_state.categories = [
-                            c for c in st.session_state.categories 
-                            if c.id != category.id
-                        ]
+                        get_store().delete_category(category.id)
+                        st.session_state.categories = get_store().list_categories()
                         st.success("Category deleted successfully!")
                         st.experimental_rerun()
                 else:
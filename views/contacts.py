@@ -1,7 +1,10 @@
 import streamlit as st
 import uuid
 from datetime import datetime, date
-from models.schemas import Contact, CadenceFrequency, Category
+from models.schemas import Contact, CadenceFrequency, Category, Note
+from utils.helpers import get_next_outreach_date
+from utils.recurrence import compile_rule
+from utils.store import get_store
 
 def render_category_form(category: Category = None, is_edit: bool = False):
     """Render the category form for adding/editing categories"""
@@ -48,14 +51,11 @@ def render_category_form(category: Category = None, is_edit: bool = False):
             
             new_category = Category(**category_data)
             
+            get_store().save_category(new_category)
+            st.session_state.categories = get_store().list_categories()
             if is_edit:
-                st.session_state.categories = [
-                    new_category if c.id == category.id else c 
-                    for c in st.session_state.categories
-                ]
                 st.success("Category updated successfully!")
             else:
-                st.session_state.categories.append(new_category)
                 st.success("Category added successfully!")
             
             return True
@@ -98,6 +98,24 @@ def render_contact_form(contact: Contact = None, is_edit: bool = False):
                 options=list(CadenceFrequency),
                 index=list(CadenceFrequency).index(contact.cadence_frequency) if contact else 1
             )
+            custom_cadence = st.text_input(
+                "Custom Cadence Rule",
+                value=contact.custom_cadence or "" if contact else "",
+                help="Used with the custom cadence, e.g. 'every 2nd tuesday', "
+                     "'every 45 days but skip december' or 'every 2 weeks, weekdays only'"
+            )
+            
+            # Sender address; the options are the addresses saved in settings
+            settings = get_store().get_settings()
+            sender_options = ["Default"] + [e for e in settings.daily_send_caps if e != settings.user_email]
+            if contact and contact.sender_email and contact.sender_email not in sender_options:
+                sender_options.append(contact.sender_email)
+            sender = st.selectbox(
+                "Send From",
+                options=sender_options,
+                index=sender_options.index(contact.sender_email) if contact and contact.sender_email else 0,
+                help="Which of your email addresses sends to this contact"
+            )
         
         with col2:
             st.subheader("AI Content Sources")
@@ -122,10 +140,25 @@ def render_contact_form(contact: Contact = None, is_edit: bool = False):
                 value="\n".join(contact.keywords) if contact else "",
                 help="Enter one keyword/topic per line"
             )
+            
+            # Notes accumulate; the newest are kept when the prompt runs short of room
+            new_note = st.text_area(
+                "Add a Note",
+                help="Something worth remembering, e.g. news they shared. Recent notes are included in AI drafts"
+            )
+            if contact and contact.notes:
+                st.caption(f"{len(contact.notes)} saved notes")
         
         submitted = st.form_submit_button("Save Contact")
         
         if submitted:
+            if cadence == CadenceFrequency.CUSTOM and custom_cadence:
+                try:
+                    compile_rule(custom_cadence)
+                except ValueError as e:
+                    st.error(f"Invalid custom cadence rule: {e}")
+                    return False
+            
             # Create/update contact object
             contact_data = {
                 "id": contact.id if contact else str(uuid.uuid4()),
@@ -136,24 +169,26 @@ def render_contact_form(contact: Contact = None, is_edit: bool = False):
                 "categories": category_ids,
                 "personal_instructions": instructions if instructions else None,
                 "cadence_frequency": cadence,
-                "next_outreach_date": datetime.now(),  # This would be calculated based on cadence
+                "custom_cadence": custom_cadence.strip() if custom_cadence.strip() else None,
+                "sender_email": sender if sender != "Default" else None,
+                "next_outreach_date": contact.next_outreach_date if contact else datetime.now(),
                 "relevant_websites": [url.strip() for url in websites.split("\n") if url.strip()],
                 "keywords": [kw.strip() for kw in keywords.split("\n") if kw.strip()],
-                "last_contact": contact.last_contact if contact else None
+                "last_contact": contact.last_contact if contact else None,
+                "notes": (contact.notes if contact else []) + ([Note(text=new_note.strip())] if new_note.strip() else [])
             }
             
             new_contact = Contact(**contact_data)
             
+            # New contacts and cadence changes get a fresh due date
+            if (not contact or contact.cadence_frequency != new_contact.cadence_frequency
+                    or contact.custom_cadence != new_contact.custom_cadence):
+                new_contact.next_outreach_date = get_next_outreach_date(new_contact)
+            
+            get_store().save_contact(new_contact)
             if is_edit:
-                # Update existing contact
-                st.session_state.contacts = [
-                    new_contact if c.id == contact.id else c 
-                    for c in st.session_state.contacts
-                ]
                 st.success("Contact updated successfully!")
             else:
-                # Add new contact
-                st.session_state.contacts.append(new_contact)
                 st.success("Contact added successfully!")
             
             return True
@@ -177,20 +212,17 @@ with tab1:
             options=[cat.name for cat in st.session_state.categories]
         )
     
+    # Contacts in any of the selected categories
+    store = get_store()
+    if category_filter:
+        filter_ids = [cat.id for cat in st.session_state.categories if cat.name in category_filter]
+        allowed_ids = set().union(*(store.category_index.member_ids(cid) for cid in filter_ids))
+    
     # Contact list with actions
-    for contact in st.session_state.contacts:
-        # Apply search filter
-        if search and search.lower() not in contact.name.lower() and search.lower() not in contact.email.lower():
-            continue
-            
+    for contact in store.list_contacts(search):
         # Apply category filter
-        if category_filter:
-            contact_categories = [
-                cat.name for cat in st.session_state.categories 
-                if cat.id in contact.categories
-            ]
-            if not any(cat in contact_categories for cat in category_filter):
-                continue
+        if category_filter and contact.id not in allowed_ids:
+            continue
         
         with st.expander(f"{contact.name} ({contact.email})"):
             col1, col2 = st.columns([3, 1])
@@ -198,8 +230,7 @@ with tab1:
             with col1:
                 # Contact details
                 st.write("**Categories:**", ", ".join([
-                    cat.name for cat in st.session_state.categories 
-                    if cat.id in contact.categories
+                    cat.name for cat in store.contact_categories(contact.id)
                 ]))
                 st.write("**Cadence:**", contact.cadence_frequency)
                 if contact.personal_instructions:
@@ -250,10 +281,7 @@ with tab3:
                 st.write("**AI Instructions:**", category.rule_text)
                 
                 # Show usage count
-                usage_count = sum(
-                    1 for contact in st.session_state.contacts 
-                    if category.id in contact.categories
-                )
+                usage_count = get_store().count_contacts_in_category(category.id)
                 st.write(f"**Used by {usage_count} contacts**")
                 
                 col1, col2 = st.columns(2)
@@ -265,10 +293,8 @@ with tab3:
                 with col2:
                     if usage_count == 0:
                         if st.button("Delete", key=f"delete_cat_{category.id}"):
-                            st.session_state.categories = [
-                                c for c in st.session_state.categories 
-                                if c.id != category.id
-                            ]
+                            get_store().delete_category(category.id)
+                            st.session_state.categories = get_store().list_categories()
                             st.success("Category deleted successfully!")
                             st.experimental_rerun()
                     else:
@@ -0,0 +1,150 @@
+"""Headless worker that writes outreach drafts as contacts come due
+
+Runs as its own process next to the Streamlit app and shares its SQLite
+store, so draft generation never happens inside a user's rerun:
+
+    python worker.py            # run until interrupted
+    python worker.py --once     # draft whatever is due now and exit
+    python worker.py --once --pregenerate   # ...and contacts due in the next 48 hours
+
+Once a day it lines outreach up with birthdays and anniversaries and
+levels it under the daily send caps. Between the off-peak hours in the
+settings it also drafts contacts coming due soon, up to a nightly token
+budget, so the dashboard has them ready.
+"""
+import argparse
+import logging
+import threading
+from datetime import date, datetime
+from models.schemas import Draft
+from utils.fetch_cache import get_fetch_cache
+from utils.generation import DEFAULT_CONCURRENCY, generate_drafts_sync
+from utils.load_leveling import adjust_schedule
+from utils.pregeneration import in_off_peak, off_peak_started, pregenerate_upcoming
+from utils.response_cache import get_response_cache
+from utils.store import ContactStore, DEFAULT_DB_PATH, get_store
+from utils.topic_research import get_topic_research
+
+logger = logging.getLogger("kadence.worker")
+
+# Upper bound on a sleep, so edits made in the app are picked up promptly
+DEFAULT_POLL_SECONDS = 60
+
+
+def draft_due_contacts(store: ContactStore, now: datetime | None = None, limit: int | None = None,
+                       concurrency: int = DEFAULT_CONCURRENCY) -> list[Draft]:
+    """Write and save drafts for due contacts that don't have one for their current due date
+
+    Drains the due entries from the store's scheduler, so later wakes only
+    see contacts that came due since. Failed drafts, and any left over
+    past `limit`, go back in the queue to be tried on the next wake.
+    """
+    now = now or datetime.now()
+    due = [(contact_id, when) for when, contact_id in store.scheduler.pop_due(now)]
+    drafted = store.drafted_ids(due)
+    pending = [(contact_id, when) for contact_id, when in due if contact_id not in drafted]
+    for contact_id, when in pending[limit:] if limit is not None else []:
+        store.scheduler.schedule(contact_id, when)
+    pending = pending[:limit]
+    if not pending:
+        return []
+    try:
+        result = generate_drafts_sync(store, store.get_contacts([contact_id for contact_id, _ in pending]),
+                                      concurrency=concurrency)
+    except BaseException:
+        for contact_id, when in pending:
+            store.scheduler.schedule(contact_id, when)
+        raise
+    for contact_id, when in pending:
+        if contact_id in result.failures:
+            store.scheduler.schedule(contact_id, when)
+    if result.failures:
+        logger.warning("%d drafts failed; they will be retried on the next wake", len(result.failures))
+    return result.drafts
+
+
+def cache_report(store: ContactStore) -> str:
+    """Hit ratios of the draft, LLM response, web page and topic research caches since the worker started"""
+    caches = {"draft": store.draft_cache_stats, "LLM": get_response_cache().stats, "page": get_fetch_cache().stats,
+              "topic": get_topic_research().stats}
+    parts = []
+    for name, stats in caches.items():
+        counts = stats.snapshot()
+        parts.append(f"{name} cache {counts['hits']}/{counts['hits'] + counts['misses']} hits ({counts['hit_rate']:.0%})")
+    return ", ".join(parts)
+
+
+def seconds_until_next_due(store: ContactStore, now: datetime, poll_seconds: float) -> float:
+    """How long to sleep: until the next contact comes due, but never longer than poll_seconds"""
+    upcoming = store.scheduler.upcoming(start=now, limit=1)
+    if not upcoming:
+        return poll_seconds
+    return min(poll_seconds, max(0.0, (upcoming[0][0] - now).total_seconds()))
+
+
+def run(store: ContactStore, poll_seconds: float = DEFAULT_POLL_SECONDS, stop: threading.Event | None = None,
+        concurrency: int = DEFAULT_CONCURRENCY):
+    """Draft due contacts, then sleep until the next one comes due, until stopped
+
+    During off-peak hours each wake also pre-generates drafts for upcoming
+    contacts until that night's token budget is spent.
+    """
+    stop = stop or threading.Event()
+    spent_by_night: dict[datetime, int] = {}
+    adjusted_on: date | None = None
+    while not stop.is_set():
+        # The app writes from another process; pick its changes up when there are any
+        store.reload_if_changed()
+        now = datetime.now()
+        if adjusted_on != now.date():
+            moved = adjust_schedule(store, today=now.date())
+            if moved:
+                logger.info("Moved %d contacts onto special dates and under the daily caps", len(moved))
+            adjusted_on = now.date()
+        drafts = draft_due_contacts(store, now, concurrency=concurrency)
+        if drafts:
+            logger.info("Wrote %d drafts (%s)", len(drafts), cache_report(store))
+        settings = store.get_settings()
+        if settings.pregenerate_drafts and in_off_peak(now, settings.off_peak_start_hour, settings.off_peak_end_hour):
+            night = off_peak_started(now, settings.off_peak_start_hour)
+            remaining = settings.pregeneration_token_budget - spent_by_night.get(night, 0)
+            if remaining > 0:
+                result = pregenerate_upcoming(store, now, settings, remaining, concurrency)
+                spent_by_night = {night: spent_by_night.get(night, 0) + result.estimated_tokens}
+                if result.drafts:
+                    logger.info("Pre-generated %d drafts (~%d tokens, %d deferred to a later night; %s)",
+                                len(result.drafts), result.estimated_tokens, result.deferred, cache_report(store))
+        stop.wait(seconds_until_next_due(store, datetime.now(), poll_seconds))
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Write outreach drafts as contacts come due")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="SQLite database shared with the app")
+    parser.add_argument("--poll", type=float, default=DEFAULT_POLL_SECONDS, help="Longest sleep between checks, in seconds")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Most LLM requests in flight")
+    parser.add_argument("--once", action="store_true", help="Draft whatever is due now and exit")
+    parser.add_argument("--pregenerate", action="store_true",
+                        help="With --once, also draft contacts due soon, whatever the hour")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    store = get_store(args.db)
+    if args.once:
+        logger.info("Moved %d contacts onto special dates and under the daily caps", len(adjust_schedule(store)))
+        logger.info("Wrote %d drafts", len(draft_due_contacts(store, concurrency=args.concurrency)))
+        if args.pregenerate:
+            result = pregenerate_upcoming(store, concurrency=args.concurrency)
+            logger.info("Pre-generated %d drafts (~%d tokens, %d deferred)",
+                        len(result.drafts), result.estimated_tokens, result.deferred)
+        logger.info("Cache use: %s", cache_report(store))
+        return
+    try:
+        run(store, args.poll, concurrency=args.concurrency)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()